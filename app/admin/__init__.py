@@ -0,0 +1,8 @@
+"""
+Admin Module
+Token-protected cache inspection, invalidation and warm-up
+"""
+
+from app.admin.router import router
+
+__all__ = ["router"]
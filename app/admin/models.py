@@ -0,0 +1,18 @@
+"""
+Pydantic models for the admin API
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class WarmupRequest(BaseModel):
+    """Lessons to pre-warm and whether to reload the warm cache file"""
+
+    module_ids: Optional[List[str]] = Field(
+        default=None, description="Modules to warm (all modules when omitted)"
+    )
+    reload_file: bool = Field(
+        default=False, description="Also reload the warm cache file into memory"
+    )
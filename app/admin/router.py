@@ -0,0 +1,170 @@
+"""
+API routes for cache administration
+
+Every route requires the ADMIN_TOKEN, sent as "Authorization: Bearer <token>"
+or "X-Admin-Token: <token>"; without a configured token the admin API is off.
+Invalidation clears this worker's memory and the shared disk cache; other
+workers drop their in-memory copies when those expire.
+"""
+
+import asyncio
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from app.admin.models import WarmupRequest
+from app.core.cache import TTLCache, cache_registry
+from app.core.config import settings
+from app.core.context_cache import prefix_cache
+from app.core.deadline import detached_context
+from app.core.disk_cache import disk_cache
+from app.core.warm_cache import warm_cache_file
+from app.prompting.curriculum import FULL_CURRICULUM
+from app.prompting.prewarm import lesson_prewarmer
+from app.prompting.samples import sample_filename
+
+
+def require_admin_token(
+    authorization: Optional[str] = Header(default=None),
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    """Reject requests without the configured admin token"""
+    expected = settings.admin.token
+    if not expected:
+        raise HTTPException(status_code=503, detail="Admin API disabled")
+
+    supplied = x_admin_token
+    if authorization and authorization.lower().startswith("bearer "):
+        supplied = authorization[7:].strip()
+    if not supplied or not secrets.compare_digest(
+        supplied.encode("utf-8"), expected.encode("utf-8")
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(
+    prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)]
+)
+
+# Progress of the last admin-triggered warm-up
+warmup_state: Dict[str, Any] = {"running": False}
+_warmup_task: Optional[asyncio.Task] = None
+
+
+def _cache_report(cache: TTLCache) -> Dict[str, Any]:
+    report = {**cache.stats(), "age_histogram": cache.age_histogram()}
+    if cache.persistent:
+        report["disk_age_histogram"] = disk_cache.age_histogram(cache.name)
+    return report
+
+
+def _get_cache(name: str) -> TTLCache:
+    cache = cache_registry.get(name)
+    if cache is None:
+        raise HTTPException(status_code=404, detail=f"Unknown cache: {name}")
+    return cache
+
+
+@router.get("/caches")
+async def list_caches():
+    """Size, entries, hits, misses, evictions and entry ages of every cache"""
+    return {
+        "caches": {
+            name: _cache_report(cache) for name, cache in cache_registry.items()
+        },
+        "disk": disk_cache.stats(),
+        "context_cache": prefix_cache.stats(),
+        "warm_cache_file": warm_cache_file.stats(),
+    }
+
+
+@router.get("/caches/{name}")
+async def get_cache(name: str):
+    """Report for a single cache"""
+    return _cache_report(_get_cache(name))
+
+
+@router.delete("/caches/{name}")
+async def invalidate_cache(name: str, prefix: Optional[str] = None):
+    """
+    Invalidate a whole cache namespace, or only the keys starting with prefix
+
+    Keys with readable prefixes:
+    - workflow:roadmap: "<model>:"
+    - workflow:step_quiz: "<ai tool, lowercased>:"
+    - evaluator:evaluations: "v<prompt version>:<model>:"
+    - analysis:results: "lesson-<submodule id>:"
+    - search:perplexity, search:tavily: the lowercased query itself
+    Tutor, workspace and chunk summary keys are content hashes; those caches
+    can only be cleared as a whole.
+    """
+    cache = _get_cache(name)
+    if prefix:
+        removed = cache.invalidate_prefix(prefix)
+    else:
+        removed = cache.clear()
+    return {"cache": name, "prefix": prefix, "removed": removed}
+
+
+async def _run_warmup(lessons: list[tuple[str, int]], reload_file: bool):
+    try:
+        if reload_file:
+            warmup_state["file_entries_loaded"] = await warm_cache_file.load()
+        for module_id, submodule_id in lessons:
+            if await lesson_prewarmer.warm_lesson(module_id, submodule_id):
+                warmup_state["lessons_warmed"] += 1
+            else:
+                warmup_state["lessons_failed"] += 1
+    finally:
+        warmup_state["running"] = False
+        warmup_state["finished_at"] = time.time()
+
+
+@router.post("/warmup", status_code=202)
+async def trigger_warmup(request: WarmupRequest):
+    """
+    Pre-warm lessons (canonical workspace answers for their samples) in the
+    background, and optionally reload the warm cache file
+    """
+    global _warmup_task
+
+    if warmup_state["running"]:
+        raise HTTPException(status_code=409, detail="A warm-up is already running")
+
+    modules = FULL_CURRICULUM
+    if request.module_ids is not None:
+        modules = [m for m in FULL_CURRICULUM if m["id"] in request.module_ids]
+        unknown = set(request.module_ids) - {m["id"] for m in modules}
+        if unknown:
+            raise HTTPException(
+                status_code=404, detail=f"Unknown modules: {sorted(unknown)}"
+            )
+    # Only lessons with a sample document have anything to pre-warm
+    lessons = [
+        (m["id"], sub["id"])
+        for m in modules
+        for sub in m["submodules"]
+        if sample_filename(m["id"], sub["id"])
+    ]
+
+    warmup_state.clear()
+    warmup_state.update(
+        running=True,
+        started_at=time.time(),
+        lessons=len(lessons),
+        lessons_warmed=0,
+        lessons_failed=0,
+    )
+    # Detached: the warm-up outlives this request and its deadline
+    _warmup_task = asyncio.create_task(
+        _run_warmup(lessons, request.reload_file), context=detached_context()
+    )
+    return warmup_state
+
+
+@router.get("/warmup")
+async def warmup_status():
+    """Progress of the last admin-triggered warm-up"""
+    return {**warmup_state, "prewarmer": lesson_prewarmer.stats()}
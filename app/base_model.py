@@ -25,7 +25,7 @@ def get_google_model(model_name: str, thinking_enabled: bool = True):
 
 
 def get_openrouter_model(model_name: str):
-    provider = OpenRouterProvider(api_key=settings.secrets.key)
+    provider = OpenRouterProvider(api_key=settings.openrouter.api_key)
     return OpenAIChatModel(
         model_name=model_name,
         provider=provider,
@@ -0,0 +1,362 @@
+"""
+In-memory TTL caches with stale-while-revalidate and negative caching
+
+Caches created with persistent=True are backed by the shared on-disk cache
+(app.core.disk_cache): values are written through to it, and memory misses
+are looked up there before computing, so entries survive restarts and are
+shared between workers.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.deadline import DeadlineExceeded, detached_context
+from app.core.disk_cache import AGE_BUCKETS, age_bucket, canonical_key, disk_cache
+
+logger = logging.getLogger(__name__)
+
+# Every named cache registers itself here so stats can be reported in one place
+cache_registry: Dict[str, "TTLCache"] = {}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize free text for change detection (case, punctuation and whitespace)
+
+    Lossy ("C++" and "C#" both become "c"), so never use it for cache keys
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def normalize_key_text(text: str) -> str:
+    """Normalize free text for cache keys (case and whitespace, symbols kept)"""
+    return " ".join(text.lower().split())
+
+
+@dataclass
+class CacheEntry:
+    """Single cached value with its freshness windows"""
+
+    value: Any
+    created_at: float
+    fresh_until: float
+    stale_until: float
+    negative: bool = False
+    size: int = 1
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with a TTL, a stale-while-revalidate window and
+    negative caching for failed computations.
+
+    - Fresh hit: value returned directly
+    - Stale hit: value returned immediately, refresh runs in the background
+    - Negative hit: the cached failure is replayed until negative_ttl expires
+    - Miss: looked up on disk when persistent, otherwise computed inline;
+      concurrent misses for one key share a computation
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        negative_ttl: float = 0.0,
+        max_entries: int = 1024,
+        max_size: Optional[int] = None,
+        persistent: bool = False,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.persistent = persistent
+
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._refreshing: set[Hashable] = set()
+        self._background: set[asyncio.Task] = set()
+        self._total_size = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.evictions = 0
+        self.disk_hits = 0
+
+        cache_registry[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Return a fresh or stale value without computing, None if absent"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or now >= entry.stale_until:
+            entry = self._load(key)
+        if entry is None or entry.negative:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if now < entry.fresh_until:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry.value
+
+    def set(
+        self, key: Hashable, value: Any, negative: bool = False, size: int = 1
+    ) -> None:
+        """Store a value (or a failure, when negative=True)"""
+        self._store(key, value, negative=negative, size=size)
+        # Failures are per-process; only real values are shared
+        if self.persistent and not negative:
+            disk_cache.set(self.name, key, value, self.ttl + self.stale_ttl)
+
+    def _store(
+        self,
+        key: Hashable,
+        value: Any,
+        negative: bool = False,
+        size: int = 1,
+        age: float = 0.0,
+    ) -> CacheEntry:
+        now = time.monotonic()
+        if negative:
+            fresh_until = stale_until = now + self.negative_ttl
+        else:
+            fresh_until = now + self.ttl - age
+            stale_until = fresh_until + self.stale_ttl
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._total_size -= old.size
+
+        entry = self._entries[key] = CacheEntry(
+            value=value,
+            created_at=now - age,
+            fresh_until=fresh_until,
+            stale_until=stale_until,
+            negative=negative,
+            size=size,
+        )
+        self._total_size += size
+        self._evict()
+        return entry
+
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        """Bring an entry written by any worker back into memory"""
+        if not self.persistent:
+            return None
+        found = disk_cache.get(self.name, key)
+        if found is None:
+            return None
+        value, age = found
+        self.disk_hits += 1
+        # Byte values (compressed roadmaps) are sized by length, like on set()
+        size = len(value) if isinstance(value, bytes) else 1
+        return self._store(key, value, size=size, age=age)
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop a single key, return True if it was cached"""
+        on_disk = self.persistent and disk_cache.invalidate(self.name, key)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return on_disk
+        self._total_size -= entry.size
+        return True
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """
+        Drop every key whose string form starts with prefix, return the count
+
+        Other workers keep their in-memory copies until they expire; the
+        shared disk entries are removed for everyone.
+        """
+        removed = 0
+        for key in [k for k in self._entries if canonical_key(k).startswith(prefix)]:
+            self._total_size -= self._entries.pop(key).size
+            removed += 1
+        if self.persistent:
+            removed = max(removed, disk_cache.invalidate_prefix(self.name, prefix))
+        return removed
+
+    def clear(self) -> int:
+        """Drop every entry, return the number removed"""
+        count = len(self._entries)
+        self._entries.clear()
+        self._total_size = 0
+        if self.persistent:
+            count = max(count, disk_cache.clear(self.name))
+        return count
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        is_failure: Optional[Callable[[Any], bool]] = None,
+        size_of: Optional[Callable[[Any], int]] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, computing it with compute() on a miss
+
+        Args:
+            key: Hashable cache key (normalize it before calling)
+            compute: Zero-argument coroutine factory producing the value
+            is_failure: Marks a computed value as a failure to cache negatively
+            size_of: Size of a value for the max_size bound (defaults to 1)
+        """
+        value, _ = await self.get_or_compute_with_status(
+            key, compute, is_failure, size_of
+        )
+        return value
+
+    async def get_or_compute_with_status(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        is_failure: Optional[Callable[[Any], bool]] = None,
+        size_of: Optional[Callable[[Any], int]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Like get_or_compute, also returning whether the value was a cache hit
+
+        Waiting on a concurrent computation of the same key is not a hit.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None or now >= entry.stale_until:
+            entry = self._load(key)
+
+        if entry is not None and now < entry.stale_until:
+            self._entries.move_to_end(key)
+            if entry.negative:
+                self.negative_hits += 1
+                if isinstance(entry.value, BaseException):
+                    raise entry.value
+                return entry.value, True
+            if now < entry.fresh_until:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._schedule_refresh(key, compute, is_failure, size_of)
+            return entry.value, True
+
+        self.misses += 1
+        return await self._compute(key, compute, is_failure, size_of), False
+
+    async def _compute(self, key, compute, is_failure, size_of) -> Any:
+        """Run compute() once per key and store the outcome"""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The computing caller went away; take over the computation
+                return await self._compute(key, compute, is_failure, size_of)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            # Running out of this request's budget says nothing about the key
+            if self.negative_ttl > 0 and not isinstance(e, DeadlineExceeded):
+                self.set(key, e, negative=True)
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so waiter-less futures don't warn
+            raise
+        else:
+            failed = is_failure(value) if is_failure else False
+            if not failed:
+                self.set(key, value, size=size_of(value) if size_of else 1)
+            elif self.negative_ttl > 0:
+                self.set(key, value, negative=True)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _schedule_refresh(self, key, compute, is_failure, size_of) -> None:
+        """Refresh a stale entry in the background (at most once per key)"""
+        if key in self._refreshing or key in self._inflight:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            self.refreshes += 1
+            try:
+                value = await compute()
+            except Exception as e:
+                self.refresh_failures += 1
+                logger.warning(f"Background refresh failed for cache {self.name}: {e}")
+                return
+            finally:
+                self._refreshing.discard(key)
+            if is_failure and is_failure(value):
+                # Keep serving the stale value rather than replacing it with a failure
+                self.refresh_failures += 1
+                return
+            self.set(key, value, size=size_of(value) if size_of else 1)
+
+        # The refresh outlives the request that noticed the stale entry
+        task = asyncio.create_task(refresh(), context=detached_context())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _evict(self) -> None:
+        """Evict least recently used entries until both bounds hold"""
+        while len(self._entries) > self.max_entries or (
+            self.max_size is not None
+            and self._total_size > self.max_size
+            and len(self._entries) > 1
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._total_size -= entry.size
+            self.evictions += 1
+
+    def age_histogram(self) -> Dict[str, int]:
+        """In-memory entries per age bucket"""
+        histogram = {label: 0 for label, _ in AGE_BUCKETS}
+        now = time.monotonic()
+        for entry in self._entries.values():
+            histogram[age_bucket(now - entry.created_at)] += 1
+        return histogram
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size information for reporting"""
+        lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+        served = self.hits + self.stale_hits + self.negative_hits
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "size": self._total_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "evictions": self.evictions,
+            "persistent": self.persistent,
+            "disk_hits": self.disk_hits,
+        }
@@ -0,0 +1,230 @@
+"""
+Per-provider circuit breakers
+
+After enough consecutive provider failures a breaker opens and calls to that
+provider/model fail immediately with CircuitOpen, so callers drop to their
+fallback content (or another provider) instead of waiting on a degraded
+upstream. After reset_timeout a few probe calls are let through (half-open);
+a successful probe closes the breaker, a failed one opens it again.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit for {name} is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    Whether an error says the provider is unhealthy
+
+    Timeouts, connection errors, 5xx and 429 responses count; bad requests,
+    blocked content and unparseable output do not, nor does the request's
+    own deadline running out.
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+
+    # google-api-core and pydantic-ai errors carry the HTTP status
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500 or status == 429
+    return type(error).__name__ in {"ServiceUnavailable", "DeadlineExceeded"}
+
+
+class CircuitBreaker:
+    """Closed / open / half-open state machine for one provider and model"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Open and not yet due for a probe (callers should skip this target)"""
+        return (
+            self.state == OPEN
+            and time.monotonic() - self.opened_at < self.reset_timeout
+        )
+
+    def allow(self) -> None:
+        """
+        Admit a call, moving to half-open once the reset timeout has passed
+
+        Raises:
+            CircuitOpen: If the breaker is open or its probe slots are taken
+        """
+        if self.state == OPEN:
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self.reset_timeout - waited)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self.reset_timeout)
+            self.probes_in_flight += 1
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            self._open()
+        elif (
+            self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def record_ignored(self) -> None:
+        """The call ended without saying anything about provider health"""
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit {self.name}: {self.state} -> {state}")
+            self.state = state
+            if state != HALF_OPEN:
+                self.probes_in_flight = 0
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        Run the block as one call through the breaker
+
+        Raises:
+            CircuitOpen: If the breaker does not admit the call
+        """
+        self.allow()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled, or a stream closed early by its consumer
+            self.record_ignored()
+            raise
+        except Exception as e:
+            if is_provider_failure(e):
+                self.record_failure()
+            else:
+                self.record_ignored()
+            raise
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        retry_after = 0.0
+        if self.state == OPEN:
+            retry_after = max(
+                0.0, self.reset_timeout - (time.monotonic() - self.opened_at)
+            )
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after_seconds": round(retry_after, 1),
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per provider and model, created on first use"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        name = f"{provider}:{model}"
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=self.failure_threshold,
+                reset_timeout=self.reset_timeout,
+                half_open_max_calls=self.half_open_max_calls,
+            )
+        return breaker
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state per provider and model"""
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+
+# Global circuit breaker registry
+circuit_breakers = CircuitBreakerRegistry(
+    failure_threshold=settings.circuit_breaker.failure_threshold,
+    reset_timeout=settings.circuit_breaker.reset_timeout_seconds,
+    half_open_max_calls=settings.circuit_breaker.half_open_max_calls,
+)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic.fields import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -29,6 +31,130 @@ class SecretKeyConfig(BaseSettings):
     )
 
 
+class LLMSchedulerConfig(BaseSettings):
+    max_concurrency: int = Field(default=16, alias="LLM_MAX_CONCURRENCY")
+    model_concurrency: dict[str, int] = Field(
+        default_factory=dict, alias="LLM_MODEL_CONCURRENCY"
+    )
+    requests_per_minute: float = Field(default=300, alias="LLM_REQUESTS_PER_MINUTE")
+    burst: int = Field(default=30, alias="LLM_BURST")
+    max_queued: int = Field(default=200, alias="LLM_MAX_QUEUED")
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class ContextCacheConfig(BaseSettings):
+    enabled: bool = Field(default=True, alias="CONTEXT_CACHE_ENABLED")
+    ttl_seconds: int = Field(default=3600, alias="CONTEXT_CACHE_TTL_SECONDS")
+    refresh_margin_seconds: int = Field(
+        default=600, alias="CONTEXT_CACHE_REFRESH_MARGIN_SECONDS"
+    )
+    # Gemini rejects explicit caches below 1024 tokens (2.5 Flash; 2.5 Pro
+    # needs 4096), so shorter prefixes are sent uncached without trying
+    min_tokens: int = Field(default=1024, alias="CONTEXT_CACHE_MIN_TOKENS")
+    # Cache resources are tied to one model version and cannot be created
+    # for "-latest" aliases; cached calls use the pinned version instead
+    pinned_models: dict[str, str] = Field(
+        default_factory=lambda: {
+            "gemini-flash-latest": "gemini-2.5-flash",
+            "gemini-flash-lite-latest": "gemini-2.5-flash-lite",
+        },
+        alias="CONTEXT_CACHE_PINNED_MODELS",
+    )
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class RoutingConfig(BaseSettings):
+    enabled: bool = Field(default=True, alias="ROUTING_ENABLED")
+    # Gemini model -> equivalent model on OpenRouter
+    openrouter_models: dict[str, str] = Field(
+        default_factory=lambda: {
+            "gemini-flash-latest": "google/gemini-2.5-flash",
+            "gemini-flash-lite-latest": "google/gemini-2.5-flash-lite",
+        },
+        alias="ROUTING_OPENROUTER_MODELS",
+    )
+    hedge_min_delay: float = Field(default=0.25, alias="ROUTING_HEDGE_MIN_DELAY")
+    explore_rate: float = Field(default=0.05, alias="ROUTING_EXPLORE_RATE")
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class CircuitBreakerConfig(BaseSettings):
+    failure_threshold: int = Field(default=5, alias="CIRCUIT_FAILURE_THRESHOLD")
+    reset_timeout_seconds: float = Field(
+        default=30.0, alias="CIRCUIT_RESET_TIMEOUT_SECONDS"
+    )
+    half_open_max_calls: int = Field(default=1, alias="CIRCUIT_HALF_OPEN_MAX_CALLS")
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class PrewarmConfig(BaseSettings):
+    enabled: bool = Field(default=True, alias="PREWARM_ENABLED")
+    max_concurrent: int = Field(default=2, alias="PREWARM_MAX_CONCURRENT")
+    # Written by scripts/warm_cache.py, loaded into the caches at startup
+    cache_file: str = Field(default="cache/warm_cache.jsonl", alias="WARM_CACHE_FILE")
+    # Reloading resets the records' TTLs; keep it below the shortest cache TTL
+    cache_file_reload_seconds: float = Field(
+        default=60 * 60, alias="WARM_CACHE_RELOAD_SECONDS"
+    )
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class DiskCacheConfig(BaseSettings):
+    enabled: bool = Field(default=True, alias="DISK_CACHE_ENABLED")
+    # Shared by every worker; put it on a local disk, not a network mount
+    path: str = Field(default="cache/llm_cache.sqlite3", alias="DISK_CACHE_PATH")
+    max_mb: int = Field(default=512, alias="DISK_CACHE_MAX_MB")
+    compress_min_bytes: int = Field(default=1024, alias="DISK_CACHE_COMPRESS_MIN_BYTES")
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class AdminConfig(BaseSettings):
+    # Bearer token for /admin; the admin API is disabled when unset
+    token: Optional[str] = Field(default=None, alias="ADMIN_TOKEN")
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class EvaluatorConfig(BaseSettings):
+    # Greedy decoding plus a cache of evaluations per input fingerprint
+    deterministic: bool = Field(default=True, alias="EVALUATION_DETERMINISTIC")
+    cache_ttl_seconds: int = Field(
+        default=7 * 24 * 60 * 60, alias="EVALUATION_CACHE_TTL_SECONDS"
+    )
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
 class Config(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -39,6 +165,14 @@ class Config(BaseSettings):
     gemini: GeminiConfig = Field(default_factory=GeminiConfig)
     openrouter: OpenRouterConfig = Field(default_factory=OpenRouterConfig)
     secrets: SecretKeyConfig = Field(default_factory=SecretKeyConfig)
+    llm_scheduler: LLMSchedulerConfig = Field(default_factory=LLMSchedulerConfig)
+    context_cache: ContextCacheConfig = Field(default_factory=ContextCacheConfig)
+    routing: RoutingConfig = Field(default_factory=RoutingConfig)
+    circuit_breaker: CircuitBreakerConfig = Field(default_factory=CircuitBreakerConfig)
+    prewarm: PrewarmConfig = Field(default_factory=PrewarmConfig)
+    disk_cache: DiskCacheConfig = Field(default_factory=DiskCacheConfig)
+    admin: AdminConfig = Field(default_factory=AdminConfig)
+    evaluator: EvaluatorConfig = Field(default_factory=EvaluatorConfig)
 
 
 settings = Config()
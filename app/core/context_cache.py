@@ -0,0 +1,355 @@
+"""
+Provider-side context caching for long static prompt prefixes
+
+Static prefixes (agent system prompts, fixed instruction blocks) are
+registered once at import time. The prefix cache creates a provider cache
+resource for each of them in the background and refreshes it before it
+expires while it is still being used. Call sites ask for a handle on every
+request; until one is ready, or after the provider rejected or lost it, they
+send the full prompt as before, so caching never blocks a request.
+
+Prefixes shorter than the provider's minimum cache size are never sent for
+caching. Cache resources belong to a pinned model version, so model aliases
+are resolved through the pinned model map when a prefix is registered and
+cached calls must use PrefixCache.model() rather than the alias.
+
+Time-to-first-token is recorded per prefix for cached and uncached calls so
+the effect can be compared at /metrics/context-cache.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+import warnings
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import google.generativeai as genai
+
+from app.core.config import settings
+from app.core.deadline import detached_context
+from app.core.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# The cache resource owns the system instruction, so pydantic-ai dropping the
+# agent's own copy from cached requests is expected
+warnings.filterwarnings(
+    "ignore", message="`google_cached_content` is set", category=UserWarning
+)
+
+
+class GeminiContextCacheBackend:
+    """Gemini CachedContent resources via google-generativeai"""
+
+    async def create(
+        self, model: str, system_instruction: str, ttl: int
+    ) -> Tuple[str, float]:
+        """Create a cache resource, return (name, expiry as a unix timestamp)"""
+        from app.core.gemini import get_api_key
+
+        api_key = get_api_key()
+        if api_key:
+            genai.configure(api_key=api_key)
+
+        cache = await asyncio.to_thread(
+            genai.caching.CachedContent.create,
+            model=model if model.startswith("models/") else f"models/{model}",
+            system_instruction=system_instruction,
+            ttl=timedelta(seconds=ttl),
+        )
+        return cache.name, cache.expire_time.timestamp()
+
+    async def refresh(self, name: str, ttl: int) -> float:
+        """Extend a cache resource's lifetime, return its new expiry"""
+        cache = await asyncio.to_thread(genai.caching.CachedContent.get, name)
+        await asyncio.to_thread(cache.update, ttl=timedelta(seconds=ttl))
+        return cache.expire_time.timestamp()
+
+
+class MockContextCacheBackend:
+    """
+    In-memory provider stand-in for tests and benchmarks
+
+    generate() simulates prefill cost: every uncached prompt token adds
+    prefill_seconds_per_1k_tokens / 1000 to the time before the first token.
+    """
+
+    def __init__(
+        self,
+        prefill_seconds_per_1k_tokens: float = 0.08,
+        base_latency: float = 0.05,
+        fail_creates: bool = False,
+    ):
+        self.prefill_seconds_per_1k_tokens = prefill_seconds_per_1k_tokens
+        self.base_latency = base_latency
+        self.fail_creates = fail_creates
+        self.caches: Dict[str, Tuple[str, float]] = {}
+        self._ids = itertools.count(1)
+
+    async def create(
+        self, model: str, system_instruction: str, ttl: int
+    ) -> Tuple[str, float]:
+        if self.fail_creates:
+            raise ValueError("Cached content is too small")
+        name = f"cachedContents/mock-{next(self._ids)}"
+        expire_at = time.time() + ttl
+        self.caches[name] = (system_instruction, expire_at)
+        return name, expire_at
+
+    async def refresh(self, name: str, ttl: int) -> float:
+        if name not in self.caches:
+            raise KeyError(f"{name} not found")
+        expire_at = time.time() + ttl
+        self.caches[name] = (self.caches[name][0], expire_at)
+        return expire_at
+
+    async def generate(
+        self,
+        prompt: str,
+        system_instruction: Optional[str] = None,
+        cached_content: Optional[str] = None,
+    ) -> str:
+        """Sleep for the simulated time to first token and echo the prompt"""
+        prefill_text = prompt
+        if cached_content:
+            cached = self.caches.get(cached_content)
+            if cached is None or cached[1] <= time.time():
+                raise KeyError(f"{cached_content} not found")
+        elif system_instruction:
+            prefill_text = system_instruction + prompt
+
+        prefill = estimate_tokens(prefill_text) * self.prefill_seconds_per_1k_tokens
+        await asyncio.sleep(self.base_latency + prefill / 1000)
+        return f"Response to: {prompt[:40]}"
+
+
+@dataclass
+class _Prefix:
+    name: str
+    model: str
+    text: str
+    handle: Optional[str] = None
+    expire_at: float = 0.0
+    last_used: float = 0.0
+    retry_at: float = 0.0
+    creating: Optional[asyncio.Task] = None
+    ttft: Dict[str, Deque[float]] = field(
+        default_factory=lambda: {
+            "cached": deque(maxlen=500),
+            "uncached": deque(maxlen=500),
+        }
+    )
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+
+class PrefixCache:
+    """Registry of static prompt prefixes and their provider cache handles"""
+
+    def __init__(
+        self,
+        backend: Any = None,
+        enabled: bool = True,
+        ttl: int = 3600,
+        refresh_margin: int = 600,
+        idle_ttl: int = 1800,
+        min_tokens: int = 1024,
+        retry_after_failure: int = 1800,
+        refresh_interval: int = 60,
+        pinned_models: Optional[Dict[str, str]] = None,
+    ):
+        self.backend = backend or GeminiContextCacheBackend()
+        self.enabled = enabled
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.idle_ttl = idle_ttl
+        self.min_tokens = min_tokens
+        self.retry_after_failure = retry_after_failure
+        self.refresh_interval = refresh_interval
+        self.pinned_models = pinned_models or {}
+        self._prefixes: Dict[str, _Prefix] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.creates = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.invalidations = 0
+
+    def register(self, name: str, model: str, text: str) -> None:
+        """Declare a static prefix; its cache is created on first use"""
+        model = self.pinned_models.get(model, model)
+        self._prefixes[name] = _Prefix(name=name, model=model, text=text)
+
+    def model(self, name: str) -> str:
+        """The pinned model the prefix is cached for; cached calls must use it"""
+        return self._prefixes[name].model
+
+    def text(self, name: str) -> str:
+        """The full prefix text, for uncached calls"""
+        return self._prefixes[name].text
+
+    def handle(self, name: str) -> Optional[str]:
+        """
+        Provider cache name for the prefix, or None to send it uncached
+
+        A miss schedules creation in the background rather than waiting.
+        """
+        prefix = self._prefixes.get(name)
+        if prefix is None or not self.enabled:
+            return None
+
+        now = time.time()
+        prefix.last_used = now
+        # Leave headroom so the handle does not expire mid-request
+        if prefix.handle and prefix.expire_at - now > 30:
+            self.hits += 1
+            return prefix.handle
+
+        self.misses += 1
+        prefix.handle = None
+        self._schedule_create(prefix)
+        return None
+
+    def invalidate(self, name: str) -> None:
+        """Forget a handle the provider rejected; the next miss recreates it"""
+        prefix = self._prefixes.get(name)
+        if prefix is not None and prefix.handle:
+            logger.warning(f"Context cache for '{name}' was rejected, recreating")
+            prefix.handle = None
+            self.invalidations += 1
+
+    def record_ttft(self, name: str, cached: bool, seconds: float) -> None:
+        prefix = self._prefixes.get(name)
+        if prefix is not None:
+            prefix.ttft["cached" if cached else "uncached"].append(seconds)
+
+    def _schedule_create(self, prefix: _Prefix) -> None:
+        if prefix.creating is not None or time.time() < prefix.retry_at:
+            return
+        if estimate_tokens(prefix.text) < self.min_tokens:
+            return
+        try:
+            prefix.creating = asyncio.get_running_loop().create_task(
+                self._create(prefix), context=detached_context()
+            )
+        except RuntimeError:
+            # No event loop (e.g. import-time use), stay uncached
+            pass
+
+    async def _create(self, prefix: _Prefix) -> None:
+        try:
+            prefix.handle, prefix.expire_at = await self.backend.create(
+                prefix.model, prefix.text, self.ttl
+            )
+            self.creates += 1
+            logger.info(f"Created context cache for '{prefix.name}' ({prefix.model})")
+        except Exception as e:
+            self.failures += 1
+            prefix.retry_at = time.time() + self.retry_after_failure
+            logger.warning(
+                f"Could not create context cache for '{prefix.name}', "
+                f"sending it uncached: {e}"
+            )
+        finally:
+            prefix.creating = None
+
+    async def refresh_due(self) -> None:
+        """Extend handles close to expiry that are in use, let idle ones lapse"""
+        now = time.time()
+        for prefix in list(self._prefixes.values()):
+            if not prefix.handle or prefix.expire_at - now > self.refresh_margin:
+                continue
+            if now - prefix.last_used > self.idle_ttl:
+                logger.info(
+                    f"Context cache for '{prefix.name}' idle, letting it expire"
+                )
+                prefix.handle = None
+                continue
+            try:
+                prefix.expire_at = await self.backend.refresh(prefix.handle, self.ttl)
+                self.refreshes += 1
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Could not refresh context cache '{prefix.name}': {e}")
+                prefix.handle = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.error(f"Context cache refresh failed: {e}")
+
+    async def start(self):
+        """Create caches for every registered prefix and start refreshing"""
+        if not self.enabled or self._refresher is not None:
+            return
+        for prefix in self._prefixes.values():
+            self._schedule_create(prefix)
+        self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        for prefix in self._prefixes.values():
+            if prefix.creating is not None:
+                prefix.creating.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Handle state per prefix and TTFT with and without the cache"""
+        prefixes = {}
+        now = time.time()
+        for name, prefix in self._prefixes.items():
+            ttft = {}
+            for kind, samples in prefix.ttft.items():
+                values = list(samples)
+                ttft[kind] = {
+                    "count": len(values),
+                    "p50": _percentile(values, 0.5),
+                    "p95": _percentile(values, 0.95),
+                }
+            prefixes[name] = {
+                "model": prefix.model,
+                "estimated_tokens": estimate_tokens(prefix.text),
+                "cached": bool(prefix.handle),
+                "expires_in_seconds": (
+                    round(prefix.expire_at - now) if prefix.handle else None
+                ),
+                "ttft_seconds": ttft,
+            }
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "creates": self.creates,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "invalidations": self.invalidations,
+            "prefixes": prefixes,
+        }
+
+
+# Global prefix cache instance
+prefix_cache = PrefixCache(
+    enabled=settings.context_cache.enabled,
+    ttl=settings.context_cache.ttl_seconds,
+    refresh_margin=settings.context_cache.refresh_margin_seconds,
+    min_tokens=settings.context_cache.min_tokens,
+    pinned_models=settings.context_cache.pinned_models,
+)
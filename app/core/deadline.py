@@ -0,0 +1,216 @@
+"""
+Request-scoped deadlines
+
+A route sets its latency budget once with route_deadline(); the deadline is
+carried in a contextvar, so every agent, HTTP and executor call made while
+handling the request (including tasks it spawns) sees it without passing it
+around. Downstream calls wrap their awaits in bounded(), which times them
+out at the earlier of their own timeout and the time left in the budget.
+
+When the budget runs out, bounded() raises DeadlineExceeded. Callers treat
+it like any other failure of an optional part: the search source, quiz or
+LLM stage is dropped and whatever was already gathered is returned.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Overall latency budget per route, in seconds
+ROUTE_DEADLINES: Dict[str, float] = {
+    "prompting.chat": 30.0,
+    "prompting.analyze": 8.0,
+    "prompting.summarize": 90.0,
+    "prompting.presentation": 30.0,
+    "workflow.questions": 15.0,
+    "workflow.search_tools": 30.0,
+    "workflow.roadmap": 60.0,
+    "evaluator.evaluate": 45.0,
+    "evaluator.evaluate_stream": 45.0,
+    # Streams are held to their budget between chunks by until_disconnected;
+    # the map-reduce summary stream shares the summarize stream's budget
+    "prompting.chat_stream": 60.0,
+    "prompting.summarize_stream": 120.0,
+}
+DEFAULT_ROUTE_DEADLINE = 30.0
+
+
+class DeadlineExceeded(Exception):
+    """The request's latency budget ran out before the call finished"""
+
+
+@dataclass
+class _RouteBudget:
+    route: str
+    seconds: float
+    exceeded: bool = False
+
+
+# Absolute time.monotonic() deadline, None when unbounded
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+_budget: contextvars.ContextVar[Optional[_RouteBudget]] = contextvars.ContextVar(
+    "request_budget", default=None
+)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Limit the block to seconds, never extending an enclosing deadline"""
+    at = time.monotonic() + max(0.0, seconds)
+    current = _deadline.get()
+    if current is not None:
+        at = min(at, current)
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def route_deadline(route: str) -> Iterator[None]:
+    """Apply a route's latency budget to the block and record how it went"""
+    seconds = ROUTE_DEADLINES.get(route, DEFAULT_ROUTE_DEADLINE)
+    budget = _RouteBudget(route, seconds)
+    token = _budget.set(budget)
+    started = time.monotonic()
+    try:
+        with deadline(seconds):
+            yield
+    finally:
+        _budget.reset(token)
+        deadline_stats.record(budget, time.monotonic() - started)
+
+
+@contextmanager
+def deadline_share(fraction: float) -> Iterator[None]:
+    """Limit the block to a fraction of the time left, leaving the rest"""
+    left = remaining()
+    if left is None:
+        yield
+        return
+    with deadline(left * fraction):
+        yield
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current deadline, None when unbounded"""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return max(0.0, at - time.monotonic())
+
+
+def expired() -> bool:
+    """Whether the current deadline has passed"""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check_deadline(what: str = "") -> None:
+    """
+    Raise if the current deadline has passed
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    if expired():
+        raise _exceeded(what)
+
+
+def detached_context() -> contextvars.Context:
+    """
+    A copy of the current context without the deadline
+
+    Pass it as create_task(..., context=...) for background work that should
+    outlive the request (refreshes, speculative searches, summaries).
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    context.run(_budget.set, None)
+    return context
+
+
+def _exceeded(what: str) -> DeadlineExceeded:
+    budget = _budget.get()
+    if budget is not None:
+        budget.exceeded = True
+        return DeadlineExceeded(
+            f"{budget.route} deadline ({budget.seconds:g}s) exceeded{what}"
+        )
+    return DeadlineExceeded(f"Deadline exceeded{what}")
+
+
+async def bounded(awaitable: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Await with the earlier of timeout and the current deadline
+
+    Raises:
+        DeadlineExceeded: If the deadline cut the call short
+        asyncio.TimeoutError: If the call's own timeout expired first
+    """
+    left = remaining()
+    if left is None or (timeout is not None and timeout <= left):
+        if timeout is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, timeout)
+
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise _exceeded(" before the call started")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise _exceeded("") from None
+
+
+class DeadlineStats:
+    """Requests per route and how many ran out of budget"""
+
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, budget: _RouteBudget, elapsed: float):
+        stats = self._routes.setdefault(
+            budget.route,
+            {
+                "deadline_seconds": budget.seconds,
+                "requests": 0,
+                "exceeded": 0,
+                "max_elapsed_seconds": 0.0,
+            },
+        )
+        stats["requests"] += 1
+        if budget.exceeded:
+            stats["exceeded"] += 1
+            logger.warning(
+                f"{budget.route} ran out of its {budget.seconds:g}s budget, "
+                "returned partial results"
+            )
+        stats["max_elapsed_seconds"] = round(
+            max(stats["max_elapsed_seconds"], elapsed), 3
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for route, stats in self._routes.items():
+            result[route] = {
+                **stats,
+                "exceeded_rate": round(stats["exceeded"] / stats["requests"], 4),
+            }
+        return result
+
+
+# Global deadline stats instance
+deadline_stats = DeadlineStats()
@@ -0,0 +1,446 @@
+"""
+Persistent LLM response cache shared across workers
+
+A SQLite database in WAL mode backs the in-memory TTL caches created with
+persistent=True. Each cache is a namespace with its own TTL; keys are stored
+as a SHA-256 hash of the canonical request key. WAL lets every uvicorn worker
+read while one writes, so a response computed by one worker (or before a
+restart) is served by all of them.
+
+Reads are a single primary-key lookup (well under a millisecond) and never
+write: last-access times are batched in memory. Writes are short
+transactions that wait at most busy_timeout_ms for another worker's lock and
+are then dropped, since a missing cache entry only costs a recomputation.
+Large values are zlib-compressed. Flushing access times and evicting least
+recently used entries over the size limit (full-table scans) run in a worker
+thread, off the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Value codecs
+_JSON = 0
+_BYTES = 1
+
+# Last-access times are only rewritten when older than this, so hot keys
+# don't turn every read into a write
+ACCESS_RESOLUTION_SECONDS = 60.0
+
+# Check the size limit every this many writes
+EVICTION_CHECK_INTERVAL = 100
+
+# Flush batched access times once this many are pending; beyond the cap new
+# ones are dropped until the flush has run
+ACCESS_FLUSH_SIZE = 100
+MAX_PENDING_ACCESSES = 10000
+
+# Entry age histogram buckets: (label, upper bound in seconds)
+AGE_BUCKETS: List[Tuple[str, float]] = [
+    ("<1m", 60),
+    ("<10m", 10 * 60),
+    ("<1h", 60 * 60),
+    ("<6h", 6 * 60 * 60),
+    ("<24h", 24 * 60 * 60),
+    (">=24h", float("inf")),
+]
+
+
+def age_bucket(age: float) -> str:
+    for label, bound in AGE_BUCKETS:
+        if age < bound:
+            return label
+    return AGE_BUCKETS[-1][0]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    raw_key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    codec INTEGER NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+"""
+
+
+def canonical_key(key: Hashable) -> str:
+    """String form of a cache key (kept alongside the hash for prefix matching)"""
+    if isinstance(key, str):
+        return key
+    return json.dumps(key, sort_keys=True, default=str)
+
+
+def disk_key(key: Hashable) -> str:
+    """Canonical request hash for a cache key"""
+    return hashlib.sha256(canonical_key(key).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """Namespaced, size-bounded SQLite key-value store with per-entry expiry"""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        compress_min_bytes: int = 1024,
+        busy_timeout_ms: int = 50,
+        enabled: bool = True,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.compress_min_bytes = compress_min_bytes
+        self.busy_timeout_ms = busy_timeout_ms
+        self.enabled = enabled
+        # sqlite3 connections can't be shared between threads
+        self._local = threading.local()
+        self._writes_since_check = 0
+        self._disabled_reason: Optional[str] = None
+        # (namespace, hashed key) -> last access time, not yet written
+        self._accessed: Dict[Tuple[str, str], float] = {}
+        self._maintenance: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.dropped_writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not self.enabled:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(
+                    self.path,
+                    timeout=self.busy_timeout_ms / 1000,
+                    isolation_level=None,  # autocommit; each statement is a transaction
+                    check_same_thread=False,
+                )
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+                if "raw_key" not in columns:
+                    # Files written before prefix invalidation existed
+                    conn.execute(
+                        "ALTER TABLE entries ADD COLUMN raw_key TEXT NOT NULL DEFAULT ''"
+                    )
+            except (sqlite3.Error, OSError) as e:
+                # Unusable file (read-only volume, corruption): run memory-only
+                logger.warning(f"Disk cache {self.path} disabled: {e}")
+                self.enabled = False
+                self._disabled_reason = str(e)
+                return None
+            self._local.conn = conn
+        return conn
+
+    def _encode(self, value: Any) -> Tuple[bytes, int, bool]:
+        if isinstance(value, bytes):
+            data, codec = value, _BYTES
+        else:
+            data, codec = json.dumps(value).encode("utf-8"), _JSON
+        if len(data) >= self.compress_min_bytes:
+            packed = zlib.compress(data)
+            # Already-compressed payloads (roadmaps) don't shrink
+            if len(packed) < len(data):
+                return packed, codec, True
+        return data, codec, False
+
+    @staticmethod
+    def _decode(data: bytes, codec: int, compressed: bool) -> Any:
+        if compressed:
+            data = zlib.decompress(data)
+        if codec == _BYTES:
+            return data
+        return json.loads(data)
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Look up an unexpired entry
+
+        Returns:
+            (value, age in seconds), or None on a miss
+        """
+        conn = self._connection()
+        if conn is None:
+            return None
+        hashed = disk_key(key)
+        now = time.time()
+        try:
+            row = conn.execute(
+                "SELECT value, codec, compressed, created_at, expires_at, accessed_at "
+                "FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, hashed),
+            ).fetchone()
+            if row is None or row[4] <= now:
+                self.misses += 1
+                return None
+            value = self._decode(row[0], row[1], bool(row[2]))
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            self.errors += 1
+            logger.warning(f"Disk cache read failed for {namespace}: {e}")
+            return None
+
+        if (
+            now - row[5] > ACCESS_RESOLUTION_SECONDS
+            and len(self._accessed) < MAX_PENDING_ACCESSES
+        ):
+            # Written by the next maintenance run; LRU order is best effort
+            self._accessed[(namespace, hashed)] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._schedule_maintenance()
+        self.hits += 1
+        return value, max(0.0, now - row[3])
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: float) -> bool:
+        """Store a value for ttl seconds, return False if it was not written"""
+        conn = self._connection()
+        if conn is None or ttl <= 0:
+            return False
+        try:
+            data, codec, compressed = self._encode(value)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Not persisting {namespace} value: {e}")
+            return False
+
+        now = time.time()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, raw_key, value, codec, "
+                "compressed, size, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    namespace,
+                    disk_key(key),
+                    canonical_key(key),
+                    data,
+                    codec,
+                    int(compressed),
+                    len(data),
+                    now,
+                    now + ttl,
+                    now,
+                ),
+            )
+        except sqlite3.OperationalError as e:
+            # Another worker holds the write lock; skip rather than block
+            self.dropped_writes += 1
+            logger.debug(f"Disk cache write dropped for {namespace}: {e}")
+            return False
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Disk cache write failed for {namespace}: {e}")
+            return False
+
+        self.writes += 1
+        self._writes_since_check += 1
+        if self._writes_since_check >= EVICTION_CHECK_INTERVAL:
+            self._schedule_maintenance()
+        return True
+
+    def _schedule_maintenance(self) -> None:
+        """Flush access times and evict in a worker thread, one run at a time"""
+        if self._maintenance is not None and not self._maintenance.done():
+            return
+        self._writes_since_check = 0
+        accessed, self._accessed = self._accessed, {}
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, worker threads): nothing to stall
+            self.maintain(accessed)
+            return
+        self._maintenance = loop.create_task(asyncio.to_thread(self.maintain, accessed))
+
+    def maintain(self, accessed: Dict[Tuple[str, str], float]) -> int:
+        """Write batched access times, then evict; returns entries removed"""
+        conn = self._connection()
+        if conn is None:
+            return 0
+        if accessed:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "UPDATE entries SET accessed_at = ? "
+                        "WHERE namespace = ? AND key = ? AND accessed_at < ?",
+                        [
+                            (at, namespace, key, at)
+                            for (namespace, key), at in accessed.items()
+                        ],
+                    )
+                    conn.execute("COMMIT")
+                except sqlite3.Error:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                # Locked by another worker; LRU order is best effort
+                logger.debug(f"Disk cache access times dropped: {e}")
+        return self.evict()
+
+    def invalidate(self, namespace: str, key: Hashable) -> bool:
+        conn = self._connection()
+        if conn is None:
+            return False
+        try:
+            cursor = conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, disk_key(key)),
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Disk cache invalidate failed for {namespace}: {e}")
+            return False
+        return cursor.rowcount > 0
+
+    def invalidate_prefix(self, namespace: str, prefix: str) -> int:
+        """Drop a namespace's entries whose key starts with prefix"""
+        conn = self._connection()
+        if conn is None:
+            return 0
+        try:
+            cursor = conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND substr(raw_key, 1, ?) = ?",
+                (namespace, len(prefix), prefix),
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Disk cache invalidate failed for {namespace}: {e}")
+            return 0
+        return cursor.rowcount
+
+    def clear(self, namespace: str) -> int:
+        """Drop every entry of a namespace, return the number removed"""
+        conn = self._connection()
+        if conn is None:
+            return 0
+        try:
+            cursor = conn.execute(
+                "DELETE FROM entries WHERE namespace = ?", (namespace,)
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Disk cache clear failed for {namespace}: {e}")
+            return 0
+        return cursor.rowcount
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones over max_bytes"""
+        conn = self._connection()
+        if conn is None:
+            return 0
+        removed = 0
+        try:
+            removed += conn.execute(
+                "DELETE FROM entries WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            (total,) = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            while total > self.max_bytes:
+                # Remove the oldest tenth (at least one entry) per pass
+                rows = conn.execute(
+                    "SELECT namespace, key, size FROM entries "
+                    "ORDER BY accessed_at LIMIT MAX(1, (SELECT COUNT(*) FROM entries) / 10)"
+                ).fetchall()
+                if not rows:
+                    break
+                conn.executemany(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                    [(namespace, key) for namespace, key, _ in rows],
+                )
+                total -= sum(size for _, _, size in rows)
+                removed += len(rows)
+        except sqlite3.OperationalError as e:
+            # Another worker is writing; it (or our next check) will evict
+            logger.debug(f"Disk cache eviction skipped: {e}")
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Disk cache eviction failed: {e}")
+        self.evictions += removed
+        return removed
+
+    def namespace_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Entry count and stored bytes per namespace"""
+        conn = self._connection()
+        if conn is None:
+            return {}
+        try:
+            rows = conn.execute(
+                "SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace"
+            ).fetchall()
+        except sqlite3.Error:
+            return {}
+        return {
+            namespace: {"entries": count, "bytes": size}
+            for namespace, count, size in rows
+        }
+
+    def age_histogram(self, namespace: str) -> Dict[str, int]:
+        """Unexpired entries of a namespace per age bucket"""
+        histogram = {label: 0 for label, _ in AGE_BUCKETS}
+        conn = self._connection()
+        if conn is None:
+            return histogram
+        now = time.time()
+        try:
+            rows = conn.execute(
+                "SELECT created_at FROM entries WHERE namespace = ? AND expires_at > ?",
+                (namespace, now),
+            ).fetchall()
+        except sqlite3.Error:
+            return histogram
+        for (created_at,) in rows:
+            histogram[age_bucket(now - created_at)] += 1
+        return histogram
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "disabled_reason": self._disabled_reason,
+            "path": str(self.path),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "dropped_writes": self.dropped_writes,
+            "evictions": self.evictions,
+            "pending_access_times": len(self._accessed),
+            "errors": self.errors,
+            "namespaces": self.namespace_stats(),
+        }
+
+
+# Global disk cache instance
+disk_cache = DiskCache(
+    settings.disk_cache.path,
+    max_bytes=settings.disk_cache.max_mb * 1024 * 1024,
+    compress_min_bytes=settings.disk_cache.compress_min_bytes,
+    enabled=settings.disk_cache.enabled,
+)
@@ -0,0 +1,176 @@
+"""
+Shared helpers for direct google-generativeai calls
+"""
+
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Optional
+
+import google.generativeai as genai
+from google.generativeai.types import HarmBlockThreshold, HarmCategory
+
+from app.core.circuit_breaker import circuit_breakers
+from app.core.context_cache import prefix_cache
+from app.core.deadline import DeadlineExceeded, bounded
+from app.core.llm_scheduler import LLMPriority, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-flash-latest"
+
+# The platform teaches prompting on arbitrary user content, so nothing is blocked
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+}
+
+
+def get_api_key() -> Optional[str]:
+    """Gemini API key from the environment (GEMINI_API_KEY or GOOGLE_API_KEY)"""
+    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+
+def _model(
+    model_name: str,
+    generation_config: Optional[dict],
+    system_prefix: Optional[str],
+    cached_content: Any = None,
+) -> genai.GenerativeModel:
+    if cached_content:
+        return genai.GenerativeModel.from_cached_content(
+            cached_content,
+            generation_config=generation_config,
+            safety_settings=SAFETY_SETTINGS,
+        )
+    return genai.GenerativeModel(
+        model_name=model_name,
+        generation_config=generation_config,
+        safety_settings=SAFETY_SETTINGS,
+        system_instruction=prefix_cache.text(system_prefix) if system_prefix else None,
+    )
+
+
+async def generate_content(
+    contents: Any,
+    model_name: str = DEFAULT_MODEL,
+    generation_config: Optional[dict] = None,
+    priority: LLMPriority = LLMPriority.STANDARD,
+    system_prefix: Optional[str] = None,
+) -> str:
+    """
+    Run a single Gemini generation and return the response text
+
+    system_prefix names a prompt registered with prefix_cache; it is sent as
+    the system instruction, from the provider's context cache when available.
+
+    Raises:
+        ValueError: If Gemini returned no content (e.g. blocked or empty)
+        LLMQueueFull: If the scheduler rejected the call
+        CircuitOpen: If Gemini has been failing for this model
+        DeadlineExceeded: If the request's deadline passed first
+    """
+    api_key = get_api_key()
+    if api_key:
+        genai.configure(api_key=api_key)
+
+    cached_content = prefix_cache.handle(system_prefix) if system_prefix else None
+    model = _model(model_name, generation_config, system_prefix, cached_content)
+
+    # An open breaker fails fast so callers drop to their fallback content
+    async with circuit_breakers.get("google", model_name).guard():
+        async with llm_scheduler.slot(model_name, priority):
+            started = time.monotonic()
+            try:
+                response = await bounded(model.generate_content_async(contents))
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not cached_content:
+                    raise
+                # The cache may have expired or been evicted, retry with the full prompt
+                logger.warning(f"Cached generation for '{system_prefix}' failed: {e}")
+                prefix_cache.invalidate(system_prefix)
+                cached_content = None
+                model = _model(model_name, generation_config, system_prefix)
+                started = time.monotonic()
+                response = await bounded(model.generate_content_async(contents))
+            if system_prefix:
+                prefix_cache.record_ttft(
+                    system_prefix, bool(cached_content), time.monotonic() - started
+                )
+
+    if not response.parts:
+        finish_reason = (
+            response.candidates[0].finish_reason if response.candidates else "unknown"
+        )
+        raise ValueError(f"No response from Gemini. Finish reason: {finish_reason}")
+
+    return response.text
+
+
+async def stream_content(
+    contents: Any,
+    model_name: str = DEFAULT_MODEL,
+    generation_config: Optional[dict] = None,
+    priority: LLMPriority = LLMPriority.STANDARD,
+    system_prefix: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Run a streaming Gemini generation, yielding text chunks as they arrive
+
+    The scheduler slot is held until the stream ends or is closed. A failed
+    context-cache handle is retried with the full prompt, which is only
+    possible before the first chunk.
+
+    Raises:
+        Same as generate_content
+    """
+    api_key = get_api_key()
+    if api_key:
+        genai.configure(api_key=api_key)
+
+    cached_content = prefix_cache.handle(system_prefix) if system_prefix else None
+    model = _model(model_name, generation_config, system_prefix, cached_content)
+
+    async with circuit_breakers.get("google", model_name).guard():
+        async with llm_scheduler.slot(model_name, priority):
+            started = time.monotonic()
+            try:
+                response = await bounded(
+                    model.generate_content_async(contents, stream=True)
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not cached_content:
+                    raise
+                logger.warning(f"Cached generation for '{system_prefix}' failed: {e}")
+                prefix_cache.invalidate(system_prefix)
+                cached_content = None
+                model = _model(model_name, generation_config, system_prefix)
+                started = time.monotonic()
+                response = await bounded(
+                    model.generate_content_async(contents, stream=True)
+                )
+
+            chunks = response.__aiter__()
+            received = False
+            while True:
+                try:
+                    chunk = await bounded(chunks.__anext__())
+                except StopAsyncIteration:
+                    break
+                if not chunk.parts:
+                    continue
+                if not received and system_prefix:
+                    prefix_cache.record_ttft(
+                        system_prefix, bool(cached_content), time.monotonic() - started
+                    )
+                received = True
+                yield chunk.text
+
+    if not received:
+        raise ValueError("No response from Gemini")
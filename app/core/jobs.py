@@ -0,0 +1,243 @@
+"""
+In-process background job queue for long-running generation work
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobPriority(IntEnum):
+    """Lower values are picked up first"""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+
+@dataclass
+class Job:
+    """Single queued unit of work and its outcome"""
+
+    job_id: str
+    kind: str
+    dedupe_key: str
+    priority: JobPriority
+    factory: Callable[[], Awaitable[Any]]
+    status: str = "queued"  # queued, running, succeeded, failed, cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status snapshot without the result payload"""
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority.name.lower(),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue cannot accept more jobs"""
+
+
+class JobManager:
+    """
+    Priority job queue served by a bounded pool of worker tasks
+
+    Identical in-flight jobs (same kind and dedupe key) are merged, and
+    finished jobs are kept for result_ttl seconds so reconnecting clients can
+    collect them (or be handed them again on resubmit) without recomputing.
+    """
+
+    def __init__(
+        self, workers: int = 4, max_queued: int = 200, result_ttl: float = 15 * 60
+    ):
+        self.worker_count = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: list[asyncio.Task] = []
+        self._counter = itertools.count()
+        self.jobs: Dict[str, Job] = {}
+        self._by_key: Dict[tuple[str, str], str] = {}
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    async def start(self):
+        """Start the worker pool (idempotent)"""
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.worker_count)
+        ]
+        logger.info(f"JobManager started with {self.worker_count} workers")
+
+    async def stop(self):
+        """Cancel workers and any unfinished jobs"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self.jobs.values():
+            if not job.finished:
+                self._finish(job, "cancelled", error="Server shutting down")
+        logger.info("JobManager stopped")
+
+    async def submit(
+        self,
+        kind: str,
+        dedupe_key: str,
+        factory: Callable[[], Awaitable[Any]],
+        priority: JobPriority = JobPriority.NORMAL,
+        reuse_finished: bool = True,
+    ) -> Job:
+        """
+        Queue a job, or return the existing job for the same kind and key
+
+        An in-flight duplicate is always reused; a successfully finished one
+        only when reuse_finished is set.
+
+        Raises:
+            JobQueueFull: If max_queued jobs are already waiting
+        """
+        await self.start()
+        self._purge_expired()
+
+        existing_id = self._by_key.get((kind, dedupe_key))
+        existing = self.jobs.get(existing_id) if existing_id else None
+        if existing is not None and (
+            not existing.finished or (reuse_finished and existing.status == "succeeded")
+        ):
+            self.deduplicated += 1
+            return existing
+
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} waiting)")
+
+        job = Job(
+            job_id=str(uuid.uuid4()),
+            kind=kind,
+            dedupe_key=dedupe_key,
+            priority=priority,
+            factory=factory,
+        )
+        self.jobs[job.job_id] = job
+        self._by_key[(kind, dedupe_key)] = job.job_id
+        self._queue.put_nowait((int(priority), next(self._counter), job.job_id))
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID, None if unknown or expired"""
+        self._purge_expired()
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to timeout seconds for a job to finish (long polling)"""
+        if not job.finished and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job (running jobs are left to finish)"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status != "queued":
+            return False
+        self._finish(job, "cancelled")
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is None or job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                try:
+                    result = await job.factory()
+                except asyncio.CancelledError:
+                    self._finish(job, "cancelled", error="Worker cancelled")
+                    raise
+                except Exception as e:
+                    logger.error(f"Job {job.job_id} ({job.kind}) failed: {e}")
+                    self.failed += 1
+                    self._finish(job, "failed", error=str(e))
+                else:
+                    self.succeeded += 1
+                    self._finish(job, "succeeded", result=result)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job: Job, status: str, result: Any = None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.factory = None  # Release references held by the closure
+        job.done.set()
+
+    def _purge_expired(self):
+        """Forget finished jobs older than result_ttl"""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            job = self.jobs.pop(job_id)
+            if self._by_key.get((job.kind, job.dedupe_key)) == job_id:
+                del self._by_key[(job.kind, job.dedupe_key)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and job counters"""
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": statuses,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
+
+
+# Global job manager instance
+job_manager = JobManager()
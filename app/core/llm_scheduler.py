@@ -0,0 +1,253 @@
+"""
+Central admission control for LLM calls
+
+Every model call goes through llm_scheduler.slot(). Each model gets its own
+concurrency cap (slots are handed out by priority, then arrival order) and a
+token-bucket request rate limit. When too many calls are already waiting the
+caller is rejected immediately with LLMQueueFull so the API can answer 429
+instead of piling up requests that would all fail at the provider.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.deadline import bounded
+
+logger = logging.getLogger(__name__)
+
+
+class LLMPriority(IntEnum):
+    """Lower values are admitted first"""
+
+    INTERACTIVE = 0  # Live tutor and workspace streams
+    STANDARD = 1  # Short request/response calls
+    BATCH = 2  # Roadmaps, quizzes and evaluations
+
+
+class LLMQueueFull(Exception):
+    """Raised when a model's wait queue cannot take another call"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Request rate limiter; tokens are reserved so waiters keep their order"""
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take one token, return how long to wait before it may be used"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0 or self.rate <= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class ModelLane:
+    """Concurrency slots, rate limit and counters for one model"""
+
+    def __init__(self, model: str, limit: int, bucket: TokenBucket):
+        self.model = model
+        self.limit = limit
+        self.bucket = bucket
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+        self.admitted: Dict[str, int] = {p.name.lower(): 0 for p in LLMPriority}
+        self.rejected: Dict[str, int] = {p.name.lower(): 0 for p in LLMPriority}
+        self.queue_times: Dict[str, Deque[float]] = {
+            p.name.lower(): deque(maxlen=500) for p in LLMPriority
+        }
+        self.avg_service_time = 2.0
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: LLMPriority):
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        while self._waiters and self.active < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    def record_service_time(self, seconds: float):
+        self.avg_service_time = 0.9 * self.avg_service_time + 0.1 * seconds
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+
+class LLMScheduler:
+    """Per-model admission control shared by every LLM call site"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        model_concurrency: Optional[Dict[str, int]] = None,
+        requests_per_minute: float = 300,
+        burst: int = 30,
+        max_queued: int = 200,
+    ):
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency or {}
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.max_queued = max_queued
+        self._lanes: Dict[str, ModelLane] = {}
+
+    def _lane(self, model: str) -> ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = ModelLane(
+                model,
+                self.model_concurrency.get(model, self.max_concurrency),
+                TokenBucket(self.requests_per_minute / 60, self.burst),
+            )
+            self._lanes[model] = lane
+        return lane
+
+    def _queue_limit(self, priority: LLMPriority) -> int:
+        # Batch work gets half the queue so interactive calls always have room
+        if priority == LLMPriority.BATCH:
+            return self.max_queued // 2
+        return self.max_queued
+
+    def check_admission(
+        self, model: str, priority: LLMPriority = LLMPriority.STANDARD
+    ) -> None:
+        """
+        Reject early when a call for model would not be queued
+
+        Streaming endpoints call this before sending response headers so an
+        overload can still be reported as a 429.
+
+        Raises:
+            LLMQueueFull: If the model's queue is full for this priority
+        """
+        lane = self._lane(model)
+        if lane.active < lane.limit or lane.waiting < self._queue_limit(priority):
+            return
+
+        lane.rejected[priority.name.lower()] += 1
+        retry_after = max(
+            1, math.ceil(lane.avg_service_time * (lane.waiting + 1) / lane.limit)
+        )
+        logger.warning(
+            f"LLM queue full for {model} ({lane.waiting} waiting), "
+            f"rejecting {priority.name.lower()} call"
+        )
+        raise LLMQueueFull(
+            f"Too many requests are waiting for {model}, please retry shortly",
+            retry_after=retry_after,
+        )
+
+    @asynccontextmanager
+    async def slot(
+        self, model: str, priority: LLMPriority = LLMPriority.STANDARD
+    ) -> AsyncIterator[None]:
+        """
+        Hold one concurrency slot for model for the duration of the block
+
+        Raises:
+            LLMQueueFull: If the model's queue is full for this priority
+            DeadlineExceeded: If the request's deadline passed while queued
+        """
+        self.check_admission(model, priority)
+        lane = self._lane(model)
+
+        queued_at = time.monotonic()
+        await bounded(lane.acquire(priority))
+        try:
+            delay = lane.bucket.reserve()
+            if delay > 0:
+                await bounded(asyncio.sleep(delay))
+
+            started_at = time.monotonic()
+            lane.admitted[priority.name.lower()] += 1
+            lane.queue_times[priority.name.lower()].append(started_at - queued_at)
+            try:
+                yield
+            finally:
+                lane.record_service_time(time.monotonic() - started_at)
+        finally:
+            lane.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots in use, queue depth and queue-time percentiles per model"""
+        models = {}
+        for model, lane in self._lanes.items():
+            queue_time = {}
+            for priority, samples in lane.queue_times.items():
+                values = list(samples)
+                queue_time[priority] = {
+                    "p50": _percentile(values, 0.5),
+                    "p95": _percentile(values, 0.95),
+                    "max": round(max(values), 4) if values else 0.0,
+                }
+            models[model] = {
+                "limit": lane.limit,
+                "active": lane.active,
+                "waiting": lane.waiting,
+                "admitted": lane.admitted,
+                "rejected": lane.rejected,
+                "queue_time_seconds": queue_time,
+                "avg_service_time_seconds": round(lane.avg_service_time, 4),
+            }
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "burst": self.burst,
+            "max_queued": self.max_queued,
+            "models": models,
+        }
+
+
+# Global LLM scheduler instance
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.llm_scheduler.max_concurrency,
+    model_concurrency=settings.llm_scheduler.model_concurrency,
+    requests_per_minute=settings.llm_scheduler.requests_per_minute,
+    burst=settings.llm_scheduler.burst,
+    max_queued=settings.llm_scheduler.max_queued,
+)
@@ -0,0 +1,207 @@
+"""
+Token-budgeted prompt assembly
+
+Every agent gets an input token budget. Prompts are assembled from named
+sections; when the estimate exceeds the budget, trimmable sections are cut
+in priority order (lowest first) until it fits, e.g. oldest history, then
+low-ranked tools, then the document tail.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional
+
+from app.core.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Input token budgets per agent / call site
+INPUT_TOKEN_BUDGETS: Dict[str, int] = {
+    "tutor": 4000,
+    "tutor.memory": 3000,
+    "workspace": 8000,
+    "workspace.reduce": 16000,
+    "analysis": 1500,
+    "workflow.questions": 1500,
+    "workflow.roadmap": 8000,
+    "workflow.gemini_web_search": 3000,
+    "evaluator": 12000,
+}
+DEFAULT_INPUT_BUDGET = 8000
+
+TRUNCATION_MARKER = "\n[...truncated to fit the input budget...]\n"
+
+
+@dataclass
+class PromptSection:
+    """One named part of a prompt; priority None means it is never trimmed"""
+
+    name: str
+    text: str = ""
+    items: Optional[List[str]] = None
+    item_separator: str = "\n"
+    priority: Optional[int] = None
+    trim: Literal["tail", "head"] = "tail"
+    min_tokens: int = 0
+    trimmed: bool = False
+
+    def render(self) -> str:
+        if self.items is not None:
+            return self.item_separator.join(self.items)
+        return self.text
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+
+
+class PromptBuilder:
+    """
+    Assemble a prompt from sections within an agent's input budget
+
+    Sections are rendered in the order they were added. Item sections (e.g.
+    history turns or ranked tools) lose whole items from the trimmed end;
+    text sections are cut at the trimmed end and marked as truncated.
+    """
+
+    def __init__(
+        self, agent: str, budget: Optional[int] = None, reserved_tokens: int = 0
+    ):
+        self.agent = agent
+        self.budget = budget or INPUT_TOKEN_BUDGETS.get(agent, DEFAULT_INPUT_BUDGET)
+        self.reserved_tokens = reserved_tokens
+        self.sections: List[PromptSection] = []
+
+    def add(
+        self,
+        name: str,
+        text: str = "",
+        *,
+        items: Optional[List[str]] = None,
+        item_separator: str = "\n",
+        priority: Optional[int] = None,
+        trim: Literal["tail", "head"] = "tail",
+        min_tokens: int = 0,
+    ) -> "PromptBuilder":
+        """Add a section (priority None: fixed; lower priorities trimmed first)"""
+        self.sections.append(
+            PromptSection(
+                name=name,
+                text=text,
+                items=list(items) if items is not None else None,
+                item_separator=item_separator,
+                priority=priority,
+                trim=trim,
+                min_tokens=min_tokens,
+            )
+        )
+        return self
+
+    def section(self, name: str) -> PromptSection:
+        """Look up a section, e.g. to see which items survived fit()"""
+        return next(section for section in self.sections if section.name == name)
+
+    def _total(self) -> int:
+        return self.reserved_tokens + sum(section.tokens for section in self.sections)
+
+    def fit(self) -> Dict[str, str]:
+        """Trim sections to the budget and return their rendered text by name"""
+        original = self._total()
+        overflow = original - self.budget
+
+        trimmable = sorted(
+            (s for s in self.sections if s.priority is not None),
+            key=lambda s: s.priority,
+        )
+        for section in trimmable:
+            if overflow <= 0:
+                break
+            overflow -= self._trim(section, overflow)
+
+        self._record(original)
+        return {section.name: section.render() for section in self.sections}
+
+    def build(self, separator: str = "") -> str:
+        """Trim to the budget and join all sections in order"""
+        return separator.join(self.fit().values())
+
+    def _trim(self, section: PromptSection, overflow: int) -> int:
+        """Cut up to overflow tokens from section, return tokens removed"""
+        before = section.tokens
+        if section.items is not None:
+            while section.items and section.tokens > section.min_tokens:
+                if before - section.tokens >= overflow:
+                    break
+                section.items.pop(0 if section.trim == "head" else -1)
+                section.trimmed = True
+        else:
+            keep_tokens = max(section.min_tokens, before - overflow)
+            keep_chars = max(0, keep_tokens * 4 - len(TRUNCATION_MARKER))
+            if keep_chars < len(section.text):
+                if section.trim == "head":
+                    section.text = (
+                        TRUNCATION_MARKER + section.text[-keep_chars:]
+                        if keep_chars
+                        else TRUNCATION_MARKER
+                    )
+                else:
+                    section.text = section.text[:keep_chars] + TRUNCATION_MARKER
+                section.trimmed = True
+        return before - section.tokens
+
+    def _record(self, original_tokens: int) -> None:
+        used = self._total()
+        trimmed = [s.name for s in self.sections if s.trimmed]
+        prompt_budget_usage.record(self.agent, self.budget, original_tokens, used)
+
+        utilization = round(100 * used / self.budget, 1)
+        if trimmed:
+            logger.info(
+                f"[{self.agent}] Prompt trimmed from {original_tokens} to {used} "
+                f"tokens ({utilization}% of {self.budget}); sections: {', '.join(trimmed)}"
+            )
+        else:
+            logger.debug(
+                f"[{self.agent}] Prompt uses {used}/{self.budget} tokens ({utilization}%)"
+            )
+
+
+class PromptBudgetUsage:
+    """Input budget utilization per agent"""
+
+    def __init__(self):
+        self._agents: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, agent: str, budget: int, requested: int, used: int):
+        stats = self._agents.setdefault(
+            agent,
+            {
+                "budget": budget,
+                "calls": 0,
+                "trimmed_calls": 0,
+                "input_tokens": 0,
+                "trimmed_tokens": 0,
+                "max_requested_tokens": 0,
+            },
+        )
+        stats["calls"] += 1
+        stats["input_tokens"] += used
+        stats["max_requested_tokens"] = max(stats["max_requested_tokens"], requested)
+        if requested > used:
+            stats["trimmed_calls"] += 1
+            stats["trimmed_tokens"] += requested - used
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for agent, stats in self._agents.items():
+            avg = stats["input_tokens"] / stats["calls"] if stats["calls"] else 0
+            result[agent] = {
+                **stats,
+                "avg_input_tokens": round(avg, 1),
+                "avg_utilization": round(avg / stats["budget"], 4),
+            }
+        return result
+
+
+# Global prompt budget usage instance
+prompt_budget_usage = PromptBudgetUsage()
@@ -0,0 +1,448 @@
+"""
+Latency-aware routing and hedged requests across LLM providers
+
+Each (provider, model) target keeps a rolling latency window and an error
+estimate. Every call goes to the target with the best current score; for
+latency-critical routes a second, hedged request is sent to the next target
+once the first has been silent for longer than its p95, and whichever
+answers first wins while the other is cancelled. A target that fails before
+producing anything is failed over to the next one immediately, and targets
+whose circuit breaker is open are skipped altogether.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpen, circuit_breakers
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, bounded
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _breaker(target: "RouteTarget") -> CircuitBreaker:
+    return circuit_breakers.get(target.provider, target.model_name)
+
+
+@dataclass(frozen=True)
+class RouteTarget:
+    """One provider/model pair a route can send calls to"""
+
+    provider: str
+    model_name: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model_name}"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class TargetHealth:
+    """Rolling latency per kind ("first_token" or "response") and error rate"""
+
+    def __init__(self, window: int = 200):
+        self.latencies: Dict[str, Deque[float]] = {
+            "first_token": deque(maxlen=window),
+            "response": deque(maxlen=window),
+        }
+        self.error_rate = 0.0
+        self.successes = 0
+        self.errors = 0
+
+    def record_success(self, kind: str, seconds: float):
+        self.latencies[kind].append(seconds)
+        self.error_rate *= 0.9
+        self.successes += 1
+
+    def record_error(self):
+        self.error_rate = 0.9 * self.error_rate + 0.1
+        self.errors += 1
+
+    def p95(self, kind: str) -> Optional[float]:
+        samples = list(self.latencies[kind])
+        return _percentile(samples, 0.95) if len(samples) >= 5 else None
+
+    def median(self, kind: str) -> Optional[float]:
+        samples = list(self.latencies[kind])
+        return _percentile(samples, 0.5) if len(samples) >= 5 else None
+
+
+class _StreamAttempt:
+    """One target's stream, pumped into a queue by its own task"""
+
+    def __init__(self, target: RouteTarget, hedged: bool):
+        self.target = target
+        self.hedged = hedged
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.getter: Optional[asyncio.Task] = None
+
+    def next_event(self) -> asyncio.Task:
+        self.getter = asyncio.create_task(self.queue.get())
+        return self.getter
+
+    def cancel(self):
+        for task in (self.getter, self.task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+class ModelRouter:
+    """Picks and hedges targets for named routes (one per agent call site)"""
+
+    def __init__(
+        self,
+        cold_latency: float = 2.0,
+        hedge_min_delay: float = 0.25,
+        explore_rate: float = 0.05,
+        error_penalty: float = 4.0,
+    ):
+        self.cold_latency = cold_latency
+        self.hedge_min_delay = hedge_min_delay
+        self.explore_rate = explore_rate
+        self.error_penalty = error_penalty
+        self._routes: Dict[str, List[RouteTarget]] = {}
+        self._health: Dict[str, TargetHealth] = {}
+
+        self.decisions: Dict[str, Dict[str, int]] = {}
+        self.hedges: Dict[str, int] = {}
+        self.hedge_wins: Dict[str, int] = {}
+        self.failovers: Dict[str, int] = {}
+
+    def register(self, route: str, targets: List[RouteTarget]) -> None:
+        """Declare a route's targets, preferred first"""
+        self._routes[route] = targets
+
+    def health(self, target: RouteTarget) -> TargetHealth:
+        health = self._health.get(target.key)
+        if health is None:
+            health = self._health[target.key] = TargetHealth()
+        return health
+
+    def _score(self, target: RouteTarget, kind: str) -> float:
+        health = self.health(target)
+        latency = health.median(kind) or self.cold_latency
+        return latency * (1 + self.error_penalty * health.error_rate)
+
+    def rank(self, route: str, kind: str) -> List[RouteTarget]:
+        """
+        Targets best-first; occasionally promote another to keep estimates fresh
+
+        Targets whose circuit breaker is open are skipped.
+
+        Raises:
+            CircuitOpen: If every target's breaker is open
+        """
+        targets = self._routes[route]
+        available = [t for t in targets if not _breaker(t).is_open]
+        if not available:
+            _breaker(targets[0]).allow()
+        ranked = sorted(available, key=lambda t: self._score(t, kind))
+        if len(ranked) > 1 and random.random() < self.explore_rate:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def _hedge_delay(self, target: RouteTarget, kind: str) -> float:
+        p95 = self.health(target).p95(kind)
+        return max(self.hedge_min_delay, p95 if p95 is not None else self.cold_latency)
+
+    def _count(self, counter: Dict[str, Any], route: str, target_key: str = ""):
+        if target_key:
+            per_route = counter.setdefault(route, {})
+            per_route[target_key] = per_route.get(target_key, 0) + 1
+        else:
+            counter[route] = counter.get(route, 0) + 1
+
+    async def run(
+        self,
+        route: str,
+        call: Callable[[RouteTarget], Awaitable[T]],
+        priority: LLMPriority = LLMPriority.STANDARD,
+        hedge: bool = False,
+    ) -> T:
+        """
+        Await call(target) on the best target, hedging and failing over
+
+        Raises:
+            Exception: The last target's error if every target failed
+            DeadlineExceeded: If the request's deadline passed first
+        """
+        ranked = self.rank(route, "response")
+        self._count(self.decisions, route, ranked[0].key)
+
+        async def attempt(target: RouteTarget) -> T:
+            async with _breaker(target).guard():
+                async with llm_scheduler.slot(target.model_name, priority):
+                    started = time.monotonic()
+                    try:
+                        result = await bounded(call(target))
+                    except (asyncio.CancelledError, LLMQueueFull, DeadlineExceeded):
+                        raise
+                    except Exception:
+                        self.health(target).record_error()
+                        raise
+                    self.health(target).record_success(
+                        "response", time.monotonic() - started
+                    )
+                    return result
+
+        remaining = list(ranked)
+        tasks: Dict[asyncio.Task, RouteTarget] = {}
+
+        def launch() -> RouteTarget:
+            target = remaining.pop(0)
+            tasks[asyncio.create_task(attempt(target))] = target
+            return target
+
+        primary = launch()
+        hedge_at = (
+            time.monotonic() + self._hedge_delay(primary, "response")
+            if hedge and remaining
+            else None
+        )
+        last_error: Optional[BaseException] = None
+        try:
+            while True:
+                timeout = (
+                    None if hedge_at is None else max(0, hedge_at - time.monotonic())
+                )
+                done, _ = await asyncio.wait(
+                    tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedge_at = None
+                    self._count(self.hedges, route)
+                    launch()
+                    continue
+
+                for task in done:
+                    target = tasks.pop(task)
+                    if task.exception() is None:
+                        if target is not primary:
+                            self._count(self.hedge_wins, route)
+                        return task.result()
+                    last_error = task.exception()
+                    if isinstance(last_error, DeadlineExceeded):
+                        # No other target would have any time left either
+                        raise last_error
+                    logger.warning(f"[{route}] {target.key} failed: {last_error}")
+
+                if not tasks:
+                    if not remaining:
+                        raise last_error
+                    hedge_at = None
+                    self._count(self.failovers, route)
+                    launch()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(
+        self,
+        route: str,
+        factory: Callable[[RouteTarget], AsyncIterator[str]],
+        priority: LLMPriority = LLMPriority.INTERACTIVE,
+        hedge: bool = False,
+    ) -> AsyncIterator[str]:
+        """
+        Stream factory(target) from the best target, hedging on first token
+
+        The first target to produce a chunk (or finish) wins; the others are
+        cancelled. Errors after the first chunk are raised to the caller.
+
+        Raises:
+            DeadlineExceeded: If the request's deadline passes mid-stream
+        """
+        ranked = self.rank(route, "first_token")
+        self._count(self.decisions, route, ranked[0].key)
+        remaining = list(ranked)
+        attempts: List[_StreamAttempt] = []
+
+        def launch(hedged: bool) -> _StreamAttempt:
+            attempt = _StreamAttempt(remaining.pop(0), hedged)
+            attempt.task = asyncio.create_task(self._pump(attempt, factory, priority))
+            attempts.append(attempt)
+            return attempt
+
+        primary = launch(hedged=False)
+        hedge_at = (
+            time.monotonic() + self._hedge_delay(primary.target, "first_token")
+            if hedge and remaining
+            else None
+        )
+        try:
+            winner: Optional[_StreamAttempt] = None
+            first: Tuple[str, Any] = ("done", None)
+            getters = {attempt.next_event(): attempt for attempt in attempts}
+            while winner is None:
+                timeout = (
+                    None if hedge_at is None else max(0, hedge_at - time.monotonic())
+                )
+                done, _ = await bounded(
+                    asyncio.wait(
+                        getters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                    )
+                )
+                if not done:
+                    hedge_at = None
+                    self._count(self.hedges, route)
+                    attempt = launch(hedged=True)
+                    getters[attempt.next_event()] = attempt
+                    continue
+
+                for getter in done:
+                    attempt = getters.pop(getter)
+                    kind, value = getter.result()
+                    if kind == "error":
+                        logger.warning(
+                            f"[{route}] {attempt.target.key} failed: {value}"
+                        )
+                        if not getters and not remaining:
+                            raise value
+                        continue
+                    winner, first = attempt, (kind, value)
+                    break
+
+                if winner is None and not getters:
+                    hedge_at = None
+                    self._count(self.failovers, route)
+                    attempt = launch(hedged=False)
+                    getters[attempt.next_event()] = attempt
+
+            if winner.hedged:
+                self._count(self.hedge_wins, route)
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+
+            kind, value = first
+            while kind == "chunk":
+                yield value
+                kind, value = await bounded(winner.queue.get())
+            if kind == "error":
+                raise value
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _pump(
+        self,
+        attempt: _StreamAttempt,
+        factory: Callable[[RouteTarget], AsyncIterator[str]],
+        priority: LLMPriority,
+    ):
+        target = attempt.target
+        health = self.health(target)
+        try:
+            async with _breaker(target).guard():
+                async with llm_scheduler.slot(target.model_name, priority):
+                    started = time.monotonic()
+                    first = True
+                    async for chunk in factory(target):
+                        if first:
+                            health.record_success(
+                                "first_token", time.monotonic() - started
+                            )
+                            first = False
+                        await attempt.queue.put(("chunk", chunk))
+            await attempt.queue.put(("done", None))
+        except asyncio.CancelledError:
+            raise
+        except (LLMQueueFull, CircuitOpen, DeadlineExceeded) as e:
+            # Local back-pressure says nothing about the provider's health
+            await attempt.queue.put(("error", e))
+        except Exception as e:
+            health.record_error()
+            await attempt.queue.put(("error", e))
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-target latency and errors, and routing decisions per route"""
+        targets = {}
+        for key, health in self._health.items():
+            targets[key] = {
+                "successes": health.successes,
+                "errors": health.errors,
+                "error_rate": round(health.error_rate, 4),
+                "latency_seconds": {
+                    kind: {
+                        "samples": len(samples),
+                        "p50": round(_percentile(list(samples), 0.5), 4),
+                        "p95": round(_percentile(list(samples), 0.95), 4),
+                    }
+                    for kind, samples in health.latencies.items()
+                },
+            }
+        return {
+            "routes": {
+                route: [target.key for target in targets_]
+                for route, targets_ in self._routes.items()
+            },
+            "targets": targets,
+            "decisions": self.decisions,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
+
+
+_openrouter_models: Dict[str, Any] = {}
+
+
+def model_for(target: RouteTarget) -> Any:
+    """
+    Model to pass to a pydantic-ai agent run for target
+
+    None keeps the agent's own Gemini model (and its settings).
+    """
+    if target.provider == "google":
+        return None
+    model = _openrouter_models.get(target.model_name)
+    if model is None:
+        from app.base_model import get_openrouter_model
+
+        model = _openrouter_models[target.model_name] = get_openrouter_model(
+            target.model_name
+        )
+    return model
+
+
+def route_targets(model_name: str) -> List[RouteTarget]:
+    """Gemini first, then its OpenRouter counterpart when one is configured"""
+    targets = [RouteTarget("google", model_name)]
+    alternate = settings.routing.openrouter_models.get(model_name)
+    if settings.routing.enabled and alternate and settings.openrouter.api_key:
+        targets.append(RouteTarget("openrouter", alternate))
+    return targets
+
+
+# Global model router instance
+model_router = ModelRouter(
+    hedge_min_delay=settings.routing.hedge_min_delay,
+    explore_rate=settings.routing.explore_rate,
+)
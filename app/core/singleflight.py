@@ -0,0 +1,125 @@
+"""
+Singleflight coalescing for identical in-flight LLM streams
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def coalescing_key(*parts: str) -> str:
+    """Hash of whitespace-normalized request parts (agent, prompt, document...)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(" ".join(part.split()).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class _Flight:
+    """One upstream stream and the chunks it has produced so far"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamCoalescer:
+    """
+    Shares one upstream stream between concurrent identical requests
+
+    The first subscriber for a key starts the upstream call; later subscribers
+    first replay the chunks already produced and then follow the live stream.
+    The upstream call is cancelled once every subscriber has gone away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+        self.flights = 0
+        self.coalesced = 0
+        self.replayed_chunks = 0
+        self.abandoned = 0
+
+    async def subscribe(
+        self, key: str, factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Stream chunks for key, starting factory() only if nobody else has"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._produce(key, flight, factory))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+            self.replayed_chunks += len(flight.chunks)
+
+        flight.subscribers += 1
+        try:
+            index = 0
+            while True:
+                wakeup = flight.wakeup
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await wakeup.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more, stop paying for the stream
+                self.abandoned += 1
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    async def _produce(
+        self, key: str, flight: _Flight, factory: Callable[[], AsyncIterator[str]]
+    ):
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                self._notify(flight)
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            logger.error(f"Coalesced stream failed: {e}")
+            flight.error = e
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            self._notify(flight)
+
+    @staticmethod
+    def _notify(flight: _Flight):
+        wakeup, flight.wakeup = flight.wakeup, asyncio.Event()
+        wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """How many requests shared an upstream stream"""
+        requests = self.flights + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "replayed_chunks": self.replayed_chunks,
+            "abandoned": self.abandoned,
+            "coalesce_ratio": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
+
+
+# Global stream coalescer instance
+stream_coalescer = StreamCoalescer()
@@ -0,0 +1,87 @@
+"""
+Helpers for server-sent event streams backed by LLM calls
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+
+from starlette.requests import Request
+
+from app.core.deadline import check_deadline, remaining
+from app.core.supersede import RequestSuperseded, Ticket
+
+# Upper bound on how long an abandoned stream keeps pulling from the model
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class ClientDisconnected(Exception):
+    """Raised when the SSE client went away mid-stream"""
+
+
+async def until_disconnected(
+    request: Request,
+    chunks: AsyncIterator[str],
+    poll_interval: float = DISCONNECT_POLL_INTERVAL,
+    ticket: Optional[Ticket] = None,
+) -> AsyncIterator[str]:
+    """
+    Relay chunks while the client is connected (and the request is current)
+
+    The upstream iterator is advanced in its own task so a disconnect is
+    noticed within poll_interval even while the model is silent. On
+    disconnect, or as soon as ticket is superseded, the upstream is
+    cancelled, which closes the model stream and releases its scheduler slot.
+    The same happens when the request's deadline passes, so a route_deadline()
+    around the relay bounds the whole stream, however slowly chunks arrive.
+
+    Raises:
+        ClientDisconnected: If the client disconnected before the end
+        RequestSuperseded: If a newer request replaced ticket
+        DeadlineExceeded: If the request's deadline passed before the end
+    """
+    iterator = chunks.__aiter__()
+
+    async def next_chunk() -> str:
+        return await iterator.__anext__()
+
+    pending = asyncio.create_task(next_chunk())
+    superseded = (
+        asyncio.create_task(ticket.superseded.wait()) if ticket is not None else None
+    )
+    last_check = time.monotonic()
+    try:
+        while True:
+            timeout = max(0.0, poll_interval - (time.monotonic() - last_check))
+            left = remaining()
+            if left is not None:
+                timeout = min(timeout, left)
+            waiting = {pending, superseded} if superseded else {pending}
+            done, _ = await asyncio.wait(
+                waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if ticket is not None and ticket.is_superseded:
+                raise RequestSuperseded()
+
+            if time.monotonic() - last_check >= poll_interval:
+                last_check = time.monotonic()
+                if await request.is_disconnected():
+                    raise ClientDisconnected()
+
+            check_deadline(" mid-stream")
+
+            if pending not in done:
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+            pending = asyncio.create_task(next_chunk())
+    finally:
+        if superseded is not None:
+            superseded.cancel()
+        if not pending.done():
+            pending.cancel()
+        else:
+            await iterator.aclose()
@@ -0,0 +1,506 @@
+"""
+Structured (JSON) LLM output: schema-constrained generation, tolerant
+single-pass parsing, cheap field repair and targeted retries
+"""
+
+import copy
+import json
+import logging
+import re
+import types
+from typing import Any, Awaitable, Callable, Dict, Optional, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.core.gemini import DEFAULT_MODEL, generate_content
+from app.core.llm_scheduler import LLMPriority
+
+logger = logging.getLogger(__name__)
+
+# Per call site counters: calls, clean, repaired, retried, dropped_items, failed
+_metrics: Dict[str, Dict[str, int]] = {}
+
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+
+# Retry callback: (sub-schema, invalid object, error summary) -> corrected object
+RetryFn = Callable[[Any, Any, str], Awaitable[Any]]
+
+
+class StructuredOutputError(Exception):
+    """Raised when LLM output cannot be turned into the requested schema"""
+
+
+def _count(site: str, metric: str, amount: int = 1):
+    site_metrics = _metrics.setdefault(
+        site,
+        {
+            "calls": 0,
+            "clean": 0,
+            "repaired": 0,
+            "retried": 0,
+            "dropped_items": 0,
+            "failed": 0,
+        },
+    )
+    site_metrics[metric] += amount
+
+
+def get_parse_metrics() -> Dict[str, Dict[str, Any]]:
+    """Parse outcome counters and failure rate for each call site"""
+    report = {}
+    for site, counts in _metrics.items():
+        calls = counts["calls"]
+        report[site] = {
+            **counts,
+            "failure_rate": round(counts["failed"] / calls, 4) if calls else 0.0,
+        }
+    return report
+
+
+def extract_json(text: str) -> Any:
+    """
+    Tolerantly decode the first JSON value in an LLM response
+
+    Handles code fences, leading/trailing prose, trailing commas and output
+    truncated mid-structure (unclosed strings, arrays and objects).
+
+    Raises:
+        ValueError: If no JSON value can be recovered
+    """
+    text = _FENCE_RE.sub("", text.strip())
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON value found in response")
+    text = text[min(starts) :]
+
+    decoder = json.JSONDecoder()
+    try:
+        value, _ = decoder.raw_decode(text)
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    repaired = _close_truncated(_TRAILING_COMMA_RE.sub(r"\1", text))
+    try:
+        value, _ = decoder.raw_decode(repaired)
+        return value
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in response: {e}")
+
+
+def _close_truncated(text: str) -> str:
+    """Close any strings, arrays and objects left open by a truncated response"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if not stack and not in_string:
+        return text
+
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # A dangling separator or key can't be completed, so drop it
+    text = re.sub(r'(,|:|,\s*"[^"]*")\s*$', "", text)
+    return text + "".join(reversed(stack))
+
+
+class IncrementalObjectParser:
+    """
+    Parse a JSON object as it streams in, returning each top-level member as
+    soon as its value is complete (text before the opening brace is skipped)
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        """Add streamed text, return the (key, value) members it completed"""
+        self._buffer += chunk
+        members = []
+        while self._pos < len(self._buffer) and not self.done:
+            char = self._buffer[self._pos]
+            if self._member_start is None:
+                if char == "{":
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._member(self._pos))
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                members.extend(self._member(self._pos))
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return members
+
+    def _member(self, end: int) -> list[tuple[str, Any]]:
+        text = self._buffer[self._member_start : end]
+        if not text.strip():
+            return []
+        try:
+            return list(json.loads("{" + text + "}").items())
+        except json.JSONDecodeError:
+            # Left for the final parse of the whole response to repair
+            return []
+
+
+# Schema keys Gemini's response_schema accepts
+_GEMINI_SCHEMA_KEYS = {
+    "type",
+    "format",
+    "description",
+    "nullable",
+    "enum",
+    "items",
+    "properties",
+    "required",
+}
+
+
+def gemini_response_schema(schema: Any) -> dict:
+    """
+    Convert a pydantic model / type into Gemini's OpenAPI schema subset
+
+    $refs are inlined, Optional becomes nullable, and numeric bounds (which
+    Gemini rejects) are folded into the description instead.
+    """
+    json_schema = TypeAdapter(schema).json_schema()
+    defs = json_schema.pop("$defs", {})
+
+    def convert(node: dict) -> dict:
+        if "$ref" in node:
+            node = {
+                **defs[node["$ref"].split("/")[-1]],
+                **{k: v for k, v in node.items() if k != "$ref"},
+            }
+        any_of = node.get("anyOf")
+        if any_of:
+            non_null = [option for option in any_of if option.get("type") != "null"]
+            merged = {k: v for k, v in node.items() if k != "anyOf"}
+            node = {**convert(non_null[0]), **merged, "nullable": True}
+
+        bounds = [
+            f"{label} {node[key]}"
+            for key, label in (("minimum", ">="), ("maximum", "<="))
+            if key in node
+        ]
+        result = {k: v for k, v in node.items() if k in _GEMINI_SCHEMA_KEYS}
+        if bounds:
+            description = result.get("description", "")
+            result["description"] = f"{description} ({', '.join(bounds)})".strip()
+        if "properties" in result:
+            result["properties"] = {
+                name: convert(prop) for name, prop in result["properties"].items()
+            }
+        if "items" in result:
+            result["items"] = convert(result["items"])
+        return result
+
+    return convert(json_schema)
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    """Optional[X] -> X"""
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _annotation_at(schema: Any, loc: tuple) -> Any:
+    """Resolve the type expected at a validation error location"""
+    annotation = schema
+    for part in loc:
+        annotation = _unwrap_optional(annotation)
+        if isinstance(part, int):
+            args = get_args(annotation)
+            annotation = args[0] if args else Any
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            field = annotation.model_fields.get(part)
+            annotation = field.annotation if field else Any
+        else:
+            return Any
+    return _unwrap_optional(annotation)
+
+
+def _empty_value(annotation: Any) -> Any:
+    """Cheap placeholder for a missing field of the given type"""
+    origin = get_origin(annotation) or annotation
+    if origin is str:
+        return ""
+    if origin in (list, tuple, set):
+        return []
+    if origin is bool:
+        return False
+    if origin in (int, float):
+        return 0
+    if origin is dict:
+        return {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {}
+    return None
+
+
+def _get_at(data: Any, path: tuple) -> Any:
+    for part in path:
+        data = data[part]
+    return data
+
+
+def _set_at(data: Any, path: tuple, value: Any):
+    _get_at(data, path[:-1])[path[-1]] = value
+
+
+def _repair_value(error: dict, annotation: Any) -> tuple[bool, Any]:
+    """Cheap type-level fix for one validation error, (fixed, new_value)"""
+    kind = error["type"]
+    value = error.get("input")
+    ctx = error.get("ctx") or {}
+
+    if kind == "missing":
+        # Only collections have a harmless empty value; a missing required
+        # scalar means the object needs a retry instead
+        placeholder = _empty_value(annotation)
+        return isinstance(placeholder, (list, dict)), placeholder
+    if kind == "string_type":
+        if isinstance(value, list):
+            return True, "\n".join(str(item) for item in value)
+        if value is None:
+            return True, ""
+        return True, str(value) if not isinstance(value, dict) else json.dumps(value)
+    if kind == "list_type":
+        if value is None:
+            return True, []
+        return True, [value]
+    if kind in ("int_parsing", "int_from_float", "int_type", "float_parsing"):
+        match = re.search(r"-?\d+(\.\d+)?", str(value))
+        if match:
+            number = float(match.group(0))
+            return True, round(number) if kind != "float_parsing" else number
+    if kind in ("less_than_equal", "less_than") and "le" in ctx:
+        return True, ctx["le"]
+    if kind in ("less_than_equal", "less_than") and "lt" in ctx:
+        return True, ctx["lt"]
+    if kind in ("greater_than_equal", "greater_than") and "ge" in ctx:
+        return True, ctx["ge"]
+    if kind in ("greater_than_equal", "greater_than") and "gt" in ctx:
+        return True, ctx["gt"]
+    if kind in ("bool_parsing", "bool_type"):
+        return True, str(value).strip().lower() in ("true", "yes", "1")
+    return False, value
+
+
+def _item_path(loc: tuple) -> Optional[tuple]:
+    """Path of the innermost list item containing an error location"""
+    for i in range(len(loc) - 1, -1, -1):
+        if isinstance(loc[i], int):
+            return loc[: i + 1]
+    return None
+
+
+async def validate_structured(
+    site: str,
+    data: Any,
+    schema: Any,
+    retry: Optional[RetryFn] = None,
+) -> Any:
+    """
+    Validate decoded JSON against schema, repairing what it cheaply can
+
+    1. Validate the whole value
+    2. Apply type-level repairs for each error (missing fields, wrong scalar
+       types, out-of-range numbers) and re-validate
+    3. For list items that still fail, retry just that sub-object via retry()
+    4. Drop list items that can't be fixed; anything else is a failure
+
+    Raises:
+        StructuredOutputError: If the value can't be made valid
+    """
+    adapter = TypeAdapter(schema)
+    try:
+        result = adapter.validate_python(data)
+        _count(site, "clean")
+        return result
+    except ValidationError as e:
+        errors = e.errors()
+
+    data = copy.deepcopy(data)
+    repaired_any = False
+    for error in errors:
+        loc = tuple(error["loc"])
+        try:
+            fixed, value = _repair_value(error, _annotation_at(schema, loc))
+            if fixed and loc:
+                _set_at(data, loc, value)
+                repaired_any = True
+        except (KeyError, IndexError, TypeError):
+            continue
+
+    try:
+        result = adapter.validate_python(data)
+        _count(site, "repaired")
+        return result
+    except ValidationError as e:
+        errors = e.errors()
+
+    # Remaining errors: retry or drop the invalid list items
+    item_paths = []
+    for error in errors:
+        path = _item_path(tuple(error["loc"]))
+        if path is None:
+            raise StructuredOutputError(
+                f"Unrepairable field {'.'.join(map(str, error['loc']))}: {error['msg']}"
+            )
+        if path not in item_paths:
+            item_paths.append(path)
+
+    retried_any = False
+    dropped = []
+    for path in item_paths:
+        item_schema = _annotation_at(schema, path)
+        item_errors = "; ".join(
+            f"{'.'.join(map(str, err['loc'][len(path) :]))}: {err['msg']}"
+            for err in errors
+            if _item_path(tuple(err["loc"])) == path
+        )
+        if retry is not None:
+            try:
+                fixed_item = await retry(item_schema, _get_at(data, path), item_errors)
+                TypeAdapter(item_schema).validate_python(fixed_item)
+                _set_at(data, path, fixed_item)
+                retried_any = True
+                continue
+            except Exception as retry_error:
+                logger.warning(
+                    f"[{site}] Targeted retry failed at {path}: {retry_error}"
+                )
+        dropped.append(path)
+
+    # Remove from the end so earlier indices stay valid
+    for path in sorted(dropped, key=lambda p: p[-1], reverse=True):
+        del _get_at(data, path[:-1])[path[-1]]
+
+    try:
+        result = adapter.validate_python(data)
+    except ValidationError as e:
+        raise StructuredOutputError(f"Output still invalid after repair: {e}")
+
+    if retried_any:
+        _count(site, "retried")
+    elif repaired_any or dropped:
+        _count(site, "repaired")
+    if dropped:
+        _count(site, "dropped_items", len(dropped))
+        logger.warning(f"[{site}] Dropped {len(dropped)} invalid item(s)")
+    return result
+
+
+async def parse_structured(
+    site: str,
+    text: str,
+    schema: Any,
+    retry: Optional[RetryFn] = None,
+) -> Any:
+    """
+    Decode and validate an LLM response against schema
+
+    Raises:
+        StructuredOutputError: If no valid value can be recovered
+    """
+    _count(site, "calls")
+    try:
+        data = extract_json(text)
+        return await validate_structured(site, data, schema, retry=retry)
+    except (ValueError, StructuredOutputError) as e:
+        _count(site, "failed")
+        logger.error(f"[{site}] Structured output failed: {e}")
+        if isinstance(e, StructuredOutputError):
+            raise
+        raise StructuredOutputError(str(e)) from e
+
+
+async def generate_structured(
+    site: str,
+    contents: Any,
+    schema: Any,
+    model_name: str = DEFAULT_MODEL,
+    generation_config: Optional[dict] = None,
+    retry_invalid: bool = True,
+    priority: LLMPriority = LLMPriority.STANDARD,
+    system_prefix: Optional[str] = None,
+) -> Any:
+    """
+    Generate JSON with Gemini constrained to schema and return it validated
+
+    The schema is sent as the response schema so the model emits conforming
+    JSON; any residual issues go through parse_structured. Invalid list items
+    are retried individually with a small "fix this object" request.
+
+    Raises:
+        StructuredOutputError: If no valid value can be recovered
+    """
+    config = {
+        **(generation_config or {}),
+        "response_mime_type": "application/json",
+        "response_schema": gemini_response_schema(schema),
+    }
+    text = await generate_content(
+        contents, model_name, config, priority, system_prefix=system_prefix
+    )
+
+    async def retry(item_schema: Any, item: Any, errors: str) -> Any:
+        fix_prompt = (
+            "The following JSON object does not match the required schema.\n"
+            f"Validation errors: {errors}\n\n"
+            f"Object:\n{json.dumps(item, default=str)}\n\n"
+            "Return ONLY the corrected JSON object, keeping all valid content."
+        )
+        fixed_text = await generate_content(
+            fix_prompt,
+            model_name,
+            {
+                "response_mime_type": "application/json",
+                "response_schema": gemini_response_schema(item_schema),
+            },
+            priority,
+        )
+        return extract_json(fixed_text)
+
+    return await parse_structured(
+        site, text, schema, retry=retry if retry_invalid else None
+    )
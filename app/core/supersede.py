@@ -0,0 +1,89 @@
+"""
+Per-session "latest wins" tracking for in-flight requests
+"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, Tuple
+
+
+class RequestSuperseded(Exception):
+    """Raised when a newer request of the same kind replaced this one"""
+
+
+class Ticket:
+    """Handle for one in-flight request; set once a newer request arrives"""
+
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.superseded = asyncio.Event()
+
+    @property
+    def is_superseded(self) -> bool:
+        return self.superseded.is_set()
+
+
+class LatestWins:
+    """
+    Keeps only the newest request per (session, kind) alive
+
+    claim() marks any older ticket for the same session and kind as
+    superseded; whatever is running under that ticket is cancelled by run()
+    or by the stream relay and reports a superseded status to its client.
+    """
+
+    def __init__(self):
+        self._current: Dict[Tuple[str, str], Ticket] = {}
+
+        self.claimed = 0
+        self.superseded: Dict[str, int] = {}
+
+    def claim(self, session_id: str, kind: str) -> Ticket:
+        """Register a new request, superseding the previous one of its kind"""
+        key = (session_id, kind)
+        previous = self._current.get(key)
+        if previous is not None:
+            previous.superseded.set()
+            self.superseded[kind] = self.superseded.get(kind, 0) + 1
+
+        ticket = Ticket(key)
+        self._current[key] = ticket
+        self.claimed += 1
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        """Forget a finished request unless something newer replaced it"""
+        if self._current.get(ticket.key) is ticket:
+            del self._current[ticket.key]
+
+    async def run(self, ticket: Ticket, awaitable: Awaitable[Any]) -> Any:
+        """
+        Await work for ticket, cancelling it if the ticket gets superseded
+
+        Raises:
+            RequestSuperseded: If a newer request replaced this one first
+        """
+        work = asyncio.ensure_future(awaitable)
+        watcher = asyncio.create_task(ticket.superseded.wait())
+        try:
+            await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not work.done():
+                work.cancel()
+                raise RequestSuperseded()
+            return work.result()
+        finally:
+            watcher.cancel()
+            if not work.done():
+                work.cancel()
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests claimed and superseded per kind"""
+        return {
+            "in_flight": len(self._current),
+            "claimed": self.claimed,
+            "superseded": self.superseded,
+        }
+
+
+# Global latest-wins registry instance
+latest_requests = LatestWins()
@@ -0,0 +1,58 @@
+"""
+Rough token estimates and per-stream token accounting
+"""
+
+from typing import Any, Dict
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token for English)"""
+    if not text:
+        return 0
+    return max(1, round(len(text) / 4))
+
+
+class TokenUsage:
+    """Delivered vs wasted output tokens per streaming endpoint"""
+
+    def __init__(self):
+        self._streams: Dict[str, Dict[str, int]] = {}
+
+    def record(self, stream: str, text: str, status: str) -> None:
+        """
+        Record one finished stream
+
+        Args:
+            stream: Endpoint name (e.g. "chat", "summarize")
+            text: Everything generated for the client before the stream ended
+            status: "complete" counts as delivered; "cancelled" or
+                "superseded" as wasted
+        """
+        counters = self._streams.setdefault(
+            stream,
+            {"completed": 0, "cancelled": 0, "delivered_tokens": 0, "wasted_tokens": 0},
+        )
+        tokens = estimate_tokens(text)
+        if status == "complete":
+            counters["completed"] += 1
+            counters["delivered_tokens"] += tokens
+        else:
+            counters["cancelled"] += 1
+            counters["wasted_tokens"] += tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters per stream with the wasted share of generated tokens"""
+        result = {}
+        for stream, counters in self._streams.items():
+            generated = counters["delivered_tokens"] + counters["wasted_tokens"]
+            result[stream] = {
+                **counters,
+                "wasted_ratio": round(counters["wasted_tokens"] / generated, 4)
+                if generated
+                else 0.0,
+            }
+        return result
+
+
+# Global token usage instance
+token_usage = TokenUsage()
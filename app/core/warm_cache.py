@@ -0,0 +1,124 @@
+"""
+Persistent warm-cache file
+
+scripts/warm_cache.py precomputes expensive LLM artifacts offline and appends
+them to a JSON-lines file, one {"cache", "key", "value"} record per line.
+At startup the server loads the file in the background into the named
+in-memory caches (cache_registry), so a fresh deployment starts warm without
+delaying startup, and reloads it periodically so the records outlive the
+caches' TTLs for as long as the file is deployed. Appending line by line lets
+an interrupted run resume.
+"""
+
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.cache import cache_registry
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Records are put into the caches in slices, yielding to the event loop between
+LOAD_SLICE = 500
+
+
+class WarmCacheFile:
+    """Reads and appends warm-cache records; loads them into the caches"""
+
+    def __init__(self, path: str, reload_seconds: float = 60 * 60):
+        self.path = Path(path)
+        # Shorter than the caches' TTLs, so loaded records never expire
+        self.reload_seconds = reload_seconds
+        self._loader: Optional[asyncio.Task] = None
+
+        self.loaded = 0
+        self.skipped = 0
+        self.loads = 0
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Every valid record in the file (a torn last line is ignored)"""
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and {"cache", "key", "value"} <= set(
+                    record
+                ):
+                    yield record
+
+    def keys(self) -> Set[Tuple[str, str]]:
+        """(cache, key) pairs already in the file"""
+        return {(record["cache"], record["key"]) for record in self.records()}
+
+    def append(self, cache: str, key: str, value: Any) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"cache": cache, "key": key, "value": value}) + "\n")
+
+    async def load(self) -> int:
+        """Put every record into its cache, return how many were loaded"""
+        # The file is read in a thread; the caches are only touched on the
+        # event loop since they are not thread-safe
+        records: List[Dict[str, Any]] = await asyncio.to_thread(
+            lambda: list(self.records())
+        )
+        loaded = 0
+        for start in range(0, len(records), LOAD_SLICE):
+            for record in records[start : start + LOAD_SLICE]:
+                cache = cache_registry.get(record["cache"])
+                if cache is None:
+                    self.skipped += 1
+                    continue
+                # Resets the entry's TTL, which is what keeps the file warm
+                cache.set(record["key"], record["value"])
+                loaded += 1
+            await asyncio.sleep(0)
+        self.loaded += loaded
+        self.loads += 1
+        return loaded
+
+    async def _load_periodically(self):
+        while True:
+            if self.path.exists():
+                try:
+                    loaded = await self.load()
+                    if loaded:
+                        logger.info(
+                            f"Loaded {loaded} warm cache entries from {self.path}"
+                        )
+                except Exception as e:
+                    logger.warning(f"Could not load warm cache file {self.path}: {e}")
+            await asyncio.sleep(self.reload_seconds)
+
+    def start(self) -> None:
+        """Load the file (and reload it periodically) without holding up startup"""
+        if self._loader is None:
+            self._loader = asyncio.create_task(self._load_periodically())
+
+    async def stop(self):
+        if self._loader is not None:
+            self._loader.cancel()
+            self._loader = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "exists": self.path.exists(),
+            "loaded": self.loaded,
+            "skipped": self.skipped,
+            "loads": self.loads,
+            "reload_seconds": self.reload_seconds,
+        }
+
+
+# Global warm cache file instance
+warm_cache_file = WarmCacheFile(
+    settings.prewarm.cache_file, settings.prewarm.cache_file_reload_seconds
+)
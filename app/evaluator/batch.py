@@ -0,0 +1,313 @@
+"""
+Batch evaluation
+
+Runs many prompt/output pairs through evaluate_prompt_output concurrently and
+yields one NDJSON line per pair as it finishes, followed by a summary. Calls
+go through the global LLM scheduler at batch priority, behind live
+(standard priority) evaluations; a per-batch limit keeps one large batch from
+filling the scheduler's queue.
+
+Successful results are kept per batch_id. Re-sending a batch with the same
+batch_id (e.g. after a dropped connection) replays the finished pairs and
+only evaluates the rest.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.core.deadline import route_deadline
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull
+from app.core.singleflight import coalescing_key
+from .evaluator_agent import evaluate_prompt_output
+from .models import BatchEvaluationItem
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_ITEMS = 500
+DEFAULT_BATCH_CONCURRENCY = 4
+
+# How often a pair is retried when the LLM queue is full
+QUEUE_FULL_RETRIES = 3
+
+# Finished batches kept for resuming (oldest dropped first)
+MAX_STORED_BATCHES = 50
+
+
+def item_id(item: BatchEvaluationItem) -> str:
+    """The caller's id, or a hash of the pair's content"""
+    if item.id:
+        return item.id
+    return coalescing_key(
+        item.user_prompt,
+        item.ai_output,
+        item.output_type,
+        item.expected_outcome or "",
+        item.ai_model_used or "",
+    )[:16]
+
+
+def parse_batch_file(filename: str, content: bytes) -> List[BatchEvaluationItem]:
+    """
+    Parse an uploaded JSONL or CSV file of evaluation pairs
+
+    CSV files need a header row with at least user_prompt and ai_output.
+
+    Raises:
+        ValueError: If the file type is unsupported or a row is invalid
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("File must be UTF-8 encoded")
+
+    if filename.lower().endswith(".csv"):
+        rows = [
+            # Empty CSV cells mean "not given"
+            {key: value for key, value in row.items() if key and value}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+        first_line = 2
+    elif filename.lower().endswith((".jsonl", ".ndjson")):
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {number}: invalid JSON ({e.msg})")
+        first_line = 1
+    else:
+        raise ValueError("Upload a .jsonl or .csv file")
+
+    items = []
+    for number, row in enumerate(rows, start=first_line):
+        try:
+            items.append(BatchEvaluationItem.model_validate(row))
+        except ValidationError as e:
+            error = e.errors()[0]
+            field_name = ".".join(str(part) for part in error["loc"])
+            raise ValueError(f"Row {number}: {field_name}: {error['msg']}")
+    return items
+
+
+def validate_batch(items: List[BatchEvaluationItem]) -> None:
+    """
+    Raises:
+        ValueError: If the batch is empty, too large or has duplicate ids
+    """
+    if not items:
+        raise ValueError("The batch has no evaluation pairs")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"A batch can have at most {MAX_BATCH_ITEMS} pairs")
+    seen = set()
+    for item in items:
+        key = item_id(item)
+        if key in seen:
+            raise ValueError(f"Duplicate item id {key!r}; give each pair a distinct id")
+        seen.add(key)
+
+
+@dataclass
+class BatchRun:
+    """Results of a batch so far, by item id"""
+
+    batch_id: str
+    results: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    running: bool = False
+    # Incremented per claim, so a stale release can't end a newer run
+    claims: int = 0
+
+    def claim(self) -> int:
+        """Mark the batch running, return the token for release()"""
+        self.claims += 1
+        self.running = True
+        return self.claims
+
+    def release(self, claim: int):
+        if claim == self.claims:
+            self.running = False
+
+
+class BatchStore:
+    """Recent batches, so an interrupted batch can be resumed"""
+
+    def __init__(self, max_batches: int = MAX_STORED_BATCHES):
+        self.max_batches = max_batches
+        self._runs: "OrderedDict[str, BatchRun]" = OrderedDict()
+
+    def get(self, batch_id: str) -> Optional[BatchRun]:
+        return self._runs.get(batch_id)
+
+    def get_or_create(self, batch_id: Optional[str]) -> BatchRun:
+        batch_id = batch_id or str(uuid.uuid4())
+        run = self._runs.get(batch_id)
+        if run is None:
+            run = self._runs[batch_id] = BatchRun(batch_id)
+            while len(self._runs) > self.max_batches:
+                self._runs.popitem(last=False)
+        self._runs.move_to_end(batch_id)
+        return run
+
+
+# Global batch store instance
+batch_runs = BatchStore()
+
+
+async def _evaluate_item(item: BatchEvaluationItem) -> Dict[str, Any]:
+    """
+    Evaluate one pair, waiting out a full LLM queue a few times
+
+    Raises:
+        Exception: If the evaluation failed (no fallback feedback is made up)
+    """
+    for attempt in range(QUEUE_FULL_RETRIES + 1):
+        try:
+            with route_deadline("evaluator.evaluate"):
+                feedback, _, cached = await evaluate_prompt_output(
+                    user_prompt=item.user_prompt,
+                    ai_output=item.ai_output,
+                    output_type=item.output_type,
+                    expected_outcome=item.expected_outcome,
+                    ai_model_used=item.ai_model_used,
+                    priority=LLMPriority.BATCH,
+                    fallback_on_error=False,
+                )
+            break
+        except LLMQueueFull as e:
+            if attempt == QUEUE_FULL_RETRIES:
+                return {"status": "error", "error": str(e)}
+            await asyncio.sleep(e.retry_after)
+
+    return {
+        "status": "ok",
+        "cached": cached,
+        "overall_score": feedback.overall_score,
+        "feedback": feedback.model_dump(),
+    }
+
+
+def _line(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload) + "\n"
+
+
+def start_batch(
+    run: BatchRun,
+    items: List[BatchEvaluationItem],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+) -> AsyncIterator[str]:
+    """
+    Claim a batch and return its NDJSON stream (see run_batch)
+
+    The claim is taken now rather than when the response body starts, so a
+    concurrent resend of the same batch_id sees it as running.
+    """
+    claim = run.claim()
+    stream = run_batch(run, items, concurrency, claim)
+    # A body that never starts (client already gone) never reaches
+    # run_batch's finally; release the claim when the stream is dropped
+    weakref.finalize(stream, run.release, claim)
+    return stream
+
+
+async def run_batch(
+    run: BatchRun,
+    items: List[BatchEvaluationItem],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    claim: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Evaluate a batch, yielding NDJSON lines: a start line, one result line
+    per pair (finished pairs of a resumed batch first) and a summary line
+    """
+    if claim is None:
+        claim = run.claim()
+    started = time.monotonic()
+    ids = [item_id(item) for item in items]
+    pending = [(key, item) for key, item in zip(ids, items) if key not in run.results]
+    index_of = {key: index for index, key in enumerate(ids)}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def evaluate(key: str, item: BatchEvaluationItem):
+        async with semaphore:
+            try:
+                result = await _evaluate_item(item)
+            except Exception as e:
+                logger.error(f"Batch {run.batch_id} item {key} failed: {e}")
+                result = {"status": "error", "error": str(e)}
+        return key, result
+
+    resumed = 0
+    failed = 0
+    tasks: List[asyncio.Task] = []
+    try:
+        yield _line(
+            {
+                "type": "start",
+                "batch_id": run.batch_id,
+                "total": len(items),
+                "pending": len(pending),
+            }
+        )
+
+        for index, key in enumerate(ids):
+            if key in run.results:
+                resumed += 1
+                yield _line(
+                    {
+                        "type": "result",
+                        "id": key,
+                        "index": index,
+                        "resumed": True,
+                        **run.results[key],
+                    }
+                )
+
+        tasks = [asyncio.create_task(evaluate(key, item)) for key, item in pending]
+        for next_done in asyncio.as_completed(tasks):
+            key, result = await next_done
+            if result["status"] == "ok":
+                # Only successes are kept, so a resumed batch retries failures
+                run.results[key] = result
+            else:
+                failed += 1
+            yield _line(
+                {
+                    "type": "result",
+                    "id": key,
+                    "index": index_of[key],
+                    "resumed": False,
+                    **result,
+                }
+            )
+    finally:
+        # The client went away: stop evaluating, keep what finished
+        run.release(claim)
+        for task in tasks:
+            task.cancel()
+
+    scores = [run.results[key]["overall_score"] for key in ids if key in run.results]
+    yield _line(
+        {
+            "type": "summary",
+            "batch_id": run.batch_id,
+            "total": len(items),
+            "succeeded": len(scores),
+            "failed": failed,
+            "resumed": resumed,
+            "average_score": round(sum(scores) / len(scores), 1) if scores else None,
+            "elapsed_seconds": round(time.monotonic() - started, 2),
+        }
+    )
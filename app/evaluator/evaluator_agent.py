@@ -3,20 +3,25 @@ Evaluator Agent
 Uses Gemini to analyze prompts and AI outputs, providing constructive feedback
 """
 
+import hashlib
 import json
-import os
-import re
-from typing import Optional
+from typing import Annotated, Any, AsyncIterator, Dict, Optional
 
-import google.generativeai as genai
-from google.generativeai.types import HarmBlockThreshold, HarmCategory
+from pydantic import TypeAdapter, ValidationError
 
-from .models import EvaluationFeedback
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.context_cache import prefix_cache
+from app.core.gemini import DEFAULT_MODEL, generate_content, stream_content
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull
+from app.core.prompt_budget import PromptBuilder
+from app.core.structured_output import (
+    IncrementalObjectParser,
+    gemini_response_schema,
+    parse_structured,
+)
 
-# Configure Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
+from .models import EvaluationFeedback, EvaluationResult
 
 
 EVALUATION_SYSTEM_PROMPT = """You are an expert prompt engineering evaluator and instructor. Your role is to analyze user prompts and AI outputs, providing constructive, educational feedback.
@@ -63,6 +68,89 @@ Return your analysis in the following JSON format:
 }
 """
 
+EVALUATION_PREFIX = "evaluator.system"
+prefix_cache.register(EVALUATION_PREFIX, DEFAULT_MODEL, EVALUATION_SYSTEM_PROMPT)
+
+EVALUATION_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_mime_type": "application/json",
+    "response_schema": gemini_response_schema(EvaluationResult),
+}
+
+# Greedy decoding, so the same input gets the same evaluation and can be
+# cached (this Gemini API has no sampling seed)
+DETERMINISTIC_SAMPLING = {"temperature": 0.0, "top_k": 1}
+
+# Bump when create_evaluation_prompt changes; part of the cache key along
+# with the system prompt and model
+EVALUATION_PROMPT_VERSION = 1
+
+# Deterministic evaluations per input fingerprint, shared across workers
+evaluation_cache = TTLCache(
+    "evaluator:evaluations",
+    ttl=settings.evaluator.cache_ttl_seconds,
+    max_entries=2048,
+    persistent=True,
+)
+
+
+def evaluation_generation_config(deterministic: bool, streaming: bool = False) -> dict:
+    """
+    Generation settings for an evaluation
+
+    Streamed evaluations leave out the response schema: Gemini emits schema
+    properties alphabetically, while the system prompt's layout puts
+    overall_score and the prompt sub-scores first. The result is validated
+    against EvaluationResult once the stream ends.
+    """
+    config = dict(EVALUATION_GENERATION_CONFIG)
+    if deterministic:
+        config.update(DETERMINISTIC_SAMPLING)
+    if streaming:
+        config.pop("response_schema")
+    return config
+
+
+def evaluation_cache_key(
+    user_prompt: str,
+    ai_output: str,
+    output_type: str,
+    expected_outcome: Optional[str],
+    ai_model_used: Optional[str],
+) -> str:
+    """
+    Fingerprint of an evaluation's inputs, prompt version and model, as
+    "v<prompt version>:<model>:<hash>" so either can be invalidated by prefix
+    """
+    payload = json.dumps(
+        [
+            user_prompt,
+            ai_output,
+            output_type,
+            expected_outcome or "",
+            ai_model_used or "",
+            EVALUATION_PROMPT_VERSION,
+            hashlib.sha256(EVALUATION_SYSTEM_PROMPT.encode("utf-8")).hexdigest(),
+            DEFAULT_MODEL,
+        ]
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"v{EVALUATION_PROMPT_VERSION}:{DEFAULT_MODEL}:{digest}"
+
+
+# Validators for single top-level sections of a streamed evaluation
+_SECTION_ADAPTERS = {
+    name: TypeAdapter(
+        Annotated[(field.annotation, *field.metadata)]
+        if field.metadata
+        else field.annotation
+    )
+    for name, field in EvaluationResult.model_fields.items()
+}
+
 
 def create_evaluation_prompt(
     user_prompt: str,
@@ -73,34 +161,43 @@ def create_evaluation_prompt(
 ) -> str:
     """Create the evaluation prompt for Gemini"""
 
-    prompt_parts = [
-        "# Prompt Evaluation Request\n",
-        "## User's Original Prompt:",
-        f"```\n{user_prompt}\n```\n",
-        "\n## AI Output Received:",
-    ]
+    # Over budget, the output tail is cut first, then the expected outcome
+    # and finally the prompt itself
+    builder = PromptBuilder("evaluator")
+    builder.add(
+        "header", "# Prompt Evaluation Request\n## User's Original Prompt:```\n"
+    )
+    builder.add("user_prompt", user_prompt, priority=3, min_tokens=500)
+    builder.add("output_header", "\n```\n\n## AI Output Received:")
 
     if output_type == "text":
-        prompt_parts.append(f"```\n{ai_output}\n```\n")
+        builder.add("fence", "```\n")
+        builder.add("ai_output", ai_output, priority=1, min_tokens=500)
+        builder.add("fence_end", "\n```\n")
     elif output_type == "image_url":
-        prompt_parts.append(f"[Image URL]: {ai_output}\n")
-        prompt_parts.append(
-            "Note: Evaluate based on the prompt's ability to generate images.\n"
+        builder.add("ai_output", f"[Image URL]: {ai_output}\n")
+        builder.add(
+            "note", "Note: Evaluate based on the prompt's ability to generate images.\n"
         )
     elif output_type == "pdf_url":
-        prompt_parts.append(f"[PDF URL]: {ai_output}\n")
-        prompt_parts.append(
-            "Note: Evaluate based on the prompt's ability to generate documents.\n"
+        builder.add("ai_output", f"[PDF URL]: {ai_output}\n")
+        builder.add(
+            "note",
+            "Note: Evaluate based on the prompt's ability to generate documents.\n",
         )
 
     if expected_outcome:
-        prompt_parts.append(f"\n## User's Expected Outcome:\n{expected_outcome}\n")
+        builder.add("expected_header", "\n## User's Expected Outcome:\n")
+        builder.add("expected_outcome", expected_outcome, priority=2, min_tokens=200)
+        builder.add("expected_end", "\n")
 
     if ai_model_used:
-        prompt_parts.append(f"\n## AI Model Used: {ai_model_used}\n")
+        builder.add("model", f"\n## AI Model Used: {ai_model_used}\n")
 
-    prompt_parts.append("\n## Your Task:")
-    prompt_parts.append("""
+    builder.add("task_header", "\n## Your Task:")
+    builder.add(
+        "task",
+        """
 Analyze this prompt-output pair and provide detailed, constructive feedback:
 
 1. Evaluate the **prompt quality** across multiple dimensions
@@ -113,61 +210,29 @@ Analyze this prompt-output pair and provide detailed, constructive feedback:
 Be educational, encouraging, and specific. Help the user understand the cause-effect relationship between prompt construction and output quality.
 
 Return your analysis in the JSON format specified in the system prompt.
-""")
+""",
+    )
 
-    return "".join(prompt_parts)
+    return builder.build()
 
 
-def parse_gemini_response(response_text: str) -> dict:
-    """Parse Gemini's response and extract JSON"""
-    try:
-        # First, try to parse directly as JSON
-        try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            pass
-
-        # Remove markdown code blocks if present
-        response_text = re.sub(r"```json\s*", "", response_text)
-        response_text = re.sub(r"```\s*", "", response_text)
-
-        # Try parsing again after cleanup
-        try:
-            return json.loads(response_text.strip())
-        except json.JSONDecodeError:
-            pass
-
-        # Try to find JSON in the response using regex
-        json_match = re.search(r"\{[\s\S]*\}", response_text)
-        if json_match:
-            json_str = json_match.group(0)
-            return json.loads(json_str)
-
-        # If no JSON found, return a structured error
-        raise ValueError("No valid JSON found in response")
+async def _run_evaluation(
+    eval_prompt: str, deterministic: bool, priority: LLMPriority
+) -> Dict[str, Any]:
+    """One Gemini evaluation, as a cacheable {"feedback", "raw_analysis"} dict"""
+    # Use Gemini to evaluate, constrained to the evaluation schema
+    raw_analysis = await generate_content(
+        eval_prompt,
+        generation_config=evaluation_generation_config(deterministic),
+        priority=priority,
+        system_prefix=EVALUATION_PREFIX,
+    )
 
-    except Exception as e:
-        # Return a structured fallback response
-        return {
-            "overall_score": 50,
-            "prompt_quality": {
-                "clarity_score": 50,
-                "specificity_score": 50,
-                "structure_score": 50,
-                "context_score": 50,
-                "summary": f"Unable to parse evaluation: {str(e)}",
-            },
-            "output_analysis": {
-                "relevance_score": 50,
-                "completeness_score": 50,
-                "quality_score": 50,
-                "summary": "Could not analyze output due to parsing error",
-            },
-            "what_went_wrong": [f"JSON parsing error: {str(e)}"],
-            "what_went_right": [],
-            "improvement_suggestions": ["Please try again"],
-            "revised_prompt": "",
-        }
+    # Parse the response
+    parsed_feedback = await parse_structured(
+        "evaluator.evaluate", raw_analysis, EvaluationResult
+    )
+    return {"feedback": parsed_feedback.model_dump(), "raw_analysis": raw_analysis}
 
 
 async def evaluate_prompt_output(
@@ -176,13 +241,28 @@ async def evaluate_prompt_output(
     output_type: str = "text",
     expected_outcome: Optional[str] = None,
     ai_model_used: Optional[str] = None,
-) -> tuple[EvaluationFeedback, str]:
+    deterministic: Optional[bool] = None,
+    priority: LLMPriority = LLMPriority.STANDARD,
+    fallback_on_error: bool = True,
+) -> tuple[EvaluationFeedback, str, bool]:
     """
     Evaluate a prompt-output pair using Gemini
 
+    Deterministic evaluations (the EVALUATION_DETERMINISTIC default) are
+    cached by input fingerprint; identical concurrent requests share one call.
+    Live requests use the default STANDARD priority, batches pass BATCH.
+
     Returns:
-        tuple: (EvaluationFeedback, raw_analysis)
+        tuple: (EvaluationFeedback, raw_analysis, whether it came from cache)
+
+    Raises:
+        LLMQueueFull: If the scheduler rejected the call
+        Exception: Any evaluation error, when fallback_on_error is False
+            (otherwise a fallback evaluation is returned)
     """
+    if deterministic is None:
+        deterministic = settings.evaluator.deterministic
+
     try:
         # Create the evaluation prompt
         eval_prompt = create_evaluation_prompt(
@@ -193,44 +273,31 @@ async def evaluate_prompt_output(
             ai_model_used=ai_model_used,
         )
 
-        # Use Gemini to evaluate
-        model = genai.GenerativeModel(
-            model_name="gemini-flash-latest",
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-                "response_mime_type": "application/json",
-            },
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            },
-        )
-
-        # Generate evaluation
-        response = model.generate_content([EVALUATION_SYSTEM_PROMPT, eval_prompt])
+        async def compute():
+            return await _run_evaluation(eval_prompt, deterministic, priority)
 
-        # Check if response has valid content
-        if not response.parts:
-            raise Exception(
-                f"No response from Gemini. Finish reason: {response.candidates[0].finish_reason if response.candidates else 'unknown'}"
+        cached = False
+        if deterministic:
+            key = evaluation_cache_key(
+                user_prompt, ai_output, output_type, expected_outcome, ai_model_used
             )
-
-        raw_analysis = response.text
-
-        # Parse the response
-        parsed_feedback = parse_gemini_response(raw_analysis)
+            # Waiting on an identical in-flight evaluation is not a cache hit
+            result, cached = await evaluation_cache.get_or_compute_with_status(
+                key, compute
+            )
+        else:
+            result = await compute()
 
         # Create EvaluationFeedback object
-        feedback = EvaluationFeedback(**parsed_feedback)
+        feedback = EvaluationFeedback(**result["feedback"])
 
-        return feedback, raw_analysis
+        return feedback, result["raw_analysis"], cached
 
+    except LLMQueueFull:
+        raise
     except Exception as e:
+        if not fallback_on_error:
+            raise
         # Return a fallback evaluation
         fallback_feedback = EvaluationFeedback(
             overall_score=50,
@@ -253,7 +320,83 @@ async def evaluate_prompt_output(
             revised_prompt=None,
         )
 
-        return fallback_feedback, f"Error: {str(e)}"
+        return fallback_feedback, f"Error: {str(e)}", False
+
+
+async def stream_evaluation(
+    user_prompt: str,
+    ai_output: str,
+    output_type: str = "text",
+    expected_outcome: Optional[str] = None,
+    ai_model_used: Optional[str] = None,
+    deterministic: Optional[bool] = None,
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Evaluate a prompt-output pair while the model is still writing
+
+    Yields ("section", (name, value)) for each top-level field of the
+    evaluation as soon as it is complete and valid, then
+    ("result", (EvaluationFeedback, raw_analysis, cached)) once the whole
+    response has been validated. A cached evaluation is replayed at once.
+
+    Raises:
+        LLMQueueFull: If the scheduler rejected the call
+        StructuredOutputError: If the response could not be validated
+        Any generation error of stream_content
+    """
+    eval_prompt = create_evaluation_prompt(
+        user_prompt=user_prompt,
+        ai_output=ai_output,
+        output_type=output_type,
+        expected_outcome=expected_outcome,
+        ai_model_used=ai_model_used,
+    )
+
+    if deterministic is None:
+        deterministic = settings.evaluator.deterministic
+    key = None
+    if deterministic:
+        key = evaluation_cache_key(
+            user_prompt, ai_output, output_type, expected_outcome, ai_model_used
+        )
+        cached = evaluation_cache.get(key)
+        if cached is not None:
+            for name, value in cached["feedback"].items():
+                yield "section", (name, value)
+            feedback = EvaluationFeedback(**cached["feedback"])
+            yield "result", (feedback, cached["raw_analysis"], True)
+            return
+
+    parser = IncrementalObjectParser()
+    raw_analysis = ""
+    # Interactive: the learner watches the sections arrive
+    async for chunk in stream_content(
+        eval_prompt,
+        generation_config=evaluation_generation_config(deterministic, streaming=True),
+        priority=LLMPriority.INTERACTIVE,
+        system_prefix=EVALUATION_PREFIX,
+    ):
+        raw_analysis += chunk
+        for name, value in parser.feed(chunk):
+            adapter = _SECTION_ADAPTERS.get(name)
+            if adapter is None:
+                continue
+            try:
+                value = adapter.validate_python(value)
+            except ValidationError:
+                continue  # Repaired in the final parse
+            yield "section", (name, adapter.dump_python(value, mode="json"))
+
+    parsed_feedback = await parse_structured(
+        "evaluator.evaluate_stream", raw_analysis, EvaluationResult
+    )
+    if key is not None:
+        evaluation_cache.set(
+            key,
+            {"feedback": parsed_feedback.model_dump(), "raw_analysis": raw_analysis},
+        )
+    feedback = EvaluationFeedback(**parsed_feedback.model_dump())
+    yield "result", (feedback, raw_analysis, False)
 
 
 def format_evaluation_for_display(feedback: EvaluationFeedback) -> str:
@@ -24,6 +24,37 @@ class PromptEvaluationRequest(BaseModel):
     )
 
 
+class PromptQualityScores(BaseModel):
+    """Prompt quality sub-scores as generated by the evaluator model"""
+
+    clarity_score: int = Field(..., ge=0, le=100)
+    specificity_score: int = Field(..., ge=0, le=100)
+    structure_score: int = Field(..., ge=0, le=100)
+    context_score: int = Field(..., ge=0, le=100)
+    summary: str
+
+
+class OutputAnalysisScores(BaseModel):
+    """Output analysis sub-scores as generated by the evaluator model"""
+
+    relevance_score: int = Field(..., ge=0, le=100)
+    completeness_score: int = Field(..., ge=0, le=100)
+    quality_score: int = Field(..., ge=0, le=100)
+    summary: str
+
+
+class EvaluationResult(BaseModel):
+    """Response schema the evaluator model is constrained to"""
+
+    overall_score: int = Field(..., ge=0, le=100)
+    prompt_quality: PromptQualityScores
+    output_analysis: OutputAnalysisScores
+    what_went_wrong: list[str] = Field(default_factory=list)
+    what_went_right: list[str] = Field(default_factory=list)
+    improvement_suggestions: list[str] = Field(default_factory=list)
+    revised_prompt: Optional[str] = None
+
+
 class EvaluationFeedback(BaseModel):
     """Feedback structure from evaluation"""
 
@@ -53,6 +84,9 @@ class PromptEvaluationResponse(BaseModel):
     feedback: EvaluationFeedback
     timestamp: datetime
     raw_analysis: str = Field(..., description="Raw analysis from Gemini")
+    cached: bool = Field(
+        default=False, description="Whether the evaluation came from the cache"
+    )
 
 
 class EvaluationHistory(BaseModel):
@@ -62,3 +96,24 @@ class EvaluationHistory(BaseModel):
     evaluations: list[PromptEvaluationResponse]
     created_at: datetime
     updated_at: datetime
+
+
+class BatchEvaluationItem(PromptEvaluationRequest):
+    """One prompt/output pair in a batch"""
+
+    id: Optional[str] = Field(
+        None,
+        description="Caller's id for the pair (defaults to a hash of its content)",
+    )
+
+
+class BatchEvaluationRequest(BaseModel):
+    """Request model for batch evaluation"""
+
+    items: list[BatchEvaluationItem] = Field(..., min_length=1)
+    batch_id: Optional[str] = Field(
+        None, description="Resend an earlier batch_id to resume it"
+    )
+    concurrency: Optional[int] = Field(
+        None, ge=1, le=16, description="Evaluations run at once for this batch"
+    )
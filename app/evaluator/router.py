@@ -3,15 +3,35 @@ Evaluator Router
 API endpoints for prompt evaluation functionality
 """
 
-from fastapi import APIRouter, Request, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from datetime import datetime
+import json
+import logging
 import uuid
-from typing import Optional
+from typing import List, Optional
 
-from .models import PromptEvaluationResponse, EvaluationHistory
-from .evaluator_agent import evaluate_prompt_output
+from app.core.deadline import route_deadline
+from app.core.gemini import DEFAULT_MODEL
+from app.core.llm_scheduler import LLMPriority, llm_scheduler
+from app.core.streaming import ClientDisconnected, until_disconnected
+from .batch import (
+    DEFAULT_BATCH_CONCURRENCY,
+    batch_runs,
+    parse_batch_file,
+    start_batch,
+    validate_batch,
+)
+from .models import (
+    BatchEvaluationItem,
+    BatchEvaluationRequest,
+    PromptEvaluationResponse,
+    EvaluationHistory,
+)
+from .evaluator_agent import evaluate_prompt_output, stream_evaluation
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/evaluator", tags=["evaluator"])
 templates = Jinja2Templates(directory="frontend/templates")
@@ -20,6 +40,21 @@ templates = Jinja2Templates(directory="frontend/templates")
 evaluation_sessions: dict[str, EvaluationHistory] = {}
 
 
+def _record_evaluation(response: PromptEvaluationResponse):
+    """Append an evaluation to its session's history"""
+    session_id = response.session_id
+    if session_id not in evaluation_sessions:
+        evaluation_sessions[session_id] = EvaluationHistory(
+            session_id=session_id,
+            evaluations=[],
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+
+    evaluation_sessions[session_id].evaluations.append(response)
+    evaluation_sessions[session_id].updated_at = datetime.now()
+
+
 @router.get("/", response_class=HTMLResponse)
 async def evaluator_page(request: Request):
     """Render the evaluator page"""
@@ -52,13 +87,14 @@ async def evaluate_prompt(
         session_id = str(uuid.uuid4())
 
     # Evaluate the prompt-output pair
-    feedback, raw_analysis = await evaluate_prompt_output(
-        user_prompt=user_prompt,
-        ai_output=ai_output,
-        output_type=output_type,
-        expected_outcome=expected_outcome,
-        ai_model_used=ai_model_used,
-    )
+    with route_deadline("evaluator.evaluate"):
+        feedback, raw_analysis, cached = await evaluate_prompt_output(
+            user_prompt=user_prompt,
+            ai_output=ai_output,
+            output_type=output_type,
+            expected_outcome=expected_outcome,
+            ai_model_used=ai_model_used,
+        )
 
     # Create response
     response = PromptEvaluationResponse(
@@ -66,23 +102,77 @@ async def evaluate_prompt(
         feedback=feedback,
         timestamp=datetime.now(),
         raw_analysis=raw_analysis,
+        cached=cached,
     )
 
     # Store in session history
-    if session_id not in evaluation_sessions:
-        evaluation_sessions[session_id] = EvaluationHistory(
-            session_id=session_id,
-            evaluations=[],
-            created_at=datetime.now(),
-            updated_at=datetime.now(),
-        )
-
-    evaluation_sessions[session_id].evaluations.append(response)
-    evaluation_sessions[session_id].updated_at = datetime.now()
+    _record_evaluation(response)
 
     return response
 
 
+@router.post("/evaluate/stream")
+async def evaluate_prompt_stream(
+    http_request: Request,
+    user_prompt: str = Form(...),
+    ai_output: str = Form(...),
+    output_type: str = Form(default="text"),
+    expected_outcome: Optional[str] = Form(None),
+    ai_model_used: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+):
+    """
+    Evaluate a user's prompt and AI output, streaming sections as SSE
+
+    Sends {"section": name, "value": ..., "done": false} as each part of the
+    evaluation completes (overall_score and prompt_quality first), then the
+    full PromptEvaluationResponse with "done": true.
+    """
+    if not session_id:
+        session_id = str(uuid.uuid4())
+
+    # Reject before the stream starts so overload is reported as a 429
+    llm_scheduler.check_admission(DEFAULT_MODEL, LLMPriority.INTERACTIVE)
+
+    async def generate():
+        try:
+            with route_deadline("evaluator.evaluate_stream"):
+                async for kind, payload in until_disconnected(
+                    http_request,
+                    stream_evaluation(
+                        user_prompt=user_prompt,
+                        ai_output=ai_output,
+                        output_type=output_type,
+                        expected_outcome=expected_outcome,
+                        ai_model_used=ai_model_used,
+                    ),
+                ):
+                    if kind == "section":
+                        name, value = payload
+                        event = {"section": name, "value": value, "done": False}
+                        yield f"data: {json.dumps(event)}\n\n"
+                        continue
+
+                    feedback, raw_analysis, cached = payload
+                    response = PromptEvaluationResponse(
+                        session_id=session_id,
+                        feedback=feedback,
+                        timestamp=datetime.now(),
+                        raw_analysis=raw_analysis,
+                        cached=cached,
+                    )
+                    _record_evaluation(response)
+                    result = {**response.model_dump(mode="json"), "done": True}
+                    yield f"data: {json.dumps(result)}\n\n"
+        except ClientDisconnected:
+            pass
+        except Exception as e:
+            logger.error(f"Streaming evaluation error: {e}")
+            yield f"data: {json.dumps({'error': str(e), 'done': True})}\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
 @router.get("/history/{session_id}")
 async def get_evaluation_history(session_id: str):
     """Get evaluation history for a session"""
@@ -132,13 +222,14 @@ async def upload_file_for_evaluation(
             ai_output = "[Could not decode file content]"
 
     # Evaluate
-    feedback, raw_analysis = await evaluate_prompt_output(
-        user_prompt=user_prompt,
-        ai_output=ai_output,
-        output_type=output_type,
-        expected_outcome=expected_outcome,
-        ai_model_used=ai_model_used,
-    )
+    with route_deadline("evaluator.evaluate"):
+        feedback, raw_analysis, cached = await evaluate_prompt_output(
+            user_prompt=user_prompt,
+            ai_output=ai_output,
+            output_type=output_type,
+            expected_outcome=expected_outcome,
+            ai_model_used=ai_model_used,
+        )
 
     # Create response
     response = PromptEvaluationResponse(
@@ -146,18 +237,73 @@ async def upload_file_for_evaluation(
         feedback=feedback,
         timestamp=datetime.now(),
         raw_analysis=raw_analysis,
+        cached=cached,
     )
 
     # Store in session history
-    if session_id not in evaluation_sessions:
-        evaluation_sessions[session_id] = EvaluationHistory(
-            session_id=session_id,
-            evaluations=[],
-            created_at=datetime.now(),
-            updated_at=datetime.now(),
+    _record_evaluation(response)
+
+    return response
+
+
+def _stream_batch(
+    items: List[BatchEvaluationItem],
+    batch_id: Optional[str],
+    concurrency: Optional[int],
+) -> StreamingResponse:
+    try:
+        validate_batch(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    run = batch_runs.get_or_create(batch_id)
+    if run.running:
+        raise HTTPException(
+            status_code=409, detail=f"Batch {run.batch_id} is already running"
         )
 
-    evaluation_sessions[session_id].evaluations.append(response)
-    evaluation_sessions[session_id].updated_at = datetime.now()
+    return StreamingResponse(
+        start_batch(run, items, concurrency or DEFAULT_BATCH_CONCURRENCY),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Id": run.batch_id},
+    )
 
-    return response
+
+@router.post("/batch")
+async def evaluate_batch(request: BatchEvaluationRequest):
+    """
+    Evaluate a list of prompt/output pairs, streaming NDJSON results as each
+    finishes and a summary last. Resend with the returned batch_id to resume.
+    """
+    return _stream_batch(request.items, request.batch_id, request.concurrency)
+
+
+@router.post("/batch/upload")
+async def evaluate_batch_file(
+    file: UploadFile = File(...),
+    batch_id: Optional[str] = Form(None),
+    concurrency: Optional[int] = Form(None, ge=1, le=16),
+):
+    """
+    Evaluate the pairs in an uploaded JSONL or CSV file (same NDJSON stream
+    as /batch)
+    """
+    try:
+        items = parse_batch_file(file.filename or "", await file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _stream_batch(items, batch_id, concurrency)
+
+
+@router.get("/batch/{batch_id}")
+async def get_batch_results(batch_id: str):
+    """Results finished so far for a batch"""
+    run = batch_runs.get(batch_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {
+        "batch_id": run.batch_id,
+        "running": run.running,
+        "completed": len(run.results),
+        "results": run.results,
+    }
@@ -0,0 +1,8 @@
+"""
+Metrics Module
+Cross-module runtime metrics for the LLM integrations
+"""
+
+from app.metrics.router import router
+
+__all__ = ["router"]
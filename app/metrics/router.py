@@ -0,0 +1,105 @@
+"""
+API routes for runtime metrics
+"""
+
+from fastapi import APIRouter
+
+from app.core.circuit_breaker import circuit_breakers
+from app.core.context_cache import prefix_cache
+from app.core.deadline import deadline_stats
+from app.core.disk_cache import disk_cache
+from app.core.llm_scheduler import llm_scheduler
+from app.core.prompt_budget import prompt_budget_usage
+from app.core.routing import model_router
+from app.core.singleflight import stream_coalescer
+from app.core.structured_output import get_parse_metrics
+from app.core.supersede import latest_requests
+from app.core.tokens import token_usage
+from app.core.warm_cache import warm_cache_file
+from app.prompting.agents import workspace_response_cache
+from app.prompting.memory import tutor_memory
+from app.prompting.prewarm import lesson_prewarmer
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/structured-output")
+async def structured_output_metrics():
+    """Parse, repair and failure counters per structured-output call site"""
+    return {"sites": get_parse_metrics()}
+
+
+@router.get("/llm-scheduler")
+async def llm_scheduler_metrics():
+    """Concurrency, queue depth and queue-time percentiles per model"""
+    return llm_scheduler.stats()
+
+
+@router.get("/coalescing")
+async def coalescing_metrics():
+    """How many identical LLM streams were shared instead of re-requested"""
+    return stream_coalescer.stats()
+
+
+@router.get("/stream-tokens")
+async def stream_token_metrics():
+    """Estimated output tokens delivered vs wasted on abandoned streams"""
+    return token_usage.stats()
+
+
+@router.get("/superseded")
+async def superseded_metrics():
+    """Requests cancelled because a newer one arrived from the same session"""
+    return latest_requests.stats()
+
+
+@router.get("/prompt-budget")
+async def prompt_budget_metrics():
+    """Input token budget utilization and trimming per agent"""
+    return {"agents": prompt_budget_usage.stats()}
+
+
+@router.get("/context-cache")
+async def context_cache_metrics():
+    """Provider context-cache handles and TTFT with and without them"""
+    return prefix_cache.stats()
+
+
+@router.get("/tutor-memory")
+async def tutor_memory_metrics():
+    """Tutor turns folded into rolling conversation summaries"""
+    return tutor_memory.stats()
+
+
+@router.get("/routing")
+async def routing_metrics():
+    """Provider latency/error estimates, routing decisions and hedges"""
+    return model_router.stats()
+
+
+@router.get("/circuit-breakers")
+async def circuit_breaker_metrics():
+    """Breaker state and failure counts per provider and model"""
+    return {"breakers": circuit_breakers.stats()}
+
+
+@router.get("/deadlines")
+async def deadline_metrics():
+    """Per-route latency budgets and how often they ran out"""
+    return {"routes": deadline_stats.stats()}
+
+
+@router.get("/prewarm")
+async def prewarm_metrics():
+    """Lesson pre-warm activity, workspace response cache hits and the warm cache file"""
+    return {
+        "lessons": lesson_prewarmer.stats(),
+        "responses": workspace_response_cache.stats(),
+        "warm_cache_file": warm_cache_file.stats(),
+    }
+
+
+@router.get("/disk-cache")
+async def disk_cache_metrics():
+    """Shared on-disk LLM response cache: hits, writes, evictions and size per namespace"""
+    return disk_cache.stats()
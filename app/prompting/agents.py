@@ -2,17 +2,31 @@
 Pydantic-AI agents for prompting module with streaming support
 """
 
+import asyncio
+import hashlib
 import logging
+import time
 from typing import AsyncIterator, cast
 
 from pydantic import BaseModel
 from pydantic_ai import Agent
 
 from app.base_model import get_google_model
-from app.prompting.utils import analyze_prompt_quality
+from app.core.cache import TTLCache
+from app.core.context_cache import prefix_cache
+from app.core.deadline import DeadlineExceeded, bounded, deadline_share
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull, llm_scheduler
+from app.core.prompt_budget import PromptBuilder
+from app.core.routing import RouteTarget, model_for, model_router, route_targets
+from app.core.singleflight import coalescing_key, stream_coalescer
+from app.prompting.utils import analyze_prompt_quality, split_into_chunks
 
 logger = logging.getLogger(__name__)
 
+# Models behind the agents; each one is a separate scheduler lane
+AGENT_MODEL = "gemini-flash-latest"
+ANALYSIS_MODEL = "gemini-flash-lite-latest"
+
 
 class PromptAnalysisResult(BaseModel):
     """Structured output for prompt analysis"""
@@ -32,9 +46,7 @@ class SummaryResult(BaseModel):
 
 
 # AI Tutor Agent - Fast model for real-time guidance
-tutor_agent = Agent(
-    model=get_google_model("gemini-flash-latest", thinking_enabled=False),
-    system_prompt="""You are an expert AI prompt engineering tutor guiding learners through a structured curriculum.
+TUTOR_SYSTEM_PROMPT = """You are an expert AI prompt engineering tutor guiding learners through a structured curriculum.
 
     🎯 YOUR ROLE:
     - Guide learners through progressive lessons (Foundations → Advanced Patterns → Optimization → Real-World)
@@ -105,14 +117,24 @@ tutor_agent = Agent(
     - Don't contradict the curriculum structure or lesson objectives
     
     Remember: You're teaching THINKING, not just techniques. Help them understand WHY each concept matters.
-    """,
+    """
+TUTOR_PREFIX = "tutor.system"
+prefix_cache.register(TUTOR_PREFIX, AGENT_MODEL, TUTOR_SYSTEM_PROMPT)
+
+tutor_agent = Agent(
+    model=get_google_model(AGENT_MODEL, thinking_enabled=False),
+    system_prompt=TUTOR_SYSTEM_PROMPT,
     retries=2,
 )
+# Cached tutor calls must name the model version the cache was created for
+cached_tutor_model = get_google_model(
+    prefix_cache.model(TUTOR_PREFIX), thinking_enabled=False
+)
 
 
 # Workspace Agent - For executing user prompts on documents
 workspace_agent = Agent(
-    model=get_google_model("gemini-flash-latest"),
+    model=get_google_model(AGENT_MODEL),
     system_prompt="""You are a Workspace AI assistant helping learners practice prompt engineering.
 
     🎯 YOUR PURPOSE:
@@ -166,7 +188,7 @@ workspace_agent = Agent(
 
 # Prompt Analysis Agent - For real-time analysis with structured output
 analysis_agent = Agent(
-    model=get_google_model("gemini-flash-lite-latest"),
+    model=get_google_model(ANALYSIS_MODEL),
     output_type=PromptAnalysisResult,
     system_prompt="""You provide real-time analysis of prompts as learners type them in a prompt engineering course.
 
@@ -224,6 +246,204 @@ analysis_agent = Agent(
 )
 
 
+# Conversation Memory Agent - Folds older tutor turns into a rolling summary
+memory_agent = Agent(
+    model=get_google_model(ANALYSIS_MODEL, thinking_enabled=False),
+    system_prompt="""You maintain the running memory of a tutoring conversation in a prompt engineering course.
+
+    Merge the existing summary with the new messages into ONE updated summary that keeps:
+    - What the learner is working on and which techniques they have tried
+    - Misconceptions or mistakes that came up and how they were addressed
+    - Hints the tutor already gave (so they are not repeated)
+    - Open questions the learner still has
+
+    Write at most 150 words in plain third-person notes. Drop greetings and small talk.
+    """,
+)
+
+# Each agent call site is a route; Gemini first, OpenRouter as the alternate
+model_router.register("tutor", route_targets(AGENT_MODEL))
+model_router.register("workspace", route_targets(AGENT_MODEL))
+model_router.register("analysis", route_targets(ANALYSIS_MODEL))
+model_router.register("tutor.memory", route_targets(ANALYSIS_MODEL))
+
+
+def build_tutor_prompt(message: str, lesson_context: dict | None = None) -> str:
+    """
+    Tutor prompt with lesson context and conversation memory, trimmed to
+    the tutor's input budget
+
+    Over budget, the oldest recent messages go first, then the conversation
+    summary, the learner's last prompt and finally the tail of the message.
+    """
+    builder = PromptBuilder("tutor")
+    if lesson_context:
+        context_parts = []
+
+        if lesson_context.get("module"):
+            context_parts.append(f"Module: {lesson_context['module']}")
+
+        if lesson_context.get("lesson"):
+            context_parts.append(f"Current Lesson: {lesson_context['lesson']}")
+
+        if lesson_context.get("step"):
+            context_parts.append(f"Lesson Step: {lesson_context['step']}")
+
+        if lesson_context.get("attempts") and lesson_context["attempts"] > 0:
+            context_parts.append(f"Attempt Number: {lesson_context['attempts']}")
+
+        builder.add("context", "[LESSON CONTEXT]\n" + "\n".join(context_parts))
+        if lesson_context.get("last_prompt"):
+            builder.add(
+                "last_prompt",
+                f"\nUser's Last Prompt: {lesson_context['last_prompt']}",
+                priority=3,
+                min_tokens=50,
+            )
+
+        if lesson_context.get("conversation_summary"):
+            builder.add("summary_header", "\n\n[EARLIER CONVERSATION SUMMARY]\n")
+            builder.add(
+                "conversation_summary",
+                lesson_context["conversation_summary"],
+                priority=2,
+                min_tokens=100,
+            )
+
+        if lesson_context.get("recent_messages"):
+            builder.add("recent_header", "\n\n[RECENT CONVERSATION]\n")
+            builder.add(
+                "recent_messages",
+                items=lesson_context["recent_messages"],
+                priority=1,
+                trim="head",
+            )
+        builder.add("header", "\n\n[USER MESSAGE]\n")
+
+    builder.add("message", message, priority=4, min_tokens=500)
+    return builder.build()
+
+
+def build_workspace_prompt(prompt: str, document_text: str) -> str:
+    """Workspace prompt; the document tail is cut before the user's prompt"""
+    return (
+        PromptBuilder("workspace")
+        .add("prompt", prompt, priority=2, min_tokens=500)
+        .add("header", "\n\nDocument:\n")
+        .add("document", document_text, priority=1)
+        .build()
+    )
+
+
+async def summarize_conversation(summary: str, messages: list[dict]) -> str:
+    """
+    Fold tutor messages into the rolling conversation summary
+
+    Raises:
+        Exception: Any model error; the caller keeps the messages instead
+    """
+    transcript = "\n".join(
+        f"{message['role'].upper()}: {message['content']}" for message in messages
+    )
+    prompt = (
+        PromptBuilder("tutor.memory")
+        .add("summary", f"[EXISTING SUMMARY]\n{summary or '(none yet)'}\n\n")
+        .add("transcript", "[NEW MESSAGES]\n" + transcript, priority=1, trim="head")
+        .build()
+    )
+    result = await model_router.run(
+        "tutor.memory",
+        lambda target: memory_agent.run(prompt, model=model_for(target)),
+        LLMPriority.BATCH,
+    )
+    return result.output.strip()
+
+
+def _tutor_settings(cached_content: str | None) -> dict | None:
+    return {"google_cached_content": cached_content} if cached_content else None
+
+
+def _tutor_model(model, cached_content: str | None):
+    return cached_tutor_model if cached_content else model
+
+
+async def _stream_tutor(full_prompt: str, target: RouteTarget) -> AsyncIterator[str]:
+    """
+    Stream the tutor agent, reusing the context-cached system prompt if any
+
+    A rejected cache handle is dropped and the call retried uncached, as long
+    as nothing has been streamed yet.
+    """
+    model = model_for(target)
+    cached_content = (
+        prefix_cache.handle(TUTOR_PREFIX) if target.provider == "google" else None
+    )
+    started = time.monotonic()
+    first = True
+    try:
+        async with tutor_agent.run_stream(
+            full_prompt,
+            model=_tutor_model(model, cached_content),
+            model_settings=_tutor_settings(cached_content),
+        ) as response:
+            async for text in response.stream_text(delta=True):
+                if first and target.provider == "google":
+                    prefix_cache.record_ttft(
+                        TUTOR_PREFIX, bool(cached_content), time.monotonic() - started
+                    )
+                first = False
+                yield text
+    except Exception as e:
+        if not cached_content or not first:
+            raise
+        logger.warning(f"Cached tutor call failed, retrying uncached: {e}")
+        prefix_cache.invalidate(TUTOR_PREFIX)
+        started = time.monotonic()
+        async with tutor_agent.run_stream(full_prompt, model=model) as response:
+            async for text in response.stream_text(delta=True):
+                if first:
+                    prefix_cache.record_ttft(
+                        TUTOR_PREFIX, False, time.monotonic() - started
+                    )
+                    first = False
+                yield text
+
+
+async def _run_tutor(full_prompt: str, target: RouteTarget) -> str:
+    """Non-streaming counterpart of _stream_tutor"""
+    model = model_for(target)
+    cached_content = (
+        prefix_cache.handle(TUTOR_PREFIX) if target.provider == "google" else None
+    )
+    started = time.monotonic()
+    try:
+        result = await tutor_agent.run(
+            full_prompt,
+            model=_tutor_model(model, cached_content),
+            model_settings=_tutor_settings(cached_content),
+        )
+    except Exception as e:
+        if not cached_content:
+            raise
+        logger.warning(f"Cached tutor call failed, retrying uncached: {e}")
+        prefix_cache.invalidate(TUTOR_PREFIX)
+        cached_content = None
+        started = time.monotonic()
+        result = await tutor_agent.run(full_prompt, model=model)
+    if target.provider == "google":
+        prefix_cache.record_ttft(
+            TUTOR_PREFIX, bool(cached_content), time.monotonic() - started
+        )
+    return result.output
+
+
+# Tutor replies per exact prompt. Only the first turn of a lesson (no
+# history yet) repeats across learners
+tutor_response_cache = TTLCache(
+    "tutor:responses", ttl=6 * 60 * 60, max_entries=1024, persistent=True
+)
+
+
 async def stream_tutor_response(
     message: str, lesson_context: dict | None = None
 ) -> AsyncIterator[str]:
@@ -239,46 +459,154 @@ async def stream_tutor_response(
             - attempts: Number of attempts on current prompt
             - last_prompt: The user's last prompt (if any)
             - last_feedback: Previous feedback given (if any)
+            - conversation_summary: Rolling summary of older turns (if any)
+            - recent_messages: Last turns verbatim, oldest first (if any)
 
     Yields:
         str: Chunks of the response as they're generated
     """
     try:
-        # Build contextual prompt
-        if lesson_context:
-            context_parts = []
+        full_prompt = build_tutor_prompt(message, lesson_context)
+        key = coalescing_key("tutor", full_prompt)
+        cached = tutor_response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        # Hedged: a stalled provider is raced against the alternate one
+        parts = []
+        async for text in model_router.stream(
+            "tutor", lambda target: _stream_tutor(full_prompt, target), hedge=True
+        ):
+            parts.append(text)
+            yield text
+        tutor_response_cache.set(key, "".join(parts))
+
+    except LLMQueueFull:
+        raise
+    except Exception as e:
+        logger.error(f"Error in tutor streaming: {e}")
+        yield "I apologize, but I encountered an error. Please try again."
 
-            if lesson_context.get("module"):
-                context_parts.append(f"Module: {lesson_context['module']}")
 
-            if lesson_context.get("lesson"):
-                context_parts.append(f"Current Lesson: {lesson_context['lesson']}")
+def local_prompt_analysis(
+    prompt: str,
+    basic_analysis: dict | None = None,
+    feedback: str = "Quick check while the AI tutor looks at your prompt:",
+) -> PromptAnalysisResult:
+    """
+    Heuristic-only prompt analysis (no LLM call, returns in microseconds)
 
-            if lesson_context.get("step"):
-                context_parts.append(f"Lesson Step: {lesson_context['step']}")
+    Args:
+        prompt: User's prompt to analyze
+        basic_analysis: Precomputed analyze_prompt_quality() result, if any
+        feedback: Feedback line to show with the heuristic suggestions
+    """
+    basic = basic_analysis or analyze_prompt_quality(prompt)
+    return PromptAnalysisResult(
+        feedback=feedback,
+        has_constraints=basic["has_constraints"],
+        has_role=basic["has_role"],
+        has_structure=basic["has_structure"],
+        suggestions=list(basic["suggestions"]),
+    )
+
+
+# LLM prompt analyses per exact analysis input (prompt and lesson)
+analysis_cache = TTLCache(
+    "analysis:results", ttl=6 * 60 * 60, max_entries=2048, persistent=True
+)
 
-            if lesson_context.get("attempts") and lesson_context["attempts"] > 0:
-                context_parts.append(f"Attempt Number: {lesson_context['attempts']}")
 
-            if lesson_context.get("last_prompt"):
-                context_parts.append(
-                    f"User's Last Prompt: {lesson_context['last_prompt']}"
-                )
+async def enrich_prompt_analysis(
+    prompt: str, lesson_info: dict | None = None, basic_analysis: dict | None = None
+) -> PromptAnalysisResult:
+    """
+    LLM stage of the prompt analysis, merged with the heuristic flags
 
-            context_str = "\n".join(context_parts)
-            full_prompt = (
-                f"[LESSON CONTEXT]\n{context_str}\n\n[USER MESSAGE]\n{message}"
-            )
-        else:
-            full_prompt = message
+    Raises:
+        Exception: Any model error; callers decide how to fall back
+    """
+    basic_analysis = basic_analysis or analyze_prompt_quality(prompt)
+    context = _analysis_context(prompt, lesson_info, basic_analysis)
 
-        async with tutor_agent.run_stream(full_prompt) as response:
-            async for text in response.stream_text(delta=True):
-                yield text
+    key = _analysis_key(context, lesson_info)
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        return PromptAnalysisResult.model_validate(cached)
+
+    # Get AI feedback - Pydantic-AI guarantees output type
+    result = await model_router.run(
+        "analysis",
+        lambda target: analysis_agent.run(context, model=model_for(target)),
+        LLMPriority.STANDARD,
+        hedge=True,
+    )
+    # Type annotation: agent with output_type=PromptAnalysisResult guarantees this type
+    output = cast(PromptAnalysisResult, result.output)
+
+    # Override detection flags with our basic analysis (more reliable for keyword detection)
+    output.has_constraints = basic_analysis["has_constraints"]
+    output.has_role = basic_analysis["has_role"]
+    output.has_structure = basic_analysis["has_structure"]
+
+    # Merge suggestions if AI didn't provide enough
+    if len(output.suggestions) < 2 and basic_analysis["suggestions"]:
+        output.suggestions.extend(basic_analysis["suggestions"][:2])
+
+    analysis_cache.set(key, output.model_dump())
+    return output
+
+
+def analysis_cache_key(prompt: str, lesson_info: dict | None = None) -> str:
+    context = _analysis_context(prompt, lesson_info, analyze_prompt_quality(prompt))
+    return _analysis_key(context, lesson_info)
 
-    except Exception as e:
-        logger.error(f"Error in tutor streaming: {e}")
-        yield "I apologize, but I encountered an error. Please try again."
+
+def _analysis_key(context: str, lesson_info: dict | None) -> str:
+    # "lesson-<submodule>:" lets an operator invalidate one lesson's analyses
+    submodule = (lesson_info or {}).get("submodule_id", "none")
+    return f"lesson-{submodule}:{coalescing_key('analysis', context)}"
+
+
+def _analysis_context(
+    prompt: str, lesson_info: dict | None, basic_analysis: dict
+) -> str:
+    """The analysis agent's input for a prompt in a lesson"""
+    # Build context with lesson awareness
+    context_parts = []
+
+    if lesson_info:
+        if lesson_info.get("lesson_name"):
+            context_parts.append(f"Lesson Context: {lesson_info['lesson_name']}")
+
+        if lesson_info.get("submodule_id"):
+            lesson_focus = {
+                1: "Focus on CONSTRAINTS to prevent hallucination",
+                2: "Focus on ROLE ASSIGNMENT for perspective",
+                3: "Focus on STRUCTURE for step-by-step reasoning",
+                4: "Focus on COMBINING all techniques",
+            }
+            focus = lesson_focus.get(lesson_info["submodule_id"], "")
+            if focus:
+                context_parts.append(f"Lesson Focus: {focus}")
+
+    context_parts.append(f"""
+Basic detection results:
+- Has constraints: {basic_analysis["has_constraints"]}
+- Has role assignment: {basic_analysis["has_role"]}  
+- Has structure: {basic_analysis["has_structure"]}
+
+Provide brief, lesson-appropriate feedback and specific suggestions.""")
+
+    # Only the quoted prompt may be cut, the detection results always fit
+    return (
+        PromptBuilder("analysis")
+        .add("label", 'Prompt to analyze: "')
+        .add("prompt", prompt, priority=1, min_tokens=100)
+        .add("context", '"\n\n' + "\n".join(context_parts))
+        .build()
+    )
 
 
 async def analyze_prompt_realtime(
@@ -298,72 +626,68 @@ async def analyze_prompt_realtime(
         PromptAnalysisResult with feedback and suggestions
     """
     try:
-        # Get basic analysis first
-        basic_analysis = analyze_prompt_quality(prompt)
-
-        # Build context with lesson awareness
-        context_parts = [f'Prompt to analyze: "{prompt}"']
-
-        if lesson_info:
-            if lesson_info.get("lesson_name"):
-                context_parts.append(f"\nLesson Context: {lesson_info['lesson_name']}")
-
-            if lesson_info.get("submodule_id"):
-                lesson_focus = {
-                    1: "Focus on CONSTRAINTS to prevent hallucination",
-                    2: "Focus on ROLE ASSIGNMENT for perspective",
-                    3: "Focus on STRUCTURE for step-by-step reasoning",
-                    4: "Focus on COMBINING all techniques",
-                }
-                focus = lesson_focus.get(lesson_info["submodule_id"], "")
-                if focus:
-                    context_parts.append(f"Lesson Focus: {focus}")
-
-        context_parts.append(f"""
-Basic detection results:
-- Has constraints: {basic_analysis["has_constraints"]}
-- Has role assignment: {basic_analysis["has_role"]}  
-- Has structure: {basic_analysis["has_structure"]}
+        return await enrich_prompt_analysis(prompt, lesson_info)
 
-Provide brief, lesson-appropriate feedback and specific suggestions.""")
+    except Exception as e:
+        logger.error(f"Error in prompt analysis: {e}")
+        # Return basic analysis on error
+        return local_prompt_analysis(
+            prompt, feedback="Could not get AI feedback, but here are some suggestions:"
+        )
 
-        context = "\n".join(context_parts)
 
-        # Get AI feedback - Pydantic-AI guarantees output type
-        result = await analysis_agent.run(context)
-        # Type annotation: agent with output_type=PromptAnalysisResult guarantees this type
-        output = cast(PromptAnalysisResult, result.output)
+# Complete workspace answers per (prompt, document), filled by finished
+# requests and by the lesson pre-warm for canonical prompts. Keys only
+# collapse whitespace: case and symbols ("<100 words", "C++") change answers
+workspace_response_cache = TTLCache(
+    "workspace:responses", ttl=6 * 60 * 60, max_entries=1024, persistent=True
+)
 
-        # Override detection flags with our basic analysis (more reliable for keyword detection)
-        output.has_constraints = basic_analysis["has_constraints"]
-        output.has_role = basic_analysis["has_role"]
-        output.has_structure = basic_analysis["has_structure"]
 
-        # Merge suggestions if AI didn't provide enough
-        if len(output.suggestions) < 2 and basic_analysis["suggestions"]:
-            output.suggestions.extend(basic_analysis["suggestions"][:2])
+def workspace_cache_key(prompt: str, document_text: str) -> str:
+    return coalescing_key("workspace", prompt, document_text)
 
-        return output
 
-    except Exception as e:
-        logger.error(f"Error in prompt analysis: {e}")
-        # Return basic analysis on error
-        basic = analyze_prompt_quality(prompt)
-        return PromptAnalysisResult(
-            feedback="Could not get AI feedback, but here are some suggestions:",
-            has_constraints=basic["has_constraints"],
-            has_role=basic["has_role"],
-            has_structure=basic["has_structure"],
-            suggestions=basic["suggestions"],
+def _cache_workspace_response(prompt: str, document_text: str, response: str):
+    if response.strip():
+        workspace_response_cache.set(
+            workspace_cache_key(prompt, document_text), response
         )
 
 
+async def warm_workspace_response(prompt: str, document_text: str) -> bool:
+    """
+    Compute a workspace answer into the response cache at batch priority
+
+    Returns False when it was already cached.
+    """
+    if workspace_response_cache.get(workspace_cache_key(prompt, document_text)):
+        return False
+    full_prompt = build_workspace_prompt(prompt, document_text)
+    result = await model_router.run(
+        "workspace",
+        lambda target: workspace_agent.run(full_prompt, model=model_for(target)),
+        LLMPriority.BATCH,
+    )
+    _cache_workspace_response(prompt, document_text, result.output)
+    return True
+
+
+async def _stream_workspace(prompt: str, target: RouteTarget) -> AsyncIterator[str]:
+    async with workspace_agent.run_stream(prompt, model=model_for(target)) as response:
+        async for text in response.stream_text(delta=True):
+            yield text
+
+
 async def stream_workspace_response(
     prompt: str, document_text: str
 ) -> AsyncIterator[str]:
     """
     Stream workspace AI response for document summarization
 
+    Identical concurrent requests (same prompt and document) share a single
+    upstream stream; late joiners get the chunks sent so far replayed first.
+
     Args:
         prompt: User's prompt for summarization
         document_text: The document content to summarize
@@ -372,17 +696,211 @@ async def stream_workspace_response(
         str: Chunks of the summary as they're generated
     """
     try:
-        full_prompt = f"{prompt}\n\nDocument:\n{document_text}"
-
-        async with workspace_agent.run_stream(full_prompt) as response:
-            async for text in response.stream_text(delta=True):
+        # One key for the response cache and for coalescing, so requests that
+        # would share a cached answer also share the upstream stream
+        key = workspace_cache_key(prompt, document_text)
+        cached = workspace_response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        full_prompt = build_workspace_prompt(prompt, document_text)
+
+        async def upstream() -> AsyncIterator[str]:
+            async for text in model_router.stream(
+                "workspace",
+                lambda target: _stream_workspace(full_prompt, target),
+                hedge=True,
+            ):
                 yield text
 
+        parts = []
+        async for text in stream_coalescer.subscribe(key, upstream):
+            parts.append(text)
+            yield text
+        _cache_workspace_response(prompt, document_text, "".join(parts))
+
+    except LLMQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error in workspace streaming: {e}")
         yield "An error occurred during summarization. Please try again."
 
 
+# Documents longer than this are summarized map-reduce style
+SINGLE_PASS_CHARS = 10000
+CHUNK_TOKENS = 2000
+MAX_CHUNKS = 60
+MAP_DEADLINE_SHARE = 0.6
+# Sections one request summarizes at once, so a few long documents can't
+# fill the LLM scheduler's queue for everyone else
+MAP_CONCURRENCY = 6
+# How often a section is retried when the LLM queue is full
+MAP_QUEUE_FULL_RETRIES = 2
+
+CHUNK_SUMMARY_INSTRUCTION = """Summarize this section of a longer document.
+Keep every key fact, figure, name and conclusion, and do not add anything that
+is not in the text. Use concise bullet points."""
+
+# Section summaries don't depend on the user's prompt, so every re-prompt on
+# the same document reuses them and only redoes the reduce step
+chunk_summary_cache = TTLCache(
+    "workspace:chunk_summaries", ttl=24 * 60 * 60, max_entries=4096, persistent=True
+)
+
+
+async def summarize_chunk(chunk: str) -> tuple[str, bool]:
+    """
+    Summarize one document section, cached by the section's hash
+
+    Returns:
+        tuple: (summary, whether it came from the cache)
+    """
+
+    async def compute() -> str:
+        result = await model_router.run(
+            "workspace",
+            lambda target: workspace_agent.run(
+                f"{CHUNK_SUMMARY_INSTRUCTION}\n\nSection:\n{chunk}",
+                model=model_for(target),
+            ),
+            LLMPriority.STANDARD,
+        )
+        return result.output
+
+    key = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+    return await chunk_summary_cache.get_or_compute_with_status(key, compute)
+
+
+async def stream_map_reduce_summary(
+    prompt: str, document_text: str
+) -> AsyncIterator[str | dict]:
+    """
+    Summarize a long document in chunks, then apply the prompt to the result
+
+    Up to MAP_CONCURRENCY sections are summarized at once and a progress dict
+    is yielded for each one as it finishes. Documents with more than
+    MAX_CHUNKS sections are cut; every progress dict says so. The reduce
+    pass then streams the answer to the user's prompt as str chunks.
+
+    Yields:
+        dict: {"index", "total", "document_sections", "truncated", "summary",
+            "cached", "error"} per section
+        str: Chunks of the final answer
+    """
+    chunks = split_into_chunks(document_text, CHUNK_TOKENS)
+    document_sections = len(chunks)
+    truncated = document_sections > MAX_CHUNKS
+    if truncated:
+        logger.warning(
+            f"Document has {document_sections} sections, summarizing the first {MAX_CHUNKS}"
+        )
+        chunks = chunks[:MAX_CHUNKS]
+    total = len(chunks)
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+
+    async def summarize_section(index: int):
+        try:
+            async with semaphore:
+                for attempt in range(MAP_QUEUE_FULL_RETRIES + 1):
+                    try:
+                        summary, cached = await summarize_chunk(chunks[index])
+                        return index, summary, cached, None
+                    except LLMQueueFull as e:
+                        # The stream has started: wait instead of failing it
+                        if attempt == MAP_QUEUE_FULL_RETRIES:
+                            raise
+                        await bounded(asyncio.sleep(e.retry_after))
+        except Exception as e:
+            logger.error(f"Error summarizing section {index + 1}/{total}: {e}")
+            return index, None, False, str(e)
+
+    summaries: list[str | None] = [None] * total
+    # Leave part of the request's budget for the reduce pass; sections still
+    # running when the share is used up are skipped
+    with deadline_share(MAP_DEADLINE_SHARE):
+        tasks = [asyncio.create_task(summarize_section(i)) for i in range(total)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            index, summary, cached, error = await finished
+            summaries[index] = summary
+            yield {
+                "index": index,
+                "total": total,
+                "document_sections": document_sections,
+                "truncated": truncated,
+                "summary": summary,
+                "cached": cached,
+                "error": error,
+            }
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    sections = [
+        f"[Section {i + 1}]\n{summary}"
+        for i, summary in enumerate(summaries)
+        if summary
+    ]
+    if not sections:
+        raise ValueError("None of the document sections could be summarized")
+
+    if truncated:
+        coverage = (
+            f"into {document_sections} sections; only the first {total} were "
+            "summarized, so say that the answer covers the start of the document "
+            "only. Apply the request above using these section summaries"
+        )
+    else:
+        coverage = (
+            f"into {total} sections and each section was summarized. Apply the "
+            "request above to the whole document using these section summaries"
+        )
+    # Over budget, the last sections are dropped before the prompt is cut
+    reduce_prompt = (
+        PromptBuilder("workspace.reduce")
+        .add("prompt", prompt, priority=2, min_tokens=500)
+        .add(
+            "instructions",
+            "\n\nThe document is too long to read at once, so it was split "
+            f"{coverage}, in document order:\n\n",
+        )
+        .add("sections", items=sections, item_separator="\n\n", priority=1)
+        .build()
+    )
+
+    async def upstream() -> AsyncIterator[str]:
+        async for text in model_router.stream(
+            "workspace",
+            lambda target: _stream_workspace(reduce_prompt, target),
+            hedge=True,
+        ):
+            yield text
+
+    key = coalescing_key("workspace-reduce", reduce_prompt)
+    async for text in stream_coalescer.subscribe(key, upstream):
+        yield text
+
+
+async def generate_map_reduce_summary(prompt: str, document_text: str) -> str:
+    """
+    Complete map-reduce summary (non-streaming)
+
+    If the request's deadline passes during the reduce pass, the answer
+    produced so far is returned.
+    """
+    parts = []
+    try:
+        async for item in stream_map_reduce_summary(prompt, document_text):
+            if isinstance(item, str):
+                parts.append(item)
+    except DeadlineExceeded:
+        if not parts:
+            raise
+        logger.warning("Map-reduce summary cut short by the deadline")
+    return "".join(parts)
+
+
 async def generate_tutor_message(
     message: str, lesson_context: dict | None = None
 ) -> str:
@@ -397,36 +915,22 @@ async def generate_tutor_message(
         str: Complete response
     """
     try:
-        # Build contextual prompt
-        if lesson_context:
-            context_parts = []
-
-            if lesson_context.get("module"):
-                context_parts.append(f"Module: {lesson_context['module']}")
-
-            if lesson_context.get("lesson"):
-                context_parts.append(f"Current Lesson: {lesson_context['lesson']}")
-
-            if lesson_context.get("step"):
-                context_parts.append(f"Lesson Step: {lesson_context['step']}")
-
-            if lesson_context.get("attempts") and lesson_context["attempts"] > 0:
-                context_parts.append(f"Attempt Number: {lesson_context['attempts']}")
-
-            if lesson_context.get("last_prompt"):
-                context_parts.append(
-                    f"User's Last Prompt: {lesson_context['last_prompt']}"
-                )
-
-            context_str = "\n".join(context_parts)
-            full_prompt = (
-                f"[LESSON CONTEXT]\n{context_str}\n\n[USER MESSAGE]\n{message}"
-            )
-        else:
-            full_prompt = message
-
-        result = await tutor_agent.run(full_prompt)
-        return result.output
+        full_prompt = build_tutor_prompt(message, lesson_context)
+        key = coalescing_key("tutor", full_prompt)
+        cached = tutor_response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = await model_router.run(
+            "tutor",
+            lambda target: _run_tutor(full_prompt, target),
+            LLMPriority.INTERACTIVE,
+            hedge=True,
+        )
+        tutor_response_cache.set(key, response)
+        return response
+    except LLMQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error generating tutor message: {e}")
         return "I apologize, but I encountered an error. Please try again."
@@ -446,13 +950,27 @@ async def generate_workspace_summary(
         tuple: (summary text, has_constraints)
     """
     try:
-        full_prompt = f"{prompt}\n\nDocument:\n{document_text}"
-        result = await workspace_agent.run(full_prompt)
-
         # Analyze if prompt had constraints
         analysis = analyze_prompt_quality(prompt)
 
+        cached = workspace_response_cache.get(
+            workspace_cache_key(prompt, document_text)
+        )
+        if cached is not None:
+            return cached, analysis["has_constraints"]
+
+        full_prompt = build_workspace_prompt(prompt, document_text)
+        result = await model_router.run(
+            "workspace",
+            lambda target: workspace_agent.run(full_prompt, model=model_for(target)),
+            LLMPriority.INTERACTIVE,
+            hedge=True,
+        )
+        _cache_workspace_response(prompt, document_text, result.output)
+
         return result.output, analysis["has_constraints"]
+    except LLMQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error generating workspace summary: {e}")
         return "An error occurred during summarization. Please try again.", False
@@ -518,12 +1036,13 @@ Focus on:
             suggestions: list[str]
 
         analysis_agent = Agent(
-            model=get_google_model("gemini-flash-latest", thinking_enabled=False),
+            model=get_google_model(AGENT_MODEL, thinking_enabled=False),
             result_type=AnalysisOutput,
             system_prompt="You are an expert presentation analyst. Provide constructive, specific feedback.",
         )
 
-        result = await analysis_agent.run(analysis_prompt)
+        async with llm_scheduler.slot(AGENT_MODEL, LLMPriority.STANDARD):
+            result = await analysis_agent.run(analysis_prompt)
 
         return PresentationAnalysis(
             strengths=result.data.strengths,
@@ -531,6 +1050,8 @@ Focus on:
             suggestions=result.data.suggestions,
         )
 
+    except LLMQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error generating presentation analysis: {e}")
         # Return default analysis if API fails
@@ -484,6 +484,22 @@ FULL_CURRICULUM = [
 ]
 
 
+# Example prompt shown to a learner after a few weak attempts, by submodule
+# number. The lesson pre-warm runs the same text through the workspace agent,
+# so this is its only copy: the page reads it from the submodule's
+# "example_prompt" field.
+EXAMPLE_PROMPTS: Dict[int, str] = {
+    1: "<strong>Based only on the text provided</strong>, summarize the key points without adding any external information.",
+    2: "<strong>You are an expert analyst.</strong> Review this document and provide insights from your professional perspective.",
+    3: "<strong>Let's analyze this step by step:</strong>\n1. First, identify the main themes\n2. Then, examine the evidence\n3. Finally, draw conclusions",
+    4: "<strong>You are a senior consultant.</strong> Using only the information provided, analyze this document step by step: First, identify key issues. Then, evaluate implications. Finally, provide recommendations.",
+}
+
+for _module in FULL_CURRICULUM:
+    for _submodule in _module["submodules"]:
+        _submodule["example_prompt"] = EXAMPLE_PROMPTS.get(_submodule["id"])
+
+
 def get_curriculum() -> List[Dict[str, Any]]:
     """Get the complete curriculum structure"""
     return FULL_CURRICULUM
@@ -0,0 +1,102 @@
+"""
+Bounded conversation memory for the AI tutor
+
+The last few turns are kept verbatim; older turns are folded into a rolling
+summary by a background task, so the tutor remembers the whole conversation
+while its input stays roughly constant in size.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from app.core.deadline import detached_context
+from app.prompting.agents import summarize_conversation
+
+logger = logging.getLogger(__name__)
+
+
+class TutorMemory:
+    """Recent tutor turns verbatim plus a rolling summary of older ones"""
+
+    def __init__(
+        self,
+        recent_turns: int = 4,
+        summarize_every_turns: int = 3,
+        max_messages: int = 60,
+    ):
+        self.recent_messages = recent_turns * 2
+        # Fold older turns in batches rather than after every reply
+        self.summarize_threshold = self.recent_messages + summarize_every_turns * 2
+        self.max_messages = max_messages
+
+        self.summaries = 0
+        self.summarized_messages = 0
+        self.failures = 0
+        self.dropped_messages = 0
+
+    def recall(self, session) -> Dict[str, Any]:
+        """Memory fields for the tutor's lesson context"""
+        recent = [
+            f"{message['role'].capitalize()}: {message['content']}"
+            + (" [interrupted]" if message.get("status") != "complete" else "")
+            for message in session.tutor_history[-self.recent_messages :]
+            if message["content"]
+        ]
+        return {
+            "conversation_summary": session.tutor_summary,
+            "recent_messages": recent,
+        }
+
+    def remember(self, session) -> None:
+        """Start folding older turns into the summary once enough piled up"""
+        history = session.tutor_history
+        if len(history) <= self.summarize_threshold:
+            return
+        task = session.tutor_summary_task
+        if task is not None and not task.done():
+            return
+
+        count = len(history) - self.recent_messages
+        session.tutor_summary_task = asyncio.create_task(
+            self._summarize(session, count), context=detached_context()
+        )
+
+    async def _summarize(self, session, count: int) -> None:
+        messages = [m for m in session.tutor_history[:count] if m["content"]]
+        try:
+            summary = await summarize_conversation(session.tutor_summary, messages)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(
+                f"Could not summarize tutor history for {session.session_id}: {e}"
+            )
+            # Keep the history bounded even while summaries fail
+            overflow = len(session.tutor_history) - self.max_messages
+            if overflow > 0:
+                del session.tutor_history[:overflow]
+                self.dropped_messages += overflow
+            return
+
+        # Messages are only ever appended, so the first count are the ones read
+        session.tutor_summary = summary
+        del session.tutor_history[:count]
+        self.summaries += 1
+        self.summarized_messages += count
+        logger.info(
+            f"Folded {count} tutor messages into the summary for {session.session_id}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """How much tutor history was folded into summaries"""
+        return {
+            "recent_messages": self.recent_messages,
+            "summaries": self.summaries,
+            "summarized_messages": self.summarized_messages,
+            "failures": self.failures,
+            "dropped_messages": self.dropped_messages,
+        }
+
+
+# Global tutor memory instance
+tutor_memory = TutorMemory()
@@ -2,7 +2,7 @@
 Pydantic models for prompting module
 """
 
-from typing import List, Optional, Any, Dict
+from typing import List, Literal, Optional, Any, Dict
 from pydantic import BaseModel, Field
 
 
@@ -57,6 +57,11 @@ class SummarizeRequest(BaseModel):
 
     prompt: str = Field(..., description="User's summarization prompt")
     session_id: str = Field(..., description="Session ID to get document")
+    mode: Literal["auto", "single", "map_reduce"] = Field(
+        default="auto",
+        description="single: first 10k chars in one pass; map_reduce: whole "
+        "document in chunks; auto: map_reduce only when the document is longer",
+    )
 
 
 class WorkspaceResponse(BaseModel):
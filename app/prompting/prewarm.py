@@ -0,0 +1,150 @@
+"""
+Speculative lesson pre-warming
+
+When a module page renders we already know the lesson, its sample document
+and the canonical prompts learners are shown for it. A background task loads
+the sample (and its preview) and runs the canonical prompts through the
+workspace agent into the response cache, so the first summarize on the
+sample is served from memory. Work is deduplicated per lesson across
+sessions and runs at batch priority with a small concurrency cap.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.core.deadline import detached_context
+from app.core.llm_scheduler import LLMQueueFull
+from app.prompting.agents import warm_workspace_response
+from app.prompting.curriculum import EXAMPLE_PROMPTS
+from app.prompting.samples import load_sample, sample_filename
+from app.prompting.session_manager import UPLOADED_DOCUMENT_CHARS
+
+logger = logging.getLogger(__name__)
+
+# The weak prompt most learners try first
+BASELINE_PROMPT = "Summarize this document."
+
+
+def canonical_prompts(submodule_id: int) -> List[str]:
+    """The lesson's weak and good example prompts, as plain text"""
+    prompts = [BASELINE_PROMPT]
+    example = EXAMPLE_PROMPTS.get(submodule_id)
+    if example:
+        prompts.append(re.sub(r"<[^>]+>", "", example))
+    return prompts
+
+
+class LessonPrewarmer:
+    """One background warm-up per lesson at a time, with bounded concurrency"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_concurrent: int = 2,
+        min_interval_seconds: float = 10 * 60,
+    ):
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent
+        self.min_interval_seconds = min_interval_seconds
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._warmed_at: Dict[str, float] = {}
+
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.responses_computed = 0
+        self.responses_cached = 0
+        self.failed = 0
+
+    def _running_count(self) -> int:
+        return sum(1 for task in self._tasks.values() if not task.done())
+
+    def schedule(self, module_id: str, submodule_id: int) -> bool:
+        """
+        Start warming a lesson in the background unless it is already warm,
+        being warmed, or the concurrency cap is reached
+        """
+        if not self.enabled:
+            return False
+        filename = sample_filename(module_id, submodule_id)
+        if not filename:
+            return False
+
+        key = f"{module_id}-{submodule_id}"
+        task = self._tasks.get(key)
+        warmed_at = self._warmed_at.get(key, 0.0)
+        if (task is not None and not task.done()) or (
+            time.monotonic() - warmed_at < self.min_interval_seconds
+        ):
+            self.deduplicated += 1
+            return False
+        if self._running_count() >= self.max_concurrent:
+            self.rejected += 1
+            return False
+
+        # Detached so the page request's deadline does not apply
+        self._tasks[key] = asyncio.create_task(
+            self._warm(key, filename, submodule_id), context=detached_context()
+        )
+        self.scheduled += 1
+        return True
+
+    async def warm_lesson(self, module_id: str, submodule_id: int) -> bool:
+        """Warm a lesson now, ignoring the re-warm interval and concurrency cap"""
+        filename = sample_filename(module_id, submodule_id)
+        if not filename:
+            return False
+        key = f"{module_id}-{submodule_id}"
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            return await asyncio.shield(task)
+        return await self._warm(key, filename, submodule_id)
+
+    async def _warm(self, key: str, filename: str, submodule_id: int) -> bool:
+        try:
+            sample = load_sample(filename)
+            for prompt in canonical_prompts(submodule_id):
+                if await warm_workspace_response(
+                    prompt, sample.text[:UPLOADED_DOCUMENT_CHARS]
+                ):
+                    self.responses_computed += 1
+                else:
+                    self.responses_cached += 1
+            self._warmed_at[key] = time.monotonic()
+            logger.info(f"Pre-warmed lesson {key}")
+            return True
+        except LLMQueueFull:
+            # Live traffic has priority; try again on the next page view
+            logger.info(f"Skipped pre-warming {key}: LLM queue full")
+            return False
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Pre-warming lesson {key} failed: {e}")
+            return False
+        finally:
+            self._tasks.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lesson warm-ups scheduled, skipped and responses computed"""
+        return {
+            "enabled": self.enabled,
+            "running": self._running_count(),
+            "warm_lessons": len(self._warmed_at),
+            "scheduled": self.scheduled,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "responses_computed": self.responses_computed,
+            "responses_cached": self.responses_cached,
+            "failed": self.failed,
+        }
+
+
+# Global lesson pre-warmer instance
+lesson_prewarmer = LessonPrewarmer(
+    enabled=settings.prewarm.enabled,
+    max_concurrent=settings.prewarm.max_concurrent,
+)
@@ -19,10 +19,22 @@ from fastapi import (
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
+from app.core.cache import normalize_text
+from app.core.deadline import DeadlineExceeded, route_deadline
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull, llm_scheduler
+from app.core.streaming import ClientDisconnected, until_disconnected
+from app.core.supersede import RequestSuperseded, latest_requests
+from app.core.tokens import token_usage
 from app.prompting.agents import (
+    AGENT_MODEL,
+    SINGLE_PASS_CHARS,
     analyze_prompt_realtime,
+    enrich_prompt_analysis,
+    generate_map_reduce_summary,
     generate_tutor_message,
     generate_workspace_summary,
+    local_prompt_analysis,
+    stream_map_reduce_summary,
     stream_tutor_response,
     stream_workspace_response,
 )
@@ -45,8 +57,18 @@ from app.prompting.models import (
     SummarizeRequest,
     UploadResponse,
 )
+from app.prompting.memory import tutor_memory
+from app.prompting.prewarm import lesson_prewarmer
+from app.prompting.samples import load_sample, make_preview, sample_filename
 from app.prompting.session_manager import session_manager
-from app.prompting.utils import allowed_file, extract_text, sanitize_filename
+from app.prompting.utils import (
+    allowed_file,
+    analyze_prompt_quality,
+    extract_text,
+    prompt_changed_meaningfully,
+    prompt_features,
+    sanitize_filename,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -57,15 +79,16 @@ templates = Jinja2Templates(directory="frontend/templates")
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# Sample documents directory
-SAMPLES_DIR = Path("frontend/static/samples")
 
-# Load sample document mapping
-SAMPLE_MAPPING_FILE = SAMPLES_DIR / "document_mapping.json"
-SAMPLE_MAPPING = {}
-if SAMPLE_MAPPING_FILE.exists():
-    with open(SAMPLE_MAPPING_FILE) as f:
-        SAMPLE_MAPPING = json.load(f)
+def _superseded_response() -> JSONResponse:
+    """Response for a request replaced by a newer one from the same session"""
+    return JSONResponse(
+        status_code=409,
+        content={
+            "status": "superseded",
+            "detail": "Superseded by a newer request from this session",
+        },
+    )
 
 
 @router.get("/")
@@ -113,6 +136,9 @@ async def module_page(request: Request, module_id: str, submodule_id: int):
     else:
         template_name = "prompting/module.html"
 
+    # Warm the lesson's sample and canonical responses off the request path
+    lesson_prewarmer.schedule(module_id, submodule_id)
+
     response = templates.TemplateResponse(
         template_name,
         {
@@ -180,28 +206,47 @@ async def chat(message: ChatMessage) -> JSONResponse:
     if message.context:
         lesson_context["additional_context"] = message.context
 
+    lesson_context.update(tutor_memory.recall(session))
+
+    ticket = latest_requests.claim(message.session_id, "chat")
     try:
-        response = await generate_tutor_message(message.message, lesson_context)
+        with route_deadline("prompting.chat"):
+            response = await latest_requests.run(
+                ticket, generate_tutor_message(message.message, lesson_context)
+            )
         session.add_tutor_message("user", message.message)
         session.add_tutor_message("assistant", response)
+        tutor_memory.remember(session)
 
         return JSONResponse({"response": response})
+    except RequestSuperseded:
+        return _superseded_response()
+    except LLMQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/api/chat/stream")
-async def chat_stream(message: ChatMessage):
-    """Stream chat response from AI tutor"""
+async def chat_stream(message: ChatMessage, http_request: Request):
+    """
+    Stream chat response from AI tutor (stops when the client disconnects)
+
+    The whole stream is bounded by the prompting.chat_stream deadline; when it
+    runs out, the reply so far is kept and a {"status": "deadline_exceeded"}
+    event ends the stream.
+    """
     session = session_manager.get_session(message.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    session.add_tutor_message("user", message.message)
+    # Reject before the stream starts so overload is reported as a 429
+    llm_scheduler.check_admission(AGENT_MODEL, LLMPriority.INTERACTIVE)
 
     # Build lesson context for the AI
-    lesson_context = {}
+    lesson_context = tutor_memory.recall(session)
+    session.add_tutor_message("user", message.message)
 
     if session.current_module:
         # Find module info
@@ -239,34 +284,52 @@ async def chat_stream(message: ChatMessage):
     if message.context:
         lesson_context["additional_context"] = message.context
 
+    # A newer chat message from this session cancels this stream
+    ticket = latest_requests.claim(message.session_id, "chat")
+
     async def generate():
         full_response = ""
+        status = "cancelled"
         try:
-            async for chunk in stream_tutor_response(message.message, lesson_context):
-                full_response += chunk
-                # Send as SSE format
-                yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
+            with route_deadline("prompting.chat_stream"):
+                async for chunk in until_disconnected(
+                    http_request,
+                    stream_tutor_response(message.message, lesson_context),
+                    ticket=ticket,
+                ):
+                    full_response += chunk
+                    # Send as SSE format
+                    yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
 
             # Send completion signal
             yield f"data: {json.dumps({'chunk': '', 'done': True})}\n\n"
-
-            # Save complete response to session
-            session.add_tutor_message("assistant", full_response)
+            status = "complete"
+        except ClientDisconnected:
+            logger.info(f"Chat stream client disconnected: {message.session_id}")
+        except RequestSuperseded:
+            status = "superseded"
+            yield f"data: {json.dumps({'status': 'superseded', 'done': True})}\n\n"
+        except DeadlineExceeded as e:
+            status = "deadline_exceeded"
+            logger.warning(f"Chat stream cut short: {e}")
+            yield f"data: {json.dumps({'status': status, 'done': True})}\n\n"
         except Exception as e:
+            status = "error"
             logger.error(f"Streaming error: {e}")
             yield f"data: {json.dumps({'error': str(e), 'done': True})}\n\n"
+        finally:
+            latest_requests.release(ticket)
+            # Also runs when the server aborts the stream on disconnect
+            if status != "error":
+                session.add_tutor_message("assistant", full_response, status=status)
+                token_usage.record("chat", full_response, status)
+                tutor_memory.remember(session)
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 
-@router.post("/api/prompt/analyze")
-async def analyze_prompt(request: PromptAnalysisRequest):
-    """Analyze prompt in real-time and provide feedback"""
-    session = session_manager.get_session(request.session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    # Build lesson info for contextual analysis
+def _analysis_lesson_info(session) -> dict:
+    """Lesson info for contextual prompt analysis"""
     lesson_info = {}
 
     if session.current_module and session.current_submodule:
@@ -286,14 +349,115 @@ async def analyze_prompt(request: PromptAnalysisRequest):
                 lesson_info["submodule_id"] = submodule["id"]
                 lesson_info["lesson_name"] = submodule["title"]
 
+    return lesson_info
+
+
+@router.post("/api/prompt/analyze")
+async def analyze_prompt(request: PromptAnalysisRequest):
+    """Analyze prompt in real-time and provide feedback"""
+    session = session_manager.get_session(request.session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    lesson_info = _analysis_lesson_info(session)
+
+    # Only the latest keystroke's analysis matters
+    ticket = latest_requests.claim(request.session_id, "analyze")
     try:
-        analysis = await analyze_prompt_realtime(request.prompt, lesson_info)
+        with route_deadline("prompting.analyze"):
+            analysis = await latest_requests.run(
+                ticket, analyze_prompt_realtime(request.prompt, lesson_info)
+            )
         return analysis
+    except RequestSuperseded:
+        return _superseded_response()
     except Exception as e:
         logger.error(f"Prompt analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/api/prompt/analyze/stream")
+async def analyze_prompt_stream(request: PromptAnalysisRequest):
+    """
+    Tiered prompt analysis as SSE
+
+    The local heuristic result is sent immediately ("local" stage), then the
+    LLM's feedback ("llm" stage). When the lesson is the same and the prompt's
+    features and normalized text haven't changed meaningfully since the last
+    LLM analysis, that result is replayed instead of calling the model again.
+    """
+    session = session_manager.get_session(request.session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    lesson_info = _analysis_lesson_info(session)
+    ticket = latest_requests.claim(request.session_id, "analyze")
+
+    async def generate():
+        try:
+            basic = analyze_prompt_quality(request.prompt)
+            local = local_prompt_analysis(request.prompt, basic)
+            local_payload = {
+                "stage": "local",
+                "analysis": local.model_dump(),
+                "done": False,
+            }
+            yield f"data: {json.dumps(local_payload)}\n\n"
+
+            text = normalize_text(request.prompt)
+            features = prompt_features(request.prompt, basic)
+            previous = session.last_prompt_analysis
+            # The feedback is lesson-specific, so another lesson always re-asks
+            if (
+                previous
+                and previous["lesson"] == lesson_info
+                and not prompt_changed_meaningfully(
+                    previous["text"], previous["features"], text, features
+                )
+            ):
+                cached_payload = {
+                    "stage": "llm",
+                    "analysis": previous["result"],
+                    "cached": True,
+                    "done": True,
+                }
+                yield f"data: {json.dumps(cached_payload)}\n\n"
+                return
+
+            try:
+                with route_deadline("prompting.analyze"):
+                    analysis = await latest_requests.run(
+                        ticket,
+                        enrich_prompt_analysis(request.prompt, lesson_info, basic),
+                    )
+            except RequestSuperseded:
+                yield f"data: {json.dumps({'status': 'superseded', 'done': True})}\n\n"
+                return
+            except Exception as e:
+                # The local result already on screen stays as the answer
+                logger.error(f"Prompt analysis LLM stage error: {e}")
+                yield f"data: {json.dumps({'stage': 'llm', 'error': str(e), 'done': True})}\n\n"
+                return
+
+            session.last_prompt_analysis = {
+                "lesson": lesson_info,
+                "text": text,
+                "features": features,
+                "result": analysis.model_dump(),
+            }
+            llm_payload = {
+                "stage": "llm",
+                "analysis": analysis.model_dump(),
+                "cached": False,
+                "done": True,
+            }
+            yield f"data: {json.dumps(llm_payload)}\n\n"
+        finally:
+            latest_requests.release(ticket)
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
 @router.post("/api/sample/load")
 async def load_sample_document(request: Request):
     """Load a sample document for the current lesson"""
@@ -307,35 +471,27 @@ async def load_sample_document(request: Request):
         raise HTTPException(status_code=404, detail="Session not found")
 
     # Get sample document for this lesson
-    mapping_key = f"{module_id}-{submodule_id}"
-    sample_filename = SAMPLE_MAPPING.get(mapping_key)
+    filename = sample_filename(module_id, submodule_id)
 
-    if not sample_filename:
+    if not filename:
         return JSONResponse(
             {"success": False, "error": "No sample document available for this lesson"}
         )
 
     try:
-        sample_path = SAMPLES_DIR / sample_filename
-        if not sample_path.exists():
-            raise FileNotFoundError(f"Sample file not found: {sample_filename}")
-
-        with open(sample_path, "r", encoding="utf-8") as f:
-            text = f.read()
+        # Usually already loaded by the lesson pre-warm
+        sample = load_sample(filename)
 
         # Store in session
-        session.set_document(text, f"sample_{sample_filename}")
+        session.set_document(sample.text, f"sample_{filename}")
         session.current_step = "prompt"
 
-        # Generate preview
-        preview = text[:500] + "..." if len(text) > 500 else text
-
         return JSONResponse(
             {
                 "success": True,
-                "filename": f"Sample: {sample_filename}",
-                "preview": preview,
-                "full_content": text,
+                "filename": f"Sample: {filename}",
+                "preview": sample.preview,
+                "full_content": sample.text,
             }
         )
 
@@ -391,7 +547,7 @@ async def upload_file(file: UploadFile = File(...), session_id: str = FastAPIFor
         session.current_step = "prompt"
 
         # Generate preview
-        preview = text[:500] + "..." if len(text) > 500 else text
+        preview = make_preview(text)
 
         # Generate URL for accessing the uploaded file
         file_url = f"/uploads/{session_id}_{safe_filename}"
@@ -408,6 +564,13 @@ async def upload_file(file: UploadFile = File(...), session_id: str = FastAPIFor
         return UploadResponse(success=False, error=str(e))
 
 
+def _use_map_reduce(request: SummarizeRequest, session) -> bool:
+    """Whether to summarize the full document in chunks"""
+    if request.mode == "auto":
+        return len(session.full_document or "") > SINGLE_PASS_CHARS
+    return request.mode == "map_reduce"
+
+
 @router.post("/api/summarize")
 async def summarize(request: SummarizeRequest) -> JSONResponse:
     """Generate summary (non-streaming)"""
@@ -418,10 +581,26 @@ async def summarize(request: SummarizeRequest) -> JSONResponse:
     if not session.uploaded_document:
         raise HTTPException(status_code=400, detail="No document uploaded")
 
+    ticket = latest_requests.claim(request.session_id, "summarize")
     try:
-        summary, has_constraints = await generate_workspace_summary(
-            request.prompt, session.uploaded_document
-        )
+        if _use_map_reduce(request, session):
+            with route_deadline("prompting.summarize"):
+                summary = await latest_requests.run(
+                    ticket,
+                    generate_map_reduce_summary(
+                        request.prompt,
+                        session.full_document or session.uploaded_document,
+                    ),
+                )
+            has_constraints = analyze_prompt_quality(request.prompt)["has_constraints"]
+        else:
+            with route_deadline("prompting.summarize"):
+                summary, has_constraints = await latest_requests.run(
+                    ticket,
+                    generate_workspace_summary(
+                        request.prompt, session.uploaded_document
+                    ),
+                )
 
         session.add_workspace_message("user", request.prompt)
         session.add_workspace_message("assistant", summary)
@@ -429,14 +608,27 @@ async def summarize(request: SummarizeRequest) -> JSONResponse:
 
         return JSONResponse({"summary": summary, "has_constraints": has_constraints})
 
+    except RequestSuperseded:
+        return _superseded_response()
+    except LLMQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Summarization error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/api/summarize/stream")
-async def summarize_stream(request: SummarizeRequest):
-    """Stream summarization response"""
+async def summarize_stream(request: SummarizeRequest, http_request: Request):
+    """
+    Stream summarization response (stops when the client disconnects)
+
+    In map-reduce mode a {"stage": "section"} event is sent as each section
+    summary finishes, before the final answer streams in.
+
+    The whole stream, map and reduce passes included, is bounded by the
+    prompting.summarize_stream deadline; when it runs out, the answer so far
+    is kept and a {"status": "deadline_exceeded"} event ends the stream.
+    """
     session = session_manager.get_session(request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -444,21 +636,39 @@ async def summarize_stream(request: SummarizeRequest):
     if not session.uploaded_document:
         raise HTTPException(status_code=400, detail="No document uploaded")
 
+    # Reject before the stream starts so overload is reported as a 429
+    llm_scheduler.check_admission(AGENT_MODEL, LLMPriority.INTERACTIVE)
+
     session.add_workspace_message("user", request.prompt)
 
     # Get document text (guaranteed to be str due to check above)
-    document_text = session.uploaded_document
+    if _use_map_reduce(request, session):
+        source = stream_map_reduce_summary(
+            request.prompt, session.full_document or session.uploaded_document
+        )
+    else:
+        source = stream_workspace_response(request.prompt, session.uploaded_document)
+
+    # Pressing summarize again cancels this stream
+    ticket = latest_requests.claim(request.session_id, "summarize")
 
     async def generate():
         full_response = ""
+        status = "cancelled"
         try:
-            async for chunk in stream_workspace_response(request.prompt, document_text):
-                full_response += chunk
-                yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
+            with route_deadline("prompting.summarize_stream"):
+                async for chunk in until_disconnected(
+                    http_request, source, ticket=ticket
+                ):
+                    if isinstance(chunk, dict):
+                        # Map-reduce progress for one document section
+                        section_payload = {"stage": "section", **chunk, "done": False}
+                        yield f"data: {json.dumps(section_payload)}\n\n"
+                        continue
+                    full_response += chunk
+                    yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
 
             # Analyze prompt quality
-            from app.prompting.utils import analyze_prompt_quality
-
             analysis = analyze_prompt_quality(request.prompt)
 
             # Send completion with metadata
@@ -471,14 +681,28 @@ async def summarize_stream(request: SummarizeRequest):
                 },
             }
             yield f"data: {json.dumps(metadata_payload)}\n\n"
-
-            # Save complete response
-            session.add_workspace_message("assistant", full_response)
+            status = "complete"
             session.prompt_attempts += 1
 
+        except ClientDisconnected:
+            logger.info(f"Summarize stream client disconnected: {request.session_id}")
+        except RequestSuperseded:
+            status = "superseded"
+            yield f"data: {json.dumps({'status': 'superseded', 'done': True})}\n\n"
+        except DeadlineExceeded as e:
+            status = "deadline_exceeded"
+            logger.warning(f"Summarize stream cut short: {e}")
+            yield f"data: {json.dumps({'status': status, 'done': True})}\n\n"
         except Exception as e:
+            status = "error"
             logger.error(f"Streaming summarization error: {e}")
             yield f"data: {json.dumps({'error': str(e), 'done': True})}\n\n"
+        finally:
+            latest_requests.release(ticket)
+            # Also runs when the server aborts the stream on disconnect
+            if status != "error":
+                session.add_workspace_message("assistant", full_response, status=status)
+                token_usage.record("summarize", full_response, status)
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
@@ -576,12 +800,15 @@ async def analyze_presentation(
         # Use Gemini API to analyze the presentation
         from app.prompting.agents import generate_presentation_analysis
 
-        analysis = await generate_presentation_analysis(
-            presentation_text, request.topic
-        )
+        with route_deadline("prompting.presentation"):
+            analysis = await generate_presentation_analysis(
+                presentation_text, request.topic
+            )
 
         return analysis
 
+    except LLMQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Presentation analysis error: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
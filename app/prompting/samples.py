@@ -0,0 +1,65 @@
+"""
+Sample documents mapped to lessons
+
+Samples are static files, so each one is read and its preview computed once
+per process and then served from memory.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sample documents directory
+SAMPLES_DIR = Path("frontend/static/samples")
+
+# Load sample document mapping
+SAMPLE_MAPPING_FILE = SAMPLES_DIR / "document_mapping.json"
+SAMPLE_MAPPING: Dict[str, str] = {}
+if SAMPLE_MAPPING_FILE.exists():
+    with open(SAMPLE_MAPPING_FILE) as f:
+        SAMPLE_MAPPING = json.load(f)
+
+PREVIEW_CHARS = 500
+
+
+def make_preview(text: str) -> str:
+    """Document preview shown in the workspace"""
+    return text[:PREVIEW_CHARS] + "..." if len(text) > PREVIEW_CHARS else text
+
+
+@dataclass(frozen=True)
+class SampleDocument:
+    filename: str
+    text: str
+    preview: str
+
+
+_samples: Dict[str, SampleDocument] = {}
+
+
+def sample_filename(module_id: str, submodule_id: int) -> Optional[str]:
+    """The sample file mapped to a lesson, if any"""
+    return SAMPLE_MAPPING.get(f"{module_id}-{submodule_id}")
+
+
+def load_sample(filename: str) -> SampleDocument:
+    """
+    Read a sample document (cached after the first read)
+
+    Raises:
+        FileNotFoundError: If the sample file does not exist
+    """
+    sample = _samples.get(filename)
+    if sample is None:
+        sample_path = SAMPLES_DIR / filename
+        if not sample_path.exists():
+            raise FileNotFoundError(f"Sample file not found: {filename}")
+
+        with open(sample_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        sample = _samples[filename] = SampleDocument(filename, text, make_preview(text))
+    return sample
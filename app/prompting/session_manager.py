@@ -2,6 +2,7 @@
 In-memory session manager for prompting module
 """
 
+import asyncio
 import uuid
 from typing import Dict, Optional
 from datetime import datetime, timedelta
@@ -9,6 +10,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Characters of a document kept for single-pass workspace prompts
+UPLOADED_DOCUMENT_CHARS = 10000
+
 
 class SessionData:
     """Session data container"""
@@ -27,6 +31,7 @@ class SessionData:
 
         # Document storage (in memory)
         self.uploaded_document: Optional[str] = None
+        self.full_document: Optional[str] = None  # Untruncated, for map-reduce
         self.document_filename: Optional[str] = None
 
         # Progress tracking
@@ -40,13 +45,21 @@ class SessionData:
         self.tutor_history: list[Dict[str, str]] = []
         self.workspace_history: list[Dict[str, str]] = []
 
+        # Rolling summary of tutor turns no longer kept in tutor_history
+        self.tutor_summary: str = ""
+        self.tutor_summary_task: Optional[asyncio.Task] = None
+
+        # Last LLM prompt analysis (lesson, normalized text, features, result)
+        self.last_prompt_analysis: Optional[Dict] = None
+
     def update_access_time(self):
         """Update last accessed timestamp"""
         self.last_accessed = datetime.now()
 
     def set_document(self, text: str, filename: str):
         """Store uploaded document"""
-        self.uploaded_document = text[:10000]  # Store first 10k chars
+        self.uploaded_document = text[:UPLOADED_DOCUMENT_CHARS]
+        self.full_document = text
         self.document_filename = filename
         logger.info(f"Document stored for session {self.session_id}: {filename}")
 
@@ -67,16 +80,26 @@ class SessionData:
             and submodule_id in self.completed_modules[module_id]
         )
 
-    def add_tutor_message(self, role: str, content: str):
-        """Add message to tutor history"""
+    def add_tutor_message(self, role: str, content: str, status: str = "complete"):
+        """Add message to tutor history (status "cancelled" for partial replies)"""
         self.tutor_history.append(
-            {"role": role, "content": content, "timestamp": datetime.now().isoformat()}
+            {
+                "role": role,
+                "content": content,
+                "status": status,
+                "timestamp": datetime.now().isoformat(),
+            }
         )
 
-    def add_workspace_message(self, role: str, content: str):
-        """Add message to workspace history"""
+    def add_workspace_message(self, role: str, content: str, status: str = "complete"):
+        """Add message to workspace history (status "cancelled" for partial replies)"""
         self.workspace_history.append(
-            {"role": role, "content": content, "timestamp": datetime.now().isoformat()}
+            {
+                "role": role,
+                "content": content,
+                "status": status,
+                "timestamp": datetime.now().isoformat(),
+            }
         )
 
 
@@ -2,10 +2,14 @@
 Utility functions for prompting module
 """
 
+import bisect
+import difflib
 import re
 import logging
 from pathlib import Path
 
+from app.core.tokens import estimate_tokens
+
 logger = logging.getLogger(__name__)
 
 # Allowed file extensions
@@ -88,15 +92,10 @@ def extract_text(filepath: Path) -> str:
     return text
 
 
-def analyze_prompt_quality(prompt: str) -> dict:
-    """
-    Analyze prompt quality and provide suggestions
-    Returns dict with analysis results
-    """
-    prompt_lower = prompt.lower()
-
-    # Check for constraints
-    constraint_keywords = [
+# Keyword sets behind the prompt quality heuristics (substring matches),
+# built once at import instead of on every call
+PROMPT_FEATURE_KEYWORDS = {
+    "has_constraints": (
         "based on",
         "only",
         "don't",
@@ -106,15 +105,9 @@ def analyze_prompt_quality(prompt: str) -> dict:
         "must",
         "should not",
         "exclude",
-    ]
-    has_constraints = any(keyword in prompt_lower for keyword in constraint_keywords)
-
-    # Check for role assignment
-    role_keywords = ["you are", "act as", "as a", "role:", "expert", "professional"]
-    has_role = any(keyword in prompt_lower for keyword in role_keywords)
-
-    # Check for structure/steps
-    structure_keywords = [
+    ),
+    "has_role": ("you are", "act as", "as a", "role:", "expert", "professional"),
+    "has_structure": (
         "step by step",
         "first",
         "then",
@@ -124,9 +117,27 @@ def analyze_prompt_quality(prompt: str) -> dict:
         "bullet points",
         "list",
         "format",
-    ]
-    has_structure = any(keyword in prompt_lower for keyword in structure_keywords)
+    ),
+}
+
+
+_CONSTRAINT_KEYWORDS = PROMPT_FEATURE_KEYWORDS["has_constraints"]
+_ROLE_KEYWORDS = PROMPT_FEATURE_KEYWORDS["has_role"]
+_STRUCTURE_KEYWORDS = PROMPT_FEATURE_KEYWORDS["has_structure"]
+
+
+def _contains_any(text: str, keywords: tuple) -> bool:
+    """Substring test that stops at the first hit (no generator overhead)"""
+    for keyword in keywords:
+        if keyword in text:
+            return True
+    return False
 
+
+def _score_prompt(
+    has_constraints: bool, has_role: bool, has_structure: bool, word_count: int
+) -> dict:
+    """Build the analysis dict from detected features and the word count"""
     # Generate suggestions
     suggestions = []
 
@@ -135,12 +146,12 @@ def analyze_prompt_quality(prompt: str) -> dict:
             "Consider adding constraints to prevent hallucination (e.g., 'Based only on the provided text')"
         )
 
-    if not has_role and len(prompt.split()) > 10:
+    if not has_role and word_count > 10:
         suggestions.append(
             "Try assigning a specific role or perspective (e.g., 'You are an expert analyst...')"
         )
 
-    if not has_structure and len(prompt.split()) > 15:
+    if not has_structure and word_count > 15:
         suggestions.append(
             "Consider adding structure (e.g., 'First analyze... then conclude...' or 'List the key points')"
         )
@@ -160,9 +171,139 @@ def analyze_prompt_quality(prompt: str) -> dict:
         "has_structure": has_structure,
         "suggestions": suggestions,
         "score": min(score, 100),
+        "word_count": word_count,
     }
 
 
+def analyze_prompt_quality(prompt: str) -> dict:
+    """
+    Analyze prompt quality and provide suggestions
+    Returns dict with analysis results
+    """
+    prompt_lower = prompt.lower()
+    return _score_prompt(
+        _contains_any(prompt_lower, _CONSTRAINT_KEYWORDS),
+        _contains_any(prompt_lower, _ROLE_KEYWORDS),
+        _contains_any(prompt_lower, _STRUCTURE_KEYWORDS),
+        len(prompt.split()),
+    )
+
+
+def analyze_prompts_batch(prompts: list[str]) -> list[dict]:
+    """
+    Analyze many prompts at once (offline analytics, cache warming)
+
+    The prompts are joined with NUL separators (which no keyword contains)
+    and each keyword is located with str.find over the whole corpus. After a
+    hit the search resumes at the next prompt, so every keyword costs one C
+    scan of the corpus plus at most one step per prompt.
+    """
+    if not prompts:
+        return []
+
+    # Offsets come from the lowered prompts: lower() can change a string's
+    # length ("İ" becomes two characters)
+    lowered = [prompt.lower() for prompt in prompts]
+    starts = []
+    offset = 0
+    for prompt in lowered:
+        starts.append(offset)
+        offset += len(prompt) + 1
+    starts.append(offset)
+
+    corpus = "\x00".join(lowered)
+    hits = {feature: bytearray(len(prompts)) for feature in PROMPT_FEATURE_KEYWORDS}
+    for feature, keywords in PROMPT_FEATURE_KEYWORDS.items():
+        found = hits[feature]
+        for keyword in keywords:
+            position = corpus.find(keyword)
+            while position != -1:
+                index = bisect.bisect_right(starts, position) - 1
+                found[index] = 1
+                position = corpus.find(keyword, starts[index + 1])
+
+    return [
+        _score_prompt(
+            bool(hits["has_constraints"][i]),
+            bool(hits["has_role"][i]),
+            bool(hits["has_structure"][i]),
+            len(prompt.split()),
+        )
+        for i, prompt in enumerate(prompts)
+    ]
+
+
+def prompt_features(prompt: str, analysis: dict) -> tuple:
+    """Feature vector that determines the heuristic analysis of a prompt"""
+    word_count = analysis.get("word_count", len(prompt.split()))
+    return (
+        analysis["has_constraints"],
+        analysis["has_role"],
+        analysis["has_structure"],
+        word_count > 10,
+        word_count > 15,
+    )
+
+
+def prompt_changed_meaningfully(
+    previous_text: str,
+    previous_features: tuple,
+    text: str,
+    features: tuple,
+    min_similarity: float = 0.9,
+) -> bool:
+    """
+    Whether a prompt edit is worth a fresh LLM analysis
+
+    Texts are expected to be normalized. Any change in the feature vector
+    counts; otherwise the edit must change more than (1 - min_similarity)
+    of the text.
+    """
+    if previous_features != features:
+        return True
+    if previous_text == text:
+        return False
+    matcher = difflib.SequenceMatcher(None, previous_text, text)
+    return matcher.ratio() < min_similarity
+
+
+def split_into_chunks(text: str, max_tokens: int = 2000) -> list[str]:
+    """
+    Split text into chunks of at most max_tokens (estimated)
+
+    Chunks break at sentence ends where possible; a single sentence longer
+    than the budget is split on word boundaries.
+    """
+    max_chars = max_tokens * 4
+    chunks: list[str] = []
+    current = ""
+
+    for sentence in re.split(r"(?<=[.!?])\s+", text.strip()):
+        if not sentence:
+            continue
+        while estimate_tokens(sentence) > max_tokens:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if not sentence:
+            continue
+        candidate = f"{current} {sentence}" if current else sentence
+        if estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = candidate
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe storage"""
     # Remove path components
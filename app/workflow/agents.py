@@ -2,14 +2,30 @@
 AI agents for workflow automation using Gemini, Perplexity, and Tavily APIs
 """
 
+import asyncio
+import hashlib
 import json
+import logging
 import os
-from typing import Any, Dict, List, Optional
+import zlib
+from typing import Any, Dict, Hashable, List, Optional
 
 import google.generativeai as genai
 import httpx
-from google.generativeai.types import HarmBlockThreshold, HarmCategory
 
+from app.core.cache import TTLCache, normalize_key_text
+from app.core.circuit_breaker import circuit_breakers
+from app.core.context_cache import prefix_cache
+from app.core.deadline import DeadlineExceeded, bounded, expired
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull
+from app.core.prompt_budget import PromptBuilder
+from app.core.singleflight import coalescing_key
+from app.core.structured_output import (
+    StructuredOutputError,
+    generate_structured,
+    parse_structured,
+)
+from app.core.tokens import estimate_tokens
 from app.prompting.curriculum import FULL_CURRICULUM
 from app.workflow.ai_tools_database import (
     format_tools_for_prompt,
@@ -17,11 +33,15 @@ from app.workflow.ai_tools_database import (
 )
 from app.workflow.models import (
     AIToolSearchResult,
+    RoadmapDraft,
+    StepQuiz,
     WorkflowQuestion,
     WorkflowRoadmap,
     WorkflowStep,
 )
 
+logger = logging.getLogger(__name__)
+
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
@@ -34,18 +54,73 @@ else:
         "WARNING: No Gemini API key found. Set GEMINI_API_KEY or GOOGLE_API_KEY in .env"
     )
 
+# Per-source tool search caches, keyed by normalized query.
+# Stale entries are served immediately and refreshed in the background;
+# empty results (the sources' failure mode) are cached briefly so a failing
+# provider isn't hammered on every request.
+search_caches: Dict[str, TTLCache] = {
+    "gemini_web": TTLCache(
+        "search:gemini_web",
+        ttl=6 * 60 * 60,
+        stale_ttl=24 * 60 * 60,
+        negative_ttl=5 * 60,
+        max_entries=512,
+    ),
+    "perplexity": TTLCache(
+        "search:perplexity",
+        ttl=6 * 60 * 60,
+        stale_ttl=24 * 60 * 60,
+        negative_ttl=5 * 60,
+        max_entries=512,
+    ),
+    "tavily": TTLCache(
+        "search:tavily",
+        ttl=60 * 60,
+        stale_ttl=6 * 60 * 60,
+        negative_ttl=2 * 60,
+        max_entries=512,
+    ),
+}
+
+
+# Model used for roadmap generation (part of the roadmap cache key)
+ROADMAP_MODEL = "gemini-flash-latest"
+
+# Generated roadmaps (quizzes included) stored as zlib-compressed JSON,
+# bounded by entry count and total compressed bytes
+roadmap_cache = TTLCache(
+    "workflow:roadmap",
+    ttl=24 * 60 * 60,
+    max_entries=256,
+    max_size=16 * 1024 * 1024,
+    persistent=True,
+)
 
-async def generate_workflow_questions(task_input: str) -> List[WorkflowQuestion]:
+
+def get_search_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit ratios and counters for each tool search source"""
+    return {source: cache.stats() for source, cache in search_caches.items()}
+
+
+async def _cached_search(
+    source: str, key: Hashable, search
+) -> List[AIToolSearchResult]:
     """
-    Use Gemini to generate follow-up questions about the task
+    Look up a source's cache, running search() on a miss or stale hit
+
+    A source cut off by the request's deadline contributes no results.
     """
     try:
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-flash-latest")
+        results = await search_caches[source].get_or_compute(
+            key, search, is_failure=lambda tools: not tools
+        )
+    except DeadlineExceeded as e:
+        print(f"{source} search skipped: {e}")
+        return []
+    return list(results)
+
 
-        prompt = f"""You are helping a user automate a mundane task using AI tools.
+WORKFLOW_QUESTIONS_PROMPT = """You are helping a user automate a mundane task using AI tools.
 They want to: {task_input}
 
 Generate 3-5 follow-up questions to better understand their needs. Questions should cover:
@@ -74,26 +149,27 @@ Example: [
 ]
 """
 
-        response = model.generate_content(
-            prompt,
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            },
-        )
 
-        # Parse JSON response
-        content = response.text.strip()
-        if content.startswith("```json"):
-            content = content[7:-3].strip()
-        elif content.startswith("```"):
-            content = content[3:-3].strip()
-
-        questions_data = json.loads(content)
-        return [WorkflowQuestion(**q) for q in questions_data]
+async def generate_workflow_questions(task_input: str) -> List[WorkflowQuestion]:
+    """
+    Use Gemini to generate follow-up questions about the task
+    """
+    try:
+        budget = PromptBuilder(
+            "workflow.questions",
+            reserved_tokens=estimate_tokens(WORKFLOW_QUESTIONS_PROMPT),
+        ).add("task_input", task_input, priority=1, min_tokens=100)
+        prompt = WORKFLOW_QUESTIONS_PROMPT.format(**budget.fit())
+
+        questions = await generate_structured(
+            "workflow.questions", prompt, List[WorkflowQuestion]
+        )
+        if not questions:
+            raise StructuredOutputError("No valid questions generated")
+        return questions
 
+    except LLMQueueFull:
+        raise
     except Exception as e:
         print(f"Error generating questions: {e}")
         # Fallback questions with options
@@ -138,48 +214,59 @@ Example: [
 
 async def search_perplexity(query: str) -> List[AIToolSearchResult]:
     """
-    Search for AI tools using Perplexity API
+    Search for AI tools using Perplexity API (cached per normalized query)
+    """
+    return await _cached_search(
+        "perplexity", normalize_key_text(query), lambda: _fetch_perplexity(query)
+    )
+
+
+async def _fetch_perplexity(query: str) -> List[AIToolSearchResult]:
+    """
+    Query the Perplexity API directly
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.perplexity.ai/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "sonar",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are an AI tool expert. Return ONLY valid JSON arrays.",
+        # Fails fast with CircuitOpen (-> empty result) while Perplexity is down
+        async with circuit_breakers.get("perplexity", "sonar").guard():
+            async with httpx.AsyncClient() as client:
+                response = await bounded(
+                    client.post(
+                        "https://api.perplexity.ai/chat/completions",
+                        headers={
+                            "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
+                            "Content-Type": "application/json",
                         },
-                        {
-                            "role": "user",
-                            "content": f"""Find 3-5 AI tools for this task: {query}
+                        json={
+                            "model": "sonar",
+                            "messages": [
+                                {
+                                    "role": "system",
+                                    "content": "You are an AI tool expert. Return ONLY valid JSON arrays.",
+                                },
+                                {
+                                    "role": "user",
+                                    "content": f"""Find 3-5 AI tools for this task: {query}
 Return ONLY a JSON array with this structure:
 [{{"tool_name": "Tool Name", "description": "Brief description", "url": "https://...", "use_case": "Specific use case", "pricing": "Free/Paid/Freemium"}}]""",
+                                },
+                            ],
+                            "temperature": 0.2,
+                            "max_tokens": 1000,
                         },
-                    ],
-                    "temperature": 0.2,
-                    "max_tokens": 1000,
-                },
-                timeout=30.0,
-            )
-
-            data = response.json()
-            content = data["choices"][0]["message"]["content"]
+                        timeout=30.0,
+                    )
+                )
+                response.raise_for_status()
 
-            # Clean up JSON
-            if content.startswith("```json"):
-                content = content[7:-3].strip()
-            elif content.startswith("```"):
-                content = content[3:-3].strip()
+        data = response.json()
+        content = data["choices"][0]["message"]["content"]
 
-            tools_data = json.loads(content)
-            return [AIToolSearchResult(**tool) for tool in tools_data]
+        return await parse_structured(
+            "workflow.perplexity_search", content, List[AIToolSearchResult]
+        )
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Perplexity search error: {e}")
         return []
@@ -187,56 +274,83 @@ Return ONLY a JSON array with this structure:
 
 async def search_tavily(query: str) -> List[AIToolSearchResult]:
     """
-    Search for AI tools using Tavily API
+    Search for AI tools using Tavily API (cached per normalized query)
     """
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.tavily.com/search",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "api_key": TAVILY_API_KEY,
-                    "query": f"{query} AI tools automation",
-                    "search_depth": "basic",
-                    "include_answer": True,
-                    "max_results": 5,
-                },
-                timeout=30.0,
-            )
+    return await _cached_search(
+        "tavily", normalize_key_text(query), lambda: _fetch_tavily(query)
+    )
+
 
-            data = response.json()
-            results = []
-
-            for item in data.get("results", [])[:5]:
-                results.append(
-                    AIToolSearchResult(
-                        tool_name=item.get("title", "Unknown Tool"),
-                        description=item.get("content", "")[:200],
-                        url=item.get("url", ""),
-                        use_case=query,
-                        pricing="Check website",
+async def _fetch_tavily(query: str) -> List[AIToolSearchResult]:
+    """
+    Query the Tavily API directly
+    """
+    try:
+        # Fails fast with CircuitOpen (-> empty result) while Tavily is down
+        async with circuit_breakers.get("tavily", "search").guard():
+            async with httpx.AsyncClient() as client:
+                response = await bounded(
+                    client.post(
+                        "https://api.tavily.com/search",
+                        headers={"Content-Type": "application/json"},
+                        json={
+                            "api_key": TAVILY_API_KEY,
+                            "query": f"{query} AI tools automation",
+                            "search_depth": "basic",
+                            "include_answer": True,
+                            "max_results": 5,
+                        },
+                        timeout=30.0,
                     )
                 )
+                response.raise_for_status()
 
-            return results
+        data = response.json()
+        results = []
+
+        for item in data.get("results", [])[:5]:
+            results.append(
+                AIToolSearchResult(
+                    tool_name=item.get("title", "Unknown Tool"),
+                    description=item.get("content", "")[:200],
+                    url=item.get("url", ""),
+                    use_case=query,
+                    pricing="Check website",
+                )
+            )
+
+        return results
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Tavily search error: {e}")
         return []
 
 
-def generate_step_quiz(
+# Step quizzes per (step title, description, tool); similar tasks produce
+# the same steps, so quizzes are reused across roadmaps
+step_quiz_cache = TTLCache(
+    "workflow:step_quiz", ttl=24 * 60 * 60, max_entries=2048, persistent=True
+)
+
+
+async def generate_step_quiz(
     step_title: str, step_description: str, ai_tool: str
 ) -> Optional[Dict[str, Any]]:
     """
-    Generate an MCQ quiz for a workflow step using Gemini
+    Generate an MCQ quiz for a workflow step using Gemini (cached per step)
     """
-    try:
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-flash-latest")
+    # Prefixed with the tool so an operator can invalidate one tool's quizzes
+    cache_key = (
+        f"{normalize_key_text(ai_tool)}:"
+        f"{coalescing_key('step_quiz', step_title, step_description, ai_tool)}"
+    )
+    cached = step_quiz_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
+    try:
         prompt = f"""Create a multiple-choice quiz question to test understanding of this workflow step:
 
 STEP TITLE: {step_title}
@@ -258,23 +372,11 @@ Return ONLY valid JSON with this structure:
 
 The correct answer should be at a random index (0-3), not always first."""
 
-        response = model.generate_content(
-            prompt,
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            },
+        quiz = await generate_structured(
+            "workflow.step_quiz", prompt, StepQuiz, priority=LLMPriority.BATCH
         )
-
-        content = response.text.strip()
-        if content.startswith("```json"):
-            content = content[7:-3].strip()
-        elif content.startswith("```"):
-            content = content[3:-3].strip()
-
-        quiz_data = json.loads(content)
+        quiz_data = quiz.model_dump()
+        step_quiz_cache.set(cache_key, quiz_data)
         return quiz_data
 
     except Exception as e:
@@ -404,80 +506,36 @@ def get_relevant_course_for_step(
     }
 
 
-async def generate_workflow_roadmap(
-    task_description: str, answers: Dict[str, str], ai_tools: List[AIToolSearchResult]
-) -> WorkflowRoadmap:
+def roadmap_cache_key(
+    task_description: str,
+    answers: Dict[str, str],
+    ai_tools: List[AIToolSearchResult],
+    model_name: str = ROADMAP_MODEL,
+) -> str:
     """
-    Generate a complete workflow roadmap using Gemini - utilizing ALL found tools
+    Build the roadmap cache key from the normalized task, sorted answers,
+    a fingerprint of the tool set and the model name, as "<model>:<hash>"
     """
-    try:
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-flash-latest")
-
-        # Group tools by category/type for better organization
-        tools_by_category = {}
-        for tool in ai_tools:
-            # Extract category from description or tool name
-            if any(
-                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
-                for keyword in ["research", "search", "chatgpt", "perplexity", "claude"]
-            ):
-                category = "research"
-            elif any(
-                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
-                for keyword in ["present", "slide", "gamma", "pitch"]
-            ):
-                category = "presentation"
-            elif any(
-                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
-                for keyword in ["write", "content", "copy", "grammar"]
-            ):
-                category = "writing"
-            elif any(
-                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
-                for keyword in ["code", "programming", "developer"]
-            ):
-                category = "coding"
-            elif any(
-                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
-                for keyword in ["image", "visual", "design", "graphic"]
-            ):
-                category = "image"
-            elif any(
-                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
-                for keyword in ["video", "audio", "voice"]
-            ):
-                category = "multimedia"
-            else:
-                category = "general"
-
-            if category not in tools_by_category:
-                tools_by_category[category] = []
-            tools_by_category[category].append(tool)
-
-        # Create detailed tools summary with ALL tools organized by category
-        tools_summary = ""
-        for category, tools in tools_by_category.items():
-            tools_summary += f"\n**{category.upper()} TOOLS:**\n"
-            for tool in tools:
-                tools_summary += f"- **{tool.tool_name}** ({tool.pricing})\n"
-                tools_summary += f"  URL: {tool.url}\n"
-                tools_summary += f"  Description: {tool.description}\n"
-                tools_summary += f"  Use Case: {tool.use_case}\n\n"
-
-        answers_summary = "\n".join([f"- {q}: {a}" for q, a in answers.items()])
-
-        prompt = f"""You are an expert workflow architect with deep knowledge of AI tools. Create a COMPREHENSIVE, DETAILED, step-by-step workflow roadmap.
-
-TASK: {task_description}
+    sorted_answers = sorted(
+        (normalize_key_text(q), normalize_key_text(a)) for q, a in answers.items()
+    )
+    tools_fingerprint = sorted(
+        (tool.tool_name.lower().replace(" ", ""), tool.url.lower()) for tool in ai_tools
+    )
+    payload = json.dumps(
+        [
+            normalize_key_text(task_description),
+            sorted_answers,
+            tools_fingerprint,
+            model_name,
+        ]
+    )
+    return f"{model_name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
 
-USER REQUIREMENTS:
-{answers_summary}
 
-AVAILABLE AI TOOLS (USE ALL OF THESE - organized by category):
-{tools_summary}
+# The instructions never change, so they are sent as a (context-cached)
+# system instruction ahead of the per-request task, answers and tools
+ROADMAP_INSTRUCTIONS = """You are an expert workflow architect with deep knowledge of AI tools. Create a COMPREHENSIVE, DETAILED, step-by-step workflow roadmap.
 
 Create a THOROUGH, PRESENTABLE, MINIMALISTIC workflow that:
 ✓ Breaks the task into 5-8 logical, sequential steps
@@ -508,22 +566,22 @@ For EACH step, provide:
     - When to choose it over the primary tool
 
 CRITICAL REQUIREMENTS:
-- Make prompts SPECIFIC to "{task_description}" - reference the actual task in each prompt
-- Use ALL the tools provided above - distribute them across steps as primary or alternatives
+- Make prompts SPECIFIC to the user's TASK - reference the actual task in each prompt
+- Use ALL the tools in the AVAILABLE AI TOOLS list - distribute them across steps as primary or alternatives
 - Show 3-5 alternatives per step when applicable
 - Include both mainstream tools (ChatGPT, Gamma) AND specialized tools (SciSpace, Elicit, etc.)
-- For alternatives, ONLY use tools from the available tools list above
+- For alternatives, ONLY use tools from the AVAILABLE AI TOOLS list
 - Make the roadmap detailed but presentable - clear structure, easy to scan
 - Prioritize free tools in alternatives when available
 
 Return ONLY valid JSON with this exact structure:
-{{
+{
   "task_title": "Title",
   "task_description": "Description",
   "total_estimated_time": "X hours",
   "difficulty_level": "Beginner/Intermediate/Advanced",
   "steps": [
-    {{
+    {
       "id": "step-1",
       "title": "Step Title",
       "description": "What to do",
@@ -535,34 +593,135 @@ Return ONLY valid JSON with this exact structure:
       "cons": ["Con 1", "Con 2", "Con 3"],
       "estimated_time": "30 minutes",
       "dependencies": [],
-      "alternatives": [{{"tool": "Alt Tool", "reason": "Why use this"}}]
-    }}
+      "alternatives": [{"tool": "Alt Tool", "reason": "Why use this"}]
+    }
   ]
-}}"""
+}"""
+ROADMAP_PREFIX = "workflow.roadmap.instructions"
+prefix_cache.register(ROADMAP_PREFIX, ROADMAP_MODEL, ROADMAP_INSTRUCTIONS)
 
-        response = model.generate_content(
-            prompt,
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            },
+ROADMAP_PROMPT = """TASK: {task_description}
+
+USER REQUIREMENTS:
+{answers_summary}
+
+AVAILABLE AI TOOLS (USE ALL OF THESE - organized by category):
+{tools_summary}
+
+Create the workflow roadmap for this task. Make every prompt specific to "{task_description}"."""
+
+
+def _format_roadmap_tool(tool: AIToolSearchResult) -> str:
+    return (
+        f"- **{tool.tool_name}** ({tool.pricing})\n"
+        f"  URL: {tool.url}\n"
+        f"  Description: {tool.description}\n"
+        f"  Use Case: {tool.use_case}\n\n"
+    )
+
+
+async def generate_workflow_roadmap(
+    task_description: str,
+    answers: Dict[str, str],
+    ai_tools: List[AIToolSearchResult],
+    force_refresh: bool = False,
+) -> WorkflowRoadmap:
+    """
+    Generate a complete workflow roadmap using Gemini - utilizing ALL found tools
+
+    Roadmaps are cached by task, answers, tool set and model; pass
+    force_refresh=True to bypass the cache and regenerate.
+    """
+    cache_key = roadmap_cache_key(task_description, answers, ai_tools)
+    if not force_refresh:
+        cached = roadmap_cache.get(cache_key)
+        if cached is not None:
+            return WorkflowRoadmap.model_validate_json(zlib.decompress(cached))
+
+    try:
+        answers_summary = "\n".join([f"- {q}: {a}" for q, a in answers.items()])
+
+        # Tools arrive in rank order, so over budget the lowest-ranked go first
+        budget = (
+            PromptBuilder(
+                "workflow.roadmap",
+                reserved_tokens=estimate_tokens(ROADMAP_INSTRUCTIONS + ROADMAP_PROMPT),
+            )
+            .add(
+                "tools_summary",
+                items=[_format_roadmap_tool(tool) for tool in ai_tools],
+                item_separator="",
+                priority=1,
+            )
+            .add("answers_summary", answers_summary, priority=2, min_tokens=200)
+            .add("task_description", task_description, priority=3, min_tokens=200)
         )
+        fitted = budget.fit()
+        ranked_tools = ai_tools[: len(budget.section("tools_summary").items)]
+
+        # Group tools by category/type for better organization
+        tools_by_category = {}
+        for tool in ranked_tools:
+            # Extract category from description or tool name
+            if any(
+                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
+                for keyword in ["research", "search", "chatgpt", "perplexity", "claude"]
+            ):
+                category = "research"
+            elif any(
+                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
+                for keyword in ["present", "slide", "gamma", "pitch"]
+            ):
+                category = "presentation"
+            elif any(
+                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
+                for keyword in ["write", "content", "copy", "grammar"]
+            ):
+                category = "writing"
+            elif any(
+                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
+                for keyword in ["code", "programming", "developer"]
+            ):
+                category = "coding"
+            elif any(
+                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
+                for keyword in ["image", "visual", "design", "graphic"]
+            ):
+                category = "image"
+            elif any(
+                keyword in tool.description.lower() or keyword in tool.tool_name.lower()
+                for keyword in ["video", "audio", "voice"]
+            ):
+                category = "multimedia"
+            else:
+                category = "general"
 
-        content = response.text.strip()
-        if content.startswith("```json"):
-            content = content[7:-3].strip()
-        elif content.startswith("```"):
-            content = content[3:-3].strip()
+            if category not in tools_by_category:
+                tools_by_category[category] = []
+            tools_by_category[category].append(tool)
 
-        # Clean up common JSON issues
-        import re
+        # Create detailed tools summary with ALL tools organized by category
+        tools_summary = ""
+        for category, tools in tools_by_category.items():
+            tools_summary += f"\n**{category.upper()} TOOLS:**\n"
+            for tool in tools:
+                tools_summary += _format_roadmap_tool(tool)
 
-        # Remove trailing commas before ] or }
-        content = re.sub(r",(\s*[}\]])", r"\1", content)
+        prompt = ROADMAP_PROMPT.format(
+            task_description=fitted["task_description"],
+            answers_summary=fitted["answers_summary"],
+            tools_summary=tools_summary,
+        )
 
-        roadmap_data = json.loads(content)
+        draft = await generate_structured(
+            "workflow.roadmap",
+            prompt,
+            RoadmapDraft,
+            model_name=ROADMAP_MODEL,
+            priority=LLMPriority.BATCH,
+            system_prefix=ROADMAP_PREFIX,
+        )
+        roadmap_data = draft.model_dump()
 
         # Add course recommendations and evaluator links to each step
         for step_data in roadmap_data.get("steps", []):
@@ -591,24 +750,40 @@ Return ONLY valid JSON with this exact structure:
             course_info = get_relevant_course_for_step(
                 category, step_data.get("description", ""), step_data.get("title", "")
             )
-            print(
-                f"DEBUG: Step '{step_data.get('title')}' -> Category: {category} -> Course: {course_info['title']}"
+            logger.debug(
+                f"Step '{step_data.get('title')}' -> Category: {category} -> Course: {course_info['title']}"
             )
             step_data["related_course"] = course_info
             step_data["evaluator_link"] = "/evaluator/"
 
-            # Generate MCQ quiz for this step
-            quiz_data = generate_step_quiz(
-                step_data.get("title", ""),
-                step_data.get("description", ""),
-                step_data.get("ai_tool", ""),
+        # Generate an MCQ quiz for every step concurrently
+        quizzes = await asyncio.gather(
+            *(
+                generate_step_quiz(
+                    step_data.get("title", ""),
+                    step_data.get("description", ""),
+                    step_data.get("ai_tool", ""),
+                )
+                for step_data in roadmap_data.get("steps", [])
             )
+        )
+        for step_data, quiz_data in zip(roadmap_data.get("steps", []), quizzes):
             step_data["quiz"] = quiz_data
             if quiz_data:
-                print(f"DEBUG: Generated quiz for '{step_data.get('title')}')")
+                logger.debug(f"Generated quiz for '{step_data.get('title')}'")
 
-        return WorkflowRoadmap(**roadmap_data)
+        roadmap = WorkflowRoadmap(**roadmap_data)
 
+        # Only complete generations are cached, never the fallback below nor
+        # a roadmap missing quizzes (failed or cut short by the deadline)
+        if all(quizzes) and not expired():
+            compressed = zlib.compress(roadmap.model_dump_json().encode("utf-8"))
+            roadmap_cache.set(cache_key, compressed, size=len(compressed))
+
+        return roadmap
+
+    except LLMQueueFull:
+        raise
     except Exception as e:
         print(f"Error generating roadmap: {e}")
         # Fallback roadmap
@@ -657,33 +832,7 @@ Return ONLY valid JSON with this exact structure:
         )
 
 
-async def search_with_gemini_web(
-    task_description: str, answers: Dict[str, str]
-) -> List[AIToolSearchResult]:
-    """
-    Use Gemini with web search to find AI tools
-    """
-    try:
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-flash-latest")
-
-        answers_summary = "\n".join([f"- {q}: {a}" for q, a in answers.items()])
-
-        # Extract keywords from task
-        keywords = task_description.lower().split()
-        relevant_db_tools = get_relevant_tools(
-            keywords[:5]
-        )  # Get relevant tools from database
-
-        db_tools_context = (
-            format_tools_for_prompt(relevant_db_tools[:15])
-            if relevant_db_tools
-            else "No specific database matches"
-        )
-
-        prompt = f"""You are an expert AI tools researcher. Find the BEST AI tools for this task using web search.
+GEMINI_WEB_SEARCH_PROMPT = """You are an expert AI tools researcher. Find the BEST AI tools for this task using web search.
 
 TASK: {task_description}
 
@@ -715,25 +864,65 @@ Return ONLY valid JSON array:
   "pricing": "Free/Paid/Freemium"
 }}]"""
 
-        response = model.generate_content(
-            prompt,
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            },
+
+async def search_with_gemini_web(
+    task_description: str, answers: Dict[str, str]
+) -> List[AIToolSearchResult]:
+    """
+    Use Gemini with web search to find AI tools (cached per normalized task and answers)
+    """
+    key = (
+        normalize_key_text(task_description),
+        tuple(
+            sorted(
+                (normalize_key_text(q), normalize_key_text(a))
+                for q, a in answers.items()
+            )
+        ),
+    )
+    return await _cached_search(
+        "gemini_web", key, lambda: _fetch_gemini_web(task_description, answers)
+    )
+
+
+async def _fetch_gemini_web(
+    task_description: str, answers: Dict[str, str]
+) -> List[AIToolSearchResult]:
+    """
+    Ask Gemini directly for AI tools matching the task
+    """
+    try:
+        answers_summary = "\n".join([f"- {q}: {a}" for q, a in answers.items()])
+
+        # Extract keywords from task
+        keywords = task_description.lower().split()
+        relevant_db_tools = get_relevant_tools(
+            keywords[:5]
+        )  # Get relevant tools from database
+
+        db_tools_context = (
+            format_tools_for_prompt(relevant_db_tools[:15])
+            if relevant_db_tools
+            else "No specific database matches"
         )
 
-        content = response.text.strip()
-        if content.startswith("```json"):
-            content = content[7:-3].strip()
-        elif content.startswith("```"):
-            content = content[3:-3].strip()
+        budget = (
+            PromptBuilder(
+                "workflow.gemini_web_search",
+                reserved_tokens=estimate_tokens(GEMINI_WEB_SEARCH_PROMPT),
+            )
+            .add("task_description", task_description, priority=3, min_tokens=200)
+            .add("answers_summary", answers_summary, priority=2, min_tokens=200)
+            .add("db_tools_context", db_tools_context, priority=1)
+        )
+        prompt = GEMINI_WEB_SEARCH_PROMPT.format(**budget.fit())
 
-        tools_data = json.loads(content)
-        return [AIToolSearchResult(**tool) for tool in tools_data]
+        return await generate_structured(
+            "workflow.gemini_web_search", prompt, List[AIToolSearchResult]
+        )
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Gemini web search error: {e}")
         return []
@@ -784,11 +973,19 @@ async def search_ai_tools(
     query_parts.extend(answers.values())
     search_query = " ".join(query_parts)
 
-    # Try all search methods in parallel
-    database_results = await search_with_database(task_description)
-    gemini_web_results = await search_with_gemini_web(task_description, answers)
-    perplexity_results = await search_perplexity(search_query)
-    tavily_results = await search_tavily(search_query)
+    # Try all search methods in parallel; sources still running when the
+    # request's deadline passes come back empty instead of holding it up
+    (
+        database_results,
+        gemini_web_results,
+        perplexity_results,
+        tavily_results,
+    ) = await asyncio.gather(
+        search_with_database(task_description),
+        search_with_gemini_web(task_description, answers),
+        search_perplexity(search_query),
+        search_tavily(search_query),
+    )
 
     # Prioritize: Database first (most reliable), then Gemini web, then others
     all_results = (
@@ -821,14 +1018,38 @@ async def search_ai_tools(
             ),
         ]
 
-    # Deduplicate results
+    return _dedupe_tools(all_results)
+
+
+async def refine_ai_tools(
+    task_description: str,
+    answers: Dict[str, str],
+    base_results: List[AIToolSearchResult],
+) -> List[AIToolSearchResult]:
+    """
+    Refine a task-only (speculative) search using the user's answers
+
+    Only the answer-aware Gemini search is run; its results are ranked
+    ahead of the base results, which already cover every other source.
+    """
+    if not answers:
+        return _dedupe_tools(base_results)
+
+    refined_results = await search_with_gemini_web(task_description, answers)
+    return _dedupe_tools(refined_results + base_results)
+
+
+def _dedupe_tools(
+    results: List[AIToolSearchResult], limit: int = 12
+) -> List[AIToolSearchResult]:
+    """Deduplicate tools by normalized name, keeping the first occurrence"""
     seen_tools = set()
     unique_results = []
 
-    for tool in all_results:
+    for tool in results:
         tool_key = tool.tool_name.lower().replace(" ", "")
         if tool_key not in seen_tools:
             seen_tools.add(tool_key)
             unique_results.append(tool)
 
-    return unique_results[:12]  # Return top 12 unique tools
+    return unique_results[:limit]  # Return top unique tools
@@ -39,6 +39,49 @@ class WorkflowStep(BaseModel):
     )
 
 
+class ToolAlternative(BaseModel):
+    """Alternative tool suggested for a roadmap step"""
+
+    tool: str
+    reason: str
+
+
+class RoadmapStepDraft(BaseModel):
+    """Roadmap step as generated by the LLM (before course/quiz enrichment)"""
+
+    id: str
+    title: str
+    description: str
+    ai_tool: str
+    tool_url: Optional[str] = None
+    prompts: List[str]
+    tips: List[str]
+    pros: List[str]
+    cons: List[str]
+    estimated_time: str
+    dependencies: List[str] = Field(default_factory=list)
+    alternatives: List[ToolAlternative] = Field(default_factory=list)
+
+
+class RoadmapDraft(BaseModel):
+    """Roadmap as generated by the LLM (response schema for generation)"""
+
+    task_title: str
+    task_description: str
+    total_estimated_time: str
+    difficulty_level: str
+    steps: List[RoadmapStepDraft]
+
+
+class StepQuiz(BaseModel):
+    """MCQ quiz for a workflow step"""
+
+    question: str
+    options: List[str]
+    correct_index: int = Field(..., ge=0, le=3)
+    explanation: str
+
+
 class WorkflowRoadmap(BaseModel):
     """Complete workflow roadmap"""
 
@@ -79,3 +122,17 @@ class AIToolSearchResult(BaseModel):
     url: str
     use_case: str
     pricing: str
+
+
+class WorkflowJobResponse(BaseModel):
+    """Status (and result, once finished) of a background workflow job"""
+
+    job_id: str
+    kind: str
+    status: str  # queued, running, succeeded, failed, cancelled
+    priority: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[WorkflowRoadmap] = None
@@ -2,10 +2,18 @@
 API router for workflow automation endpoints
 """
 
-from typing import Dict, List
+import asyncio
+import json
+from typing import Dict, List, Literal
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.core.cache import normalize_key_text
+from app.core.deadline import deadline_share, route_deadline
+from app.core.jobs import Job, JobPriority, JobQueueFull, job_manager
+from app.core.llm_scheduler import LLMQueueFull
 from app.workflow.models import (
     TaskDiscoveryRequest,
+    WorkflowJobResponse,
     WorkflowQuestionsResponse,
     WorkflowRoadmap,
     AIToolSearchResult,
@@ -13,14 +21,81 @@ from app.workflow.models import (
 from app.workflow.agents import (
     generate_workflow_questions,
     search_ai_tools,
+    refine_ai_tools,
     generate_workflow_roadmap,
+    get_search_cache_stats,
 )
+from app.workflow.speculative import speculative_searches
 
 router = APIRouter(prefix="/workflow", tags=["workflow"])
 
 # In-memory session storage for workflow data
 workflow_sessions: Dict[str, Dict] = {}
 
+# Fraction of the roadmap deadline the tool search may use
+ROADMAP_SEARCH_SHARE = 0.4
+
+
+async def _find_tools(
+    session_id: str, task_description: str, answers: Dict[str, str]
+) -> List[AIToolSearchResult]:
+    """
+    Refine the session's speculative task-only search with the answers,
+    or run the full search if there is none to use
+    """
+    base_tools = await speculative_searches.take(session_id, task_description)
+    if base_tools is not None:
+        return await refine_ai_tools(task_description, answers, base_tools)
+    return await search_ai_tools(task_description, answers)
+
+
+async def _run_roadmap_pipeline(
+    session_id: str, session_data: Dict, force_refresh: bool = False
+) -> WorkflowRoadmap:
+    """
+    Search tools (if needed) and generate the roadmap for a session,
+    storing both in session_data
+    """
+    task_description = session_data.get("task_input", "")
+    answers = session_data.get("answers", {})
+
+    with route_deadline("workflow.roadmap"):
+        # Get tools from session or search if not available
+        tools_data = session_data.get("tools", [])
+        if not tools_data:
+            # Searches get a share of the budget; the rest is the roadmap's
+            with deadline_share(ROADMAP_SEARCH_SHARE):
+                tools = await _find_tools(session_id, task_description, answers)
+            session_data["tools"] = [tool.dict() for tool in tools]
+        else:
+            tools = [AIToolSearchResult(**tool) for tool in tools_data]
+
+        # Generate roadmap
+        roadmap = await generate_workflow_roadmap(
+            task_description, answers, tools, force_refresh=force_refresh
+        )
+
+    # Debug: Check what's in the roadmap
+    roadmap_dict = roadmap.dict()
+    print(f"\n{'=' * 80}")
+    print("ROADMAP DATA BEING SENT TO FRONTEND:")
+    print(f"{'=' * 80}")
+    print(f"Task: {roadmap_dict['task_title']}")
+    print(f"Steps: {len(roadmap_dict['steps'])}")
+    if roadmap_dict["steps"]:
+        first_step = roadmap_dict["steps"][0]
+        print("\nFirst Step Data:")
+        print(f"  - Title: {first_step.get('title')}")
+        print(f"  - related_course: {first_step.get('related_course', 'MISSING!')}")
+        print(f"  - evaluator_link: {first_step.get('evaluator_link', 'MISSING!')}")
+        print(f"  - quiz: {'Present' if first_step.get('quiz') else 'MISSING!'}")
+    print(f"{'=' * 80}\n")
+
+    # Store roadmap in session
+    session_data["roadmap"] = roadmap_dict
+
+    return roadmap
+
 
 @router.post("/discover-task", response_model=WorkflowQuestionsResponse)
 async def discover_task(request: TaskDiscoveryRequest):
@@ -29,8 +104,13 @@ async def discover_task(request: TaskDiscoveryRequest):
     Returns follow-up questions generated by Gemini
     """
     try:
+        # Start searching for tools from the task alone while the user
+        # answers the follow-up questions
+        speculative_searches.start(request.session_id, request.user_input)
+
         # Generate follow-up questions using Gemini
-        questions = await generate_workflow_questions(request.user_input)
+        with route_deadline("workflow.questions"):
+            questions = await generate_workflow_questions(request.user_input)
 
         # Store in session
         workflow_sessions[request.session_id] = {
@@ -43,7 +123,12 @@ async def discover_task(request: TaskDiscoveryRequest):
             questions=questions, session_id=request.session_id
         )
 
+    except LLMQueueFull:
+        speculative_searches.cancel(request.session_id)
+        raise
     except Exception as e:
+        # Without questions the session never reaches the search
+        speculative_searches.cancel(request.session_id)
         raise HTTPException(status_code=500, detail=f"Error discovering task: {str(e)}")
 
 
@@ -79,8 +164,8 @@ async def search_tools_endpoint(session_id: str):
         task_description = session_data.get("task_input", "")
         answers = session_data.get("answers", {})
 
-        # Search for AI tools
-        tools = await search_ai_tools(task_description, answers)
+        with route_deadline("workflow.search_tools"):
+            tools = await _find_tools(session_id, task_description, answers)
 
         # Store tools in session
         workflow_sessions[session_id]["tools"] = [tool.dict() for tool in tools]
@@ -91,55 +176,171 @@ async def search_tools_endpoint(session_id: str):
         raise HTTPException(status_code=500, detail=f"Error searching tools: {str(e)}")
 
 
+@router.get("/search-tools/cache-stats")
+async def search_cache_stats():
+    """
+    Per-source hit ratios for the tool search caches
+    """
+    return get_search_cache_stats()
+
+
+@router.get("/search-tools/speculative-stats")
+async def speculative_search_stats():
+    """
+    How often speculative tool searches are started, used or wasted
+    """
+    return speculative_searches.stats()
+
+
 @router.post("/generate-roadmap", response_model=WorkflowRoadmap)
-async def generate_roadmap_endpoint(session_id: str):
+async def generate_roadmap_endpoint(session_id: str, force_refresh: bool = False):
     """
     Generate complete workflow roadmap using Gemini
+
+    Set force_refresh to bypass the roadmap cache when the user explicitly
+    asks for a new roadmap.
     """
     try:
         if session_id not in workflow_sessions:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        session_data = workflow_sessions[session_id]
-        task_description = session_data.get("task_input", "")
-        answers = session_data.get("answers", {})
+        return await _run_roadmap_pipeline(
+            session_id, workflow_sessions[session_id], force_refresh
+        )
 
-        # Get tools from session or search if not available
-        tools_data = session_data.get("tools", [])
-        if not tools_data:
-            tools = await search_ai_tools(task_description, answers)
-            workflow_sessions[session_id]["tools"] = [tool.dict() for tool in tools]
-        else:
-            tools = [AIToolSearchResult(**tool) for tool in tools_data]
+    except LLMQueueFull:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error generating roadmap: {str(e)}"
+        )
+
+
+def _job_response(job: Job) -> WorkflowJobResponse:
+    """Convert a job into its API representation"""
+    return WorkflowJobResponse(
+        **job.to_dict(),
+        result=job.result if job.status == "succeeded" else None,
+    )
 
-        # Generate roadmap
-        roadmap = await generate_workflow_roadmap(task_description, answers, tools)
-
-        # Debug: Check what's in the roadmap
-        roadmap_dict = roadmap.dict()
-        print(f"\n{'=' * 80}")
-        print("ROADMAP DATA BEING SENT TO FRONTEND:")
-        print(f"{'=' * 80}")
-        print(f"Task: {roadmap_dict['task_title']}")
-        print(f"Steps: {len(roadmap_dict['steps'])}")
-        if roadmap_dict["steps"]:
-            first_step = roadmap_dict["steps"][0]
-            print("\nFirst Step Data:")
-            print(f"  - Title: {first_step.get('title')}")
-            print(f"  - related_course: {first_step.get('related_course', 'MISSING!')}")
-            print(f"  - evaluator_link: {first_step.get('evaluator_link', 'MISSING!')}")
-            print(f"  - quiz: {'Present' if first_step.get('quiz') else 'MISSING!'}")
-        print(f"{'=' * 80}\n")
-
-        # Store roadmap in session
-        workflow_sessions[session_id]["roadmap"] = roadmap_dict
 
+@router.post("/jobs/generate-roadmap", response_model=WorkflowJobResponse)
+async def submit_roadmap_job(
+    session_id: str,
+    force_refresh: bool = False,
+    priority: Literal["high", "normal", "low"] = "normal",
+):
+    """
+    Queue roadmap generation (tool search + roadmap) as a background job
+
+    Returns immediately with a job ID; poll /jobs/{job_id} or subscribe to
+    /jobs/{job_id}/events for the result. Resubmitting the same session and
+    answers while a job is in flight returns that job.
+    """
+    if session_id not in workflow_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    session_data = workflow_sessions[session_id]
+    dedupe_key = json.dumps(
+        [
+            session_id,
+            normalize_key_text(session_data.get("task_input", "")),
+            sorted(session_data.get("answers", {}).items()),
+        ]
+    )
+
+    # The job works on a snapshot of the inputs taken now: the session may be
+    # cleared (or answered again) while the job is queued
+    snapshot = {
+        "task_input": session_data.get("task_input", ""),
+        "answers": dict(session_data.get("answers", {})),
+        "tools": list(session_data.get("tools", [])),
+    }
+
+    async def run_job() -> WorkflowRoadmap:
+        roadmap = await _run_roadmap_pipeline(session_id, snapshot, force_refresh)
+        # Copy the results back only to the session they were made for
+        session = workflow_sessions.get(session_id)
+        if (
+            session is not None
+            and session.get("task_input", "") == snapshot["task_input"]
+            and session.get("answers", {}) == snapshot["answers"]
+        ):
+            session["tools"] = snapshot["tools"]
+            session["roadmap"] = snapshot["roadmap"]
         return roadmap
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error generating roadmap: {str(e)}"
+    try:
+        job = await job_manager.submit(
+            "generate-roadmap",
+            dedupe_key,
+            run_job,
+            priority=JobPriority[priority.upper()],
+            reuse_finished=not force_refresh,
         )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=WorkflowJobResponse)
+async def get_job(job_id: str, wait: float = 0):
+    """
+    Get a job's status and result
+
+    Pass wait (seconds, max 30) to long-poll until the job finishes.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    await job_manager.wait(job, timeout=min(max(wait, 0), 30))
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Stream job status changes as SSE, ending with the result
+
+    A keepalive comment is sent periodically so proxies don't drop the
+    connection while the job runs.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    async def generate():
+        last_status = None
+        idle_seconds = 0
+        while True:
+            if job.status != last_status:
+                last_status = job.status
+                idle_seconds = 0
+                payload = _job_response(job).model_dump(mode="json")
+                payload["done"] = job.finished
+                yield f"data: {json.dumps(payload)}\n\n"
+            if job.finished:
+                return
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                idle_seconds += 1
+                if idle_seconds % 15 == 0:
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a job that hasn't started yet
+    """
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job is not queued")
+    return {"status": "success", "message": "Job cancelled"}
 
 
 @router.get("/roadmap/{session_id}", response_model=WorkflowRoadmap)
@@ -171,6 +372,7 @@ async def clear_session(session_id: str):
     try:
         if session_id in workflow_sessions:
             del workflow_sessions[session_id]
+        speculative_searches.cancel(session_id)
 
         return {"status": "success", "message": "Session cleared"}
 
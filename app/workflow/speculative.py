@@ -0,0 +1,153 @@
+"""
+Speculative tool search for workflow sessions
+
+While the user answers the follow-up questions, a task-only tool search runs
+in the background. /workflow/search-tools then only refines those results
+with the answers instead of running every search from scratch.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.deadline import DeadlineExceeded, bounded, detached_context
+from app.workflow.agents import search_ai_tools
+from app.workflow.models import AIToolSearchResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpeculativeSearch:
+    """Background search started for one session"""
+
+    task_description: str
+    task: asyncio.Task
+    created_at: float
+
+
+class SpeculativeSearchManager:
+    """Tracks one speculative search per session with bounded concurrency"""
+
+    def __init__(self, max_concurrent: int = 8, max_age_seconds: float = 15 * 60):
+        self.max_concurrent = max_concurrent
+        self.max_age_seconds = max_age_seconds
+        self._searches: Dict[str, SpeculativeSearch] = {}
+
+        self.started = 0
+        self.rejected = 0
+        self.used = 0
+        self.awaited = 0
+        self.missed = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def _running_count(self) -> int:
+        return sum(1 for s in self._searches.values() if not s.task.done())
+
+    def start(self, session_id: str, task_description: str) -> bool:
+        """
+        Start a task-only search for a session, replacing any previous one
+
+        Returns False when the concurrency cap is reached; the session then
+        simply falls back to a full search later.
+        """
+        self.cancel(session_id)
+        self._prune()
+
+        if self._running_count() >= self.max_concurrent:
+            self.rejected += 1
+            logger.info(f"Speculative search rejected for {session_id}: at capacity")
+            return False
+
+        # Runs on its own time, not the discover-task request's deadline
+        task = asyncio.create_task(
+            search_ai_tools(task_description, {}), context=detached_context()
+        )
+        self._searches[session_id] = SpeculativeSearch(
+            task_description, task, time.monotonic()
+        )
+        self.started += 1
+        return True
+
+    async def take(
+        self, session_id: str, task_description: str
+    ) -> Optional[List[AIToolSearchResult]]:
+        """
+        Claim the speculative results for a session
+
+        Waits for a search that is still running. Returns None when there is
+        no usable search (never started, different task, or it failed).
+        """
+        search = self._searches.pop(session_id, None)
+        if search is None:
+            self.missed += 1
+            return None
+
+        if search.task_description != task_description:
+            search.task.cancel()
+            self.cancelled += 1
+            self.missed += 1
+            return None
+
+        if not search.task.done():
+            self.awaited += 1
+
+        try:
+            # Shielded so the search survives to be cached for later requests
+            results = await bounded(asyncio.shield(search.task))
+        except asyncio.CancelledError:
+            self.missed += 1
+            return None
+        except DeadlineExceeded:
+            logger.info(f"Speculative search for {session_id} outlasted the deadline")
+            self.missed += 1
+            return None
+        except Exception as e:
+            logger.error(f"Speculative search failed for {session_id}: {e}")
+            self.failed += 1
+            return None
+
+        self.used += 1
+        return results
+
+    def cancel(self, session_id: str) -> bool:
+        """Cancel and forget a session's speculative search"""
+        search = self._searches.pop(session_id, None)
+        if search is None:
+            return False
+        if not search.task.done():
+            search.task.cancel()
+            self.cancelled += 1
+        return True
+
+    def _prune(self) -> None:
+        """Drop searches whose sessions never came back for them"""
+        cutoff = time.monotonic() - self.max_age_seconds
+        for session_id in [
+            sid for sid, s in self._searches.items() if s.created_at < cutoff
+        ]:
+            self.cancel(session_id)
+            self.missed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Lifecycle counters for speculative searches"""
+        return {
+            "running": self._running_count(),
+            "pending": len(self._searches),
+            "max_concurrent": self.max_concurrent,
+            "started": self.started,
+            "rejected": self.rejected,
+            "used": self.used,
+            "awaited": self.awaited,
+            "missed": self.missed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "use_ratio": round(self.used / self.started, 4) if self.started else 0.0,
+        }
+
+
+# Global speculative search manager instance
+speculative_searches = SpeculativeSearchManager()
@@ -207,6 +207,11 @@ async function streamTutorChat(message, context = '') {
             for (const line of lines) {
                 if (line.startsWith('data: ')) {
                     const data = JSON.parse(line.slice(6));
+                    if (data.status === 'superseded') {
+                        // A newer message took over; drop this reply
+                        messageDiv.remove();
+                        return;
+                    }
                     if (data.chunk) {
                         fullText += data.chunk;
                         contentDiv.innerHTML = parseMarkdown(fullText);
@@ -250,6 +255,7 @@ async function streamWorkspaceSummary(prompt) {
         let fullText = '';
         let hasConstraints = false;
         let metadata = {};
+        let sectionsDone = 0;
         
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
@@ -264,6 +270,22 @@ async function streamWorkspaceSummary(prompt) {
             for (const line of lines) {
                 if (line.startsWith('data: ')) {
                     const data = JSON.parse(line.slice(6));
+                    if (data.status === 'superseded') {
+                        // A newer summarize request took over; drop this one
+                        messageDiv.remove();
+                        return;
+                    }
+                    if (data.stage === 'section') {
+                        // Long document: show progress until the answer streams in
+                        sectionsDone += 1;
+                        if (!fullText) {
+                            const cut = data.truncated
+                                ? ` (only the first ${data.total} of ${data.document_sections} sections fit)`
+                                : '';
+                            bubbleDiv.innerHTML = `<span class="loading-spinner"></span> Reading section ${sectionsDone} of ${data.total}${cut}...`;
+                        }
+                        continue;
+                    }
                     if (data.chunk) {
                         fullText += data.chunk;
                         bubbleDiv.innerHTML = parseMarkdown(fullText);
@@ -310,7 +332,8 @@ async function analyzePrompt(prompt) {
     }
     
     try {
-        const response = await fetch('/prompting/api/prompt/analyze', {
+        // Streams the instant local analysis first, then the AI feedback
+        const response = await fetch('/prompting/api/prompt/analyze/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -321,24 +344,44 @@ async function analyzePrompt(prompt) {
         
         if (!response.ok) return;
         
-        const analysis = await response.json();
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
         
-        if (analysis.suggestions && analysis.suggestions.length > 0) {
-            elements.analysisContent.innerHTML = `
-                <p style="margin-bottom: 0.5rem;">${analysis.feedback}</p>
-                <ul style="margin: 0; padding-left: 1.5rem;">
-                    ${analysis.suggestions.map(s => `<li>${s}</li>`).join('')}
-                </ul>
-            `;
-            elements.promptAnalysis.style.display = 'block';
-        } else {
-            elements.promptAnalysis.style.display = 'none';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            
+            const chunk = decoder.decode(value);
+            const lines = chunk.split('\n');
+            
+            for (const line of lines) {
+                if (line.startsWith('data: ')) {
+                    const data = JSON.parse(line.slice(6));
+                    // A newer keystroke's analysis superseded this one
+                    if (data.status === 'superseded') return;
+                    if (data.analysis) renderPromptAnalysis(data.analysis);
+                }
+            }
         }
     } catch (error) {
         console.error('Analysis error:', error);
     }
 }
 
+function renderPromptAnalysis(analysis) {
+    if (analysis.suggestions && analysis.suggestions.length > 0) {
+        elements.analysisContent.innerHTML = `
+            <p style="margin-bottom: 0.5rem;">${analysis.feedback}</p>
+            <ul style="margin: 0; padding-left: 1.5rem;">
+                ${analysis.suggestions.map(s => `<li>${s}</li>`).join('')}
+            </ul>
+        `;
+        elements.promptAnalysis.style.display = 'block';
+    } else {
+        elements.promptAnalysis.style.display = 'none';
+    }
+}
+
 // Debounced prompt analysis
 function debouncedAnalyze() {
     clearTimeout(state.analysisTimeout);
@@ -489,7 +532,7 @@ function provideProgressiveHint() {
     // Third attempt: Very explicit example
     else if (attemptNumber >= 3 && !state.hintsShown.includes('example')) {
         setTimeout(() => {
-            const example = getExamplePrompt(state.submoduleId);
+            const example = state.submodule.example_prompt;
             if (example) {
                 addProactiveTip(`Here's an example structure you could use:\n\n${example}`);
                 state.hintsShown.push('example');
@@ -512,20 +555,6 @@ function getSpecificGuidance(submoduleId) {
     return guidance[submoduleId] || null;
 }
 
-/**
- * Get example prompt based on submodule
- */
-function getExamplePrompt(submoduleId) {
-    const examples = {
-        1: "<strong>Based only on the text provided</strong>, summarize the key points without adding any external information.",
-        2: "<strong>You are an expert analyst.</strong> Review this document and provide insights from your professional perspective.",
-        3: "<strong>Let's analyze this step by step:</strong>\n1. First, identify the main themes\n2. Then, examine the evidence\n3. Finally, draw conclusions",
-        4: "<strong>You are a senior consultant.</strong> Using only the information provided, analyze this document step by step: First, identify key issues. Then, evaluate implications. Finally, provide recommendations."
-    };
-    
-    return examples[submoduleId] || null;
-}
-
 /**
  * Handle lesson completion
  */
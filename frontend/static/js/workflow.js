@@ -336,13 +336,26 @@ class WorkflowAutomation {
         this.showLoader('generateRoadmapBtn');
 
         try {
-            const response = await fetch(`/workflow/generate-roadmap?session_id=${this.sessionId}`, {
+            // Queued as a background job and long-polled, so no single request
+            // has to outlive the proxy timeout while the roadmap is generated
+            const response = await fetch(`/workflow/jobs/generate-roadmap?session_id=${this.sessionId}`, {
                 method: 'POST'
             });
 
-            if (!response.ok) throw new Error('Failed to generate roadmap');
+            if (!response.ok) throw new Error('Failed to queue roadmap generation');
 
-            this.roadmap = await response.json();
+            let job = await response.json();
+            while (job.status === 'queued' || job.status === 'running') {
+                const poll = await fetch(`/workflow/jobs/${job.job_id}?wait=25`);
+                if (!poll.ok) throw new Error('Lost track of roadmap generation');
+                job = await poll.json();
+            }
+
+            if (job.status !== 'succeeded') {
+                throw new Error(job.error || `Roadmap generation ${job.status}`);
+            }
+
+            this.roadmap = job.result;
             console.log('Full roadmap received:', this.roadmap);
             console.log('First step full data:', this.roadmap.steps[0]);
             
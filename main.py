@@ -9,13 +9,20 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 # Load environment variables from .env file
 load_dotenv()
 
+from app.admin import router as admin_router
+from app.core.context_cache import prefix_cache
+from app.core.jobs import job_manager
+from app.core.llm_scheduler import LLMQueueFull
+from app.core.warm_cache import warm_cache_file
 from app.evaluator import router as evaluator_router
+from app.metrics import router as metrics_router
 from app.prompting import router as prompting_router
 from app.workflow import router as workflow_router
 
@@ -30,8 +37,14 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     logger.info("Starting Upgrad OSP application...")
+    await job_manager.start()
+    await prefix_cache.start()
+    warm_cache_file.start()
     yield
     logger.info("Shutting down Upgrad OSP application...")
+    await warm_cache_file.stop()
+    await prefix_cache.stop()
+    await job_manager.stop()
 
 
 # Create FastAPI app
@@ -51,6 +64,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(LLMQueueFull)
+async def llm_queue_full_handler(request: Request, exc: LLMQueueFull):
+    """Fail fast with 429 when the LLM scheduler is saturated"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 
@@ -64,6 +88,8 @@ app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
 app.include_router(prompting_router)
 app.include_router(workflow_router)
 app.include_router(evaluator_router)
+app.include_router(metrics_router)
+app.include_router(admin_router)
 
 
 @app.get("/")
@@ -0,0 +1,137 @@
+"""
+Cache warming - precompute LLM responses for every curriculum lesson
+Walks FULL_CURRICULUM and SAMPLE_MAPPING and generates, per lesson, the
+canonical workspace summaries of the lesson's sample and the prompt analyses
+of the canonical prompts (the lesson welcome and hints are static text in the
+frontend, so no tutor replies are precomputed). Each result is appended to
+the warm cache file (WARM_CACHE_FILE) as soon as it is ready; the server
+loads that file at startup and reloads it periodically. Re-running resumes
+where the last run stopped, skipping everything already in the file.
+
+Usage: python scripts/warm_cache.py [--concurrency 4] [--module foundations]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any, Awaitable, Callable, List, NamedTuple
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+# Load environment variables before the app reads its API keys
+load_dotenv()
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.warm_cache import WarmCacheFile
+from app.prompting.agents import (
+    analysis_cache,
+    analysis_cache_key,
+    enrich_prompt_analysis,
+    warm_workspace_response,
+    workspace_cache_key,
+    workspace_response_cache,
+)
+from app.prompting.curriculum import FULL_CURRICULUM
+from app.prompting.prewarm import canonical_prompts
+from app.prompting.samples import load_sample, sample_filename
+from app.prompting.session_manager import UPLOADED_DOCUMENT_CHARS
+
+
+class WarmJob(NamedTuple):
+    label: str
+    cache: TTLCache
+    key: str
+    run: Callable[[], Awaitable[Any]]
+
+
+def lesson_jobs(module: dict, submodule: dict) -> List[WarmJob]:
+    """Everything to precompute for one lesson"""
+    lesson = f"{module['id']}-{submodule['id']}"
+    jobs = []
+
+    lesson_info = {"submodule_id": submodule["id"], "lesson_name": submodule["title"]}
+    filename = sample_filename(module["id"], submodule["id"])
+    document = (
+        load_sample(filename).text[:UPLOADED_DOCUMENT_CHARS] if filename else None
+    )
+    for i, prompt in enumerate(canonical_prompts(submodule["id"])):
+        if document is not None:
+            jobs.append(
+                WarmJob(
+                    f"{lesson} workspace prompt {i + 1}",
+                    workspace_response_cache,
+                    workspace_cache_key(prompt, document),
+                    lambda p=prompt: warm_workspace_response(p, document),
+                )
+            )
+        jobs.append(
+            WarmJob(
+                f"{lesson} analysis prompt {i + 1}",
+                analysis_cache,
+                analysis_cache_key(prompt, lesson_info),
+                lambda p=prompt: enrich_prompt_analysis(p, lesson_info),
+            )
+        )
+    return jobs
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--module", help="Only warm this module id")
+    parser.add_argument("--file", default=settings.prewarm.cache_file)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"CACHE WARMING -> {args.file}")
+    print("=" * 80)
+
+    cache_file = WarmCacheFile(args.file)
+    done = cache_file.keys()
+
+    jobs = [
+        job
+        for module in FULL_CURRICULUM
+        if not args.module or module["id"] == args.module
+        for submodule in module["submodules"]
+        for job in lesson_jobs(module, submodule)
+    ]
+    pending = [job for job in jobs if (job.cache.name, job.key) not in done]
+    print(f"{len(jobs)} artifacts, {len(jobs) - len(pending)} already warm\n")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failures = 0
+
+    async def warm(job: WarmJob):
+        nonlocal failures
+        async with semaphore:
+            try:
+                await job.run()
+            except Exception as e:
+                print(f"✗ {job.label}: {e}")
+                failures += 1
+                return
+        # Only successful responses reach the cache (never fallback text)
+        value = job.cache.get(job.key)
+        if value is None:
+            print(f"✗ {job.label}: no response cached")
+            failures += 1
+            return
+        cache_file.append(job.cache.name, job.key, value)
+        print(f"✓ {job.label}")
+
+    await asyncio.gather(*(warm(job) for job in pending))
+
+    print(f"\nWarmed {len(pending) - failures}, failed {failures}")
+    if failures:
+        print("Run again to retry the failed artifacts")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,21 @@
+"""
+Test configuration
+
+Settings are read when app modules are imported, so the environment is set
+up here, before any test module imports the app. The shared disk cache and
+warm cache file point into a temporary directory instead of cache/.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+_tmp = Path(tempfile.mkdtemp(prefix="upgrad-osp-tests-"))
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("OPENROUTER_API_KEY", "test-key")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("PYDANTIC_AI_NO_BANNER", "1")
+os.environ["DISK_CACHE_PATH"] = str(_tmp / "llm_cache.sqlite3")
+os.environ["WARM_CACHE_FILE"] = str(_tmp / "warm_cache.jsonl")
+os.environ["PREWARM_ENABLED"] = "false"
@@ -0,0 +1,220 @@
+import asyncio
+import gc
+import importlib
+import json
+from typing import Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull
+from app.evaluator import batch
+from app.evaluator.batch import (
+    BatchRun,
+    item_id,
+    parse_batch_file,
+    run_batch,
+    start_batch,
+    validate_batch,
+)
+from app.evaluator.models import BatchEvaluationItem, EvaluationFeedback
+
+evaluator_router = importlib.import_module("app.evaluator.router")
+
+
+def _feedback(score: int) -> EvaluationFeedback:
+    return EvaluationFeedback(
+        overall_score=score,
+        prompt_quality={"summary": "ok"},
+        output_analysis={"summary": "ok"},
+    )
+
+
+class FakeEvaluator:
+    """Stands in for evaluate_prompt_output, scoring pairs by prompt length"""
+
+    def __init__(
+        self, fail: tuple[str, ...] = (), gate: Optional[asyncio.Event] = None
+    ):
+        self.fail = fail
+        self.gate = gate
+        self.calls = []
+
+    async def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.gate is not None:
+            await self.gate.wait()
+        if kwargs["user_prompt"] in self.fail:
+            raise ValueError("evaluation failed")
+        return _feedback(len(kwargs["user_prompt"])), "analysis", False
+
+
+def _items(*prompts: str) -> list[BatchEvaluationItem]:
+    return [
+        BatchEvaluationItem(id=prompt, user_prompt=prompt, ai_output="output")
+        for prompt in prompts
+    ]
+
+
+async def _collect(stream) -> list[dict]:
+    return [json.loads(line) async for line in stream]
+
+
+def test_parse_jsonl_and_csv():
+    jsonl = b'{"user_prompt": "a", "ai_output": "b"}\n\n{"id": "x", "user_prompt": "c", "ai_output": "d"}\n'
+    items = parse_batch_file("pairs.JSONL", jsonl)
+    assert [(item.id, item.user_prompt) for item in items] == [(None, "a"), ("x", "c")]
+
+    csv = "\ufeffuser_prompt,ai_output,expected_outcome\na,b,\nc,d,e\n".encode()
+    items = parse_batch_file("pairs.csv", csv)
+    assert [item.expected_outcome for item in items] == [None, "e"]
+
+
+@pytest.mark.parametrize(
+    "filename, content, message",
+    [
+        ("pairs.txt", b"", "Upload a .jsonl or .csv file"),
+        ("pairs.jsonl", b'{"user_prompt": "a"}', "Row 1: ai_output"),
+        ("pairs.jsonl", b"{not json", "Line 1: invalid JSON"),
+        ("pairs.csv", b"user_prompt,ai_output\na,b\nc,\n", "Row 3: ai_output"),
+        ("pairs.csv", b"\xff\xfe", "UTF-8"),
+    ],
+)
+def test_parse_errors_name_the_row(filename, content, message):
+    with pytest.raises(ValueError, match=message):
+        parse_batch_file(filename, content)
+
+
+def test_validate_batch():
+    with pytest.raises(ValueError, match="no evaluation pairs"):
+        validate_batch([])
+    with pytest.raises(ValueError, match="Duplicate item id"):
+        validate_batch(_items("a", "a"))
+    # Pairs without ids are told apart by content
+    pairs = [
+        BatchEvaluationItem(user_prompt=prompt, ai_output="output")
+        for prompt in ("a", "b")
+    ]
+    validate_batch(pairs)
+    assert item_id(pairs[0]) != item_id(pairs[1])
+
+
+def test_batch_streams_results_and_summary(monkeypatch):
+    evaluator = FakeEvaluator(fail=("bad",))
+    monkeypatch.setattr(batch, "evaluate_prompt_output", evaluator)
+    run = BatchRun("batch-1")
+
+    lines = asyncio.run(_collect(start_batch(run, _items("ab", "bad", "abcd"), 2)))
+
+    assert lines[0] == {
+        "type": "start",
+        "batch_id": "batch-1",
+        "total": 3,
+        "pending": 3,
+    }
+    results = {line["id"]: line for line in lines[1:-1]}
+    assert results["ab"]["overall_score"] == 2
+    assert results["bad"] == {
+        "type": "result",
+        "id": "bad",
+        "index": 1,
+        "resumed": False,
+        "status": "error",
+        "error": "evaluation failed",
+    }
+    summary = lines[-1]
+    assert (summary["succeeded"], summary["failed"], summary["average_score"]) == (
+        2,
+        1,
+        3.0,
+    )
+    assert not run.running
+    # Batches run behind live evaluations and never get made-up feedback
+    assert {call["priority"] for call in evaluator.calls} == {LLMPriority.BATCH}
+    assert not any(call["fallback_on_error"] for call in evaluator.calls)
+
+
+def test_resumed_batch_only_retries_unfinished_pairs(monkeypatch):
+    monkeypatch.setattr(batch, "evaluate_prompt_output", FakeEvaluator(fail=("c",)))
+    run = BatchRun("batch-2")
+    asyncio.run(_collect(run_batch(run, _items("a", "b", "c"))))
+
+    evaluator = FakeEvaluator()
+    monkeypatch.setattr(batch, "evaluate_prompt_output", evaluator)
+    lines = asyncio.run(_collect(run_batch(run, _items("a", "b", "c"))))
+
+    assert [call["user_prompt"] for call in evaluator.calls] == ["c"]
+    assert [line["resumed"] for line in lines[1:3]] == [True, True]
+    assert lines[-1]["resumed"] == 2
+    assert lines[-1]["failed"] == 0
+
+
+def test_full_queue_is_retried_then_reported(monkeypatch):
+    monkeypatch.setattr(batch, "QUEUE_FULL_RETRIES", 1)
+    attempts = 0
+
+    async def queue_full(**kwargs):
+        nonlocal attempts
+        attempts += 1
+        raise LLMQueueFull("queue full", retry_after=0)
+
+    monkeypatch.setattr(batch, "evaluate_prompt_output", queue_full)
+    lines = asyncio.run(_collect(run_batch(BatchRun("batch-3"), _items("a"))))
+
+    assert attempts == 2
+    assert lines[1]["status"] == "error"
+    assert lines[-1]["failed"] == 1
+
+
+def test_claim_is_taken_before_the_stream_starts():
+    run = BatchRun("batch-4")
+    stream = start_batch(run, _items("a"))
+    assert run.running
+
+    # A body that never starts releases its claim when dropped
+    del stream
+    gc.collect()
+    assert not run.running
+
+
+def test_stale_release_does_not_end_a_newer_run():
+    run = BatchRun("batch-5")
+    first = run.claim()
+    second = run.claim()
+    run.release(first)
+    assert run.running
+    run.release(second)
+    assert not run.running
+
+
+def test_concurrent_resend_of_a_running_batch_is_rejected(monkeypatch):
+    app = FastAPI()
+    app.include_router(evaluator_router.router)
+
+    async def main():
+        gate = asyncio.Event()
+        evaluator = FakeEvaluator(gate=gate)
+        monkeypatch.setattr(batch, "evaluate_prompt_output", evaluator)
+        body = {
+            "batch_id": "batch-race",
+            "items": [
+                {"id": prompt, "user_prompt": prompt, "ai_output": "output"}
+                for prompt in ("a", "b", "c")
+            ],
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            first = asyncio.create_task(client.post("/evaluator/batch", json=body))
+            while not evaluator.calls:
+                await asyncio.sleep(0.01)
+            second = await client.post("/evaluator/batch", json=body)
+            gate.set()
+            return await first, second, evaluator
+
+    first, second, evaluator = asyncio.run(main())
+    assert (first.status_code, second.status_code) == (200, 409)
+    assert len(evaluator.calls) == 3
+    assert json.loads(first.text.splitlines()[-1])["succeeded"] == 3
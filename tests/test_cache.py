@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.cache import TTLCache, normalize_key_text, normalize_text
+
+
+class Counter:
+    """compute() stand-in returning "<value>-<call number>" """
+
+    def __init__(self, value: str = "value", delay: float = 0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        call = self.calls
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return f"{self.value}-{call}"
+
+
+def test_fresh_values_are_served_from_memory():
+    cache = TTLCache("test:fresh", ttl=60)
+    compute = Counter()
+
+    async def main():
+        first = await cache.get_or_compute("key", compute)
+        second = await cache.get_or_compute("key", compute)
+        return first, second
+
+    assert asyncio.run(main()) == ("value-1", "value-1")
+    assert compute.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_stale_value_is_served_while_refreshing():
+    cache = TTLCache("test:stale", ttl=0.01, stale_ttl=60)
+    compute = Counter()
+
+    async def main():
+        await cache.get_or_compute("key", compute)
+        await asyncio.sleep(0.02)
+        stale = await cache.get_or_compute("key", compute)
+        # The refresh runs in the background
+        while cache._background:
+            await asyncio.sleep(0)
+        return stale, cache.get("key")
+
+    assert asyncio.run(main()) == ("value-1", "value-2")
+    assert cache.stale_hits == 1
+    assert cache.refreshes == 1
+
+
+def test_failed_refresh_keeps_the_stale_value():
+    cache = TTLCache("test:stale_failure", ttl=0.01, stale_ttl=60)
+
+    async def fail():
+        raise ConnectionError("upstream down")
+
+    async def main():
+        await cache.get_or_compute("key", Counter())
+        await asyncio.sleep(0.02)
+        stale = await cache.get_or_compute("key", fail)
+        while cache._background:
+            await asyncio.sleep(0)
+        return stale, cache.get("key")
+
+    assert asyncio.run(main()) == ("value-1", "value-1")
+    assert cache.refresh_failures == 1
+
+
+def test_failures_are_cached_negatively():
+    cache = TTLCache("test:negative", ttl=60, negative_ttl=60)
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        raise ValueError("no results")
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await cache.get_or_compute("key", fail)
+
+    asyncio.run(main())
+    assert calls == 1
+    assert cache.negative_hits == 1
+    assert cache.get("key") is None
+
+
+def test_failure_values_are_not_cached_without_negative_ttl():
+    cache = TTLCache("test:is_failure", ttl=60)
+    compute = Counter("")
+
+    async def main():
+        for _ in range(2):
+            await cache.get_or_compute(
+                "key", compute, is_failure=lambda value: value.startswith("-")
+            )
+
+    asyncio.run(main())
+    assert compute.calls == 2
+
+
+def test_concurrent_misses_share_one_computation_and_are_not_hits():
+    cache = TTLCache("test:status", ttl=60)
+    compute = Counter(delay=0.01)
+
+    async def main():
+        concurrent = await asyncio.gather(
+            *(cache.get_or_compute_with_status("key", compute) for _ in range(3))
+        )
+        later = await cache.get_or_compute_with_status("key", compute)
+        return concurrent, later
+
+    concurrent, later = asyncio.run(main())
+    assert concurrent == [("value-1", False)] * 3
+    assert later == ("value-1", True)
+    assert compute.calls == 1
+
+
+def test_lru_eviction_respects_max_size():
+    cache = TTLCache("test:evict", ttl=60, max_entries=10, max_size=10)
+    cache.set("a", "x", size=4)
+    cache.set("b", "y", size=4)
+    cache.get("a")
+    cache.set("c", "z", size=4)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x"
+    assert cache.evictions == 1
+
+
+def test_persistent_values_survive_a_new_process():
+    writer = TTLCache("test:persistent", ttl=60, persistent=True)
+    writer.set("key", {"answer": 42})
+
+    # A fresh instance (another worker, or after a restart) reads the disk
+    reader = TTLCache("test:persistent", ttl=60, persistent=True)
+    assert reader.get("key") == {"answer": 42}
+    assert reader.disk_hits == 1
+
+    assert reader.invalidate_prefix("ke") == 1
+    assert TTLCache("test:persistent", ttl=60, persistent=True).get("key") is None
+
+
+def test_stale_disk_entries_keep_their_age():
+    writer = TTLCache("test:persistent_age", ttl=60, persistent=True)
+    writer.set("key", "value")
+    time.sleep(0.02)
+    reader = TTLCache("test:persistent_age", ttl=60, persistent=True)
+    reader.get("key")
+    entry = reader._entries["key"]
+    assert entry.created_at < time.monotonic() - 0.01
+
+
+def test_normalize_key_text_keeps_symbols():
+    assert normalize_key_text("  Learn  C++\n") == "learn c++"
+    assert normalize_key_text("learn C#") != normalize_key_text("learn C++")
+    # normalize_text is only for change detection
+    assert normalize_text("learn C#") == normalize_text("learn C++")
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpen,
+    is_provider_failure,
+)
+from app.core.deadline import DeadlineExceeded
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open
+    with pytest.raises(CircuitOpen) as rejected:
+        breaker.allow()
+    assert rejected.value.retry_after > 0
+    assert breaker.rejected == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    # One probe is let through, a second concurrent call is not
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.02)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.times_opened == 2
+
+
+def test_guard_counts_only_provider_failures():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+    async def fail(error: Exception):
+        async with breaker.guard():
+            raise error
+
+    with pytest.raises(ValueError):
+        asyncio.run(fail(ValueError("unparseable output")))
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(fail(DeadlineExceeded()))
+    assert breaker.state == CLOSED
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(fail(ConnectionError("reset by peer")))
+    assert breaker.state == OPEN
+
+
+def test_guard_ignores_a_stream_closed_by_its_consumer():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    async def stream():
+        async with breaker.guard():
+            yield "first"
+            yield "second"
+
+    async def main():
+        chunks = stream()
+        assert await chunks.__anext__() == "first"
+        await chunks.aclose()
+
+    asyncio.run(main())
+    # The probe slot is freed without deciding the breaker's state
+    assert breaker.state == HALF_OPEN
+    assert breaker.probes_in_flight == 0
+    breaker.allow()
+
+
+def test_is_provider_failure():
+    request = httpx.Request("POST", "https://example.com")
+
+    def status_error(status: int) -> httpx.HTTPStatusError:
+        response = httpx.Response(status, request=request)
+        return httpx.HTTPStatusError("error", request=request, response=response)
+
+    assert is_provider_failure(TimeoutError())
+    assert is_provider_failure(status_error(503))
+    assert is_provider_failure(status_error(429))
+    assert not is_provider_failure(status_error(400))
+    assert not is_provider_failure(DeadlineExceeded())
+    assert not is_provider_failure(ValueError("bad json"))
@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.context_cache import MockContextCacheBackend, PrefixCache
+
+PREFIX = "You are a meticulous workflow architect. " * 120
+
+
+def _cache(backend: MockContextCacheBackend, **options) -> PrefixCache:
+    cache = PrefixCache(backend=backend, **options)
+    cache.register("roadmap", "model", PREFIX)
+    return cache
+
+
+async def _settle(cache: PrefixCache):
+    while any(prefix.creating for prefix in cache._prefixes.values()):
+        await asyncio.sleep(0)
+
+
+def test_first_use_is_uncached_and_creates_the_handle():
+    backend = MockContextCacheBackend(base_latency=0)
+    cache = _cache(backend)
+
+    async def main():
+        first = cache.handle("roadmap")
+        await _settle(cache)
+        return first, cache.handle("roadmap")
+
+    first, second = asyncio.run(main())
+    assert first is None
+    assert second in backend.caches
+    assert backend.caches[second][0] == PREFIX
+    assert (cache.hits, cache.misses, cache.creates) == (1, 1, 1)
+
+
+def test_failed_create_is_not_retried_until_the_backoff_passes():
+    backend = MockContextCacheBackend(fail_creates=True)
+    cache = _cache(backend, retry_after_failure=3600)
+
+    async def main():
+        cache.handle("roadmap")
+        await _settle(cache)
+        cache.handle("roadmap")
+        await _settle(cache)
+
+    asyncio.run(main())
+    assert cache.failures == 1
+    assert cache.handle("roadmap") is None
+    assert not backend.caches
+
+
+def test_short_prefixes_are_never_cached():
+    backend = MockContextCacheBackend()
+    cache = _cache(backend, min_tokens=100_000)
+
+    async def main():
+        cache.handle("roadmap")
+        await _settle(cache)
+
+    asyncio.run(main())
+    assert cache.creates == 0
+
+
+def test_prefixes_below_the_provider_minimum_are_never_sent():
+    backend = MockContextCacheBackend()
+    created = []
+
+    async def create(model, system_instruction, ttl):
+        created.append(model)
+        return "cachedContents/too-small", time.time() + ttl
+
+    backend.create = create
+    cache = PrefixCache(backend=backend)
+    # About 500 tokens, under Gemini's 1024-token minimum
+    cache.register("short", "model", PREFIX[:2000])
+
+    async def main():
+        assert cache.handle("short") is None
+        await _settle(cache)
+
+    asyncio.run(main())
+    assert created == []
+    assert cache.failures == 0
+
+
+def test_aliases_are_cached_for_the_pinned_model():
+    backend = MockContextCacheBackend()
+    created = []
+
+    async def create(model, system_instruction, ttl):
+        created.append(model)
+        return "cachedContents/pinned", time.time() + ttl
+
+    backend.create = create
+    cache = PrefixCache(
+        backend=backend, pinned_models={"gemini-flash-latest": "gemini-2.5-flash"}
+    )
+    cache.register("roadmap", "gemini-flash-latest", PREFIX)
+
+    async def main():
+        cache.handle("roadmap")
+        await _settle(cache)
+
+    asyncio.run(main())
+    assert created == ["gemini-2.5-flash"]
+    assert cache.model("roadmap") == "gemini-2.5-flash"
+
+
+def test_refresh_extends_handles_in_use_and_drops_idle_ones():
+    backend = MockContextCacheBackend(base_latency=0)
+    cache = PrefixCache(backend=backend, ttl=3600, refresh_margin=600, idle_ttl=60)
+    cache.register("used", "model", PREFIX)
+    cache.register("idle", "model", PREFIX)
+
+    async def main():
+        cache.handle("used")
+        cache.handle("idle")
+        await _settle(cache)
+        now = time.time()
+        for prefix in cache._prefixes.values():
+            prefix.expire_at = now + 300
+        cache._prefixes["idle"].last_used = now - 120
+        await cache.refresh_due()
+
+    asyncio.run(main())
+    assert cache._prefixes["used"].expire_at > time.time() + 3000
+    assert cache._prefixes["idle"].handle is None
+    assert cache.refreshes == 1
+
+
+def test_rejected_handle_is_recreated():
+    backend = MockContextCacheBackend(base_latency=0)
+    cache = _cache(backend)
+
+    async def main():
+        cache.handle("roadmap")
+        await _settle(cache)
+        handle = cache.handle("roadmap")
+        cache.invalidate("roadmap")
+        assert cache.handle("roadmap") is None
+        await _settle(cache)
+        return handle, cache.handle("roadmap")
+
+    old, new = asyncio.run(main())
+    assert new is not None and new != old
+    assert cache.invalidations == 1
+
+
+def test_mock_backend_charges_prefill_for_uncached_prompts():
+    backend = MockContextCacheBackend(prefill_seconds_per_1k_tokens=0.5, base_latency=0)
+
+    async def timed(**kwargs) -> float:
+        started = time.monotonic()
+        await backend.generate("Summarize the task", **kwargs)
+        return time.monotonic() - started
+
+    async def main():
+        handle, _ = await backend.create("model", PREFIX, ttl=60)
+        return await timed(system_instruction=PREFIX), await timed(
+            cached_content=handle
+        )
+
+    uncached, cached = asyncio.run(main())
+    assert uncached > cached
+
+    with pytest.raises(KeyError):
+        asyncio.run(backend.generate("prompt", cached_content="cachedContents/gone"))
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from app.core.disk_cache import ACCESS_RESOLUTION_SECONDS, DiskCache
+
+
+def _accessed_at(cache: DiskCache, key: str) -> float:
+    (accessed_at,) = (
+        cache._connection()
+        .execute("SELECT accessed_at FROM entries WHERE raw_key = ?", (key,))
+        .fetchone()
+    )
+    return accessed_at
+
+
+def _age_access_time(cache: DiskCache, key: str):
+    old = time.time() - 2 * ACCESS_RESOLUTION_SECONDS
+    cache._connection().execute(
+        "UPDATE entries SET accessed_at = ? WHERE raw_key = ?", (old, key)
+    )
+    return old
+
+
+def test_set_get_and_expiry(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), compress_min_bytes=16)
+    assert cache.set("ns", "small", {"a": 1}, ttl=60)
+    assert cache.set("ns", "large", "x" * 1000, ttl=60)
+    assert cache.set("ns", "expired", "gone", ttl=0.01)
+    time.sleep(0.02)
+
+    value, age = cache.get("ns", "small")
+    assert value == {"a": 1}
+    assert age >= 0
+    assert cache.get("ns", "large")[0] == "x" * 1000
+    assert cache.get("ns", "expired") is None
+    assert cache.get("other", "small") is None
+
+
+def test_invalidate_prefix_only_touches_its_namespace(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("roadmap", "model-a:1", "one", ttl=60)
+    cache.set("roadmap", "model-a:2", "two", ttl=60)
+    cache.set("roadmap", "model-b:1", "three", ttl=60)
+    cache.set("other", "model-a:1", "four", ttl=60)
+
+    assert cache.invalidate_prefix("roadmap", "model-a:") == 2
+    assert cache.get("roadmap", "model-b:1")[0] == "three"
+    assert cache.get("other", "model-a:1")[0] == "four"
+
+
+def test_reads_do_not_write(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("ns", "key", "value", ttl=60)
+    old = _age_access_time(cache, "key")
+
+    cache.get("ns", "key")
+    assert _accessed_at(cache, "key") == old
+    assert cache.stats()["pending_access_times"] == 1
+
+    # Without an event loop maintenance runs inline
+    cache._schedule_maintenance()
+    assert _accessed_at(cache, "key") > old
+    assert cache.stats()["pending_access_times"] == 0
+
+
+def test_maintenance_runs_off_the_event_loop(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("ns", "key", "value", ttl=60)
+    old = _age_access_time(cache, "key")
+
+    async def main():
+        cache.get("ns", "key")
+        cache._schedule_maintenance()
+        assert cache._maintenance is not None
+        await cache._maintenance
+
+    asyncio.run(main())
+    assert _accessed_at(cache, "key") > old
+
+
+def test_evicts_least_recently_used_over_max_bytes(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=250)
+    for index in range(3):
+        cache.set("ns", f"key-{index}", "x" * 100, ttl=60)
+    _age_access_time(cache, "key-0")
+    cache.set("ns", "expired", "x", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.evict() == 2
+    assert cache.get("ns", "key-0") is None
+    assert cache.get("ns", "key-2") is not None
+
+
+def test_unusable_path_disables_the_cache(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    cache = DiskCache(str(blocker / "cache.sqlite3"))
+    assert not cache.set("ns", "key", "value", ttl=60)
+    assert cache.get("ns", "key") is None
+    assert cache.stats()["enabled"] is False
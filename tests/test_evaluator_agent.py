@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.gemini import DEFAULT_MODEL
+from app.core.llm_scheduler import LLMPriority
+from app.evaluator import evaluator_agent
+from app.evaluator.evaluator_agent import (
+    EVALUATION_PROMPT_VERSION,
+    evaluate_prompt_output,
+    evaluation_cache_key,
+)
+
+FEEDBACK = {
+    "overall_score": 81,
+    "prompt_quality": {"summary": "clear"},
+    "output_analysis": {"summary": "relevant"},
+}
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Replace the LLM call, recording each (deterministic, priority)"""
+    calls = []
+
+    async def fake_run(eval_prompt, deterministic, priority):
+        calls.append((deterministic, priority))
+        return {"feedback": FEEDBACK, "raw_analysis": "analysis"}
+
+    monkeypatch.setattr(evaluator_agent, "_run_evaluation", fake_run)
+    return calls
+
+
+def test_priority_reaches_the_llm_call(runs):
+    asyncio.run(
+        evaluate_prompt_output(
+            "prompt", "output", deterministic=False, priority=LLMPriority.BATCH
+        )
+    )
+    asyncio.run(evaluate_prompt_output("prompt", "output", deterministic=False))
+    assert runs == [(False, LLMPriority.BATCH), (False, LLMPriority.STANDARD)]
+
+
+def test_deterministic_evaluations_are_cached(runs):
+    prompt = f"prompt {uuid.uuid4()}"
+
+    async def main():
+        first = await evaluate_prompt_output(prompt, "output", deterministic=True)
+        second = await evaluate_prompt_output(prompt, "output", deterministic=True)
+        return first, second
+
+    (feedback, raw, cached), (_, _, cached_again) = asyncio.run(main())
+    assert feedback.overall_score == 81
+    assert raw == "analysis"
+    assert (cached, cached_again) == (False, True)
+    assert len(runs) == 1
+
+
+def test_errors_fall_back_unless_disabled(monkeypatch):
+    async def failing_run(eval_prompt, deterministic, priority):
+        raise ValueError("model returned garbage")
+
+    monkeypatch.setattr(evaluator_agent, "_run_evaluation", failing_run)
+
+    feedback, raw, cached = asyncio.run(
+        evaluate_prompt_output("prompt", "output", deterministic=False)
+    )
+    assert feedback.overall_score == 50
+    assert raw.startswith("Error:")
+    assert not cached
+
+    with pytest.raises(ValueError, match="garbage"):
+        asyncio.run(
+            evaluate_prompt_output(
+                "prompt", "output", deterministic=False, fallback_on_error=False
+            )
+        )
+
+
+def test_cache_key_can_be_invalidated_by_version_and_model():
+    key = evaluation_cache_key("prompt", "output", "text", None, None)
+    assert key.startswith(f"v{EVALUATION_PROMPT_VERSION}:{DEFAULT_MODEL}:")
+    assert key != evaluation_cache_key("prompt", "output", "text", "outcome", None)
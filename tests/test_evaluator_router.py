@@ -0,0 +1,32 @@
+import asyncio
+import importlib
+
+import httpx
+
+import main
+from app.core.gemini import DEFAULT_MODEL
+from app.core.llm_scheduler import LLMScheduler
+
+evaluator_router = importlib.import_module("app.evaluator.router")
+
+
+def test_stream_is_rejected_before_it_starts_when_the_queue_is_full(monkeypatch):
+    # The only slot is taken and nothing may queue behind it
+    scheduler = LLMScheduler(max_concurrency=1, max_queued=0)
+    scheduler._lane(DEFAULT_MODEL).active = 1
+    monkeypatch.setattr(evaluator_router, "llm_scheduler", scheduler)
+
+    async def main_():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(
+                "/evaluator/evaluate/stream",
+                data={"user_prompt": "prompt", "ai_output": "output"},
+            )
+
+    response = asyncio.run(main_())
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.headers["content-type"] == "application/json"
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.core.llm_scheduler import LLMPriority, LLMQueueFull, LLMScheduler
+
+MODEL = "test-model"
+
+
+def _scheduler(**overrides) -> LLMScheduler:
+    options = {
+        "max_concurrency": 1,
+        "requests_per_minute": 60_000,
+        "burst": 1000,
+        "max_queued": 4,
+    }
+    return LLMScheduler(**{**options, **overrides})
+
+
+async def _wait_until(condition, timeout: float = 1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition never held"
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_admitted_by_priority():
+    scheduler = _scheduler()
+    order = []
+
+    async def call(priority: LLMPriority):
+        async with scheduler.slot(MODEL, priority):
+            order.append(priority)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(MODEL):
+                await release.wait()
+
+        held = asyncio.create_task(holder())
+        await _wait_until(lambda: scheduler._lane(MODEL).active == 1)
+
+        waiters = []
+        for priority in (
+            LLMPriority.BATCH,
+            LLMPriority.STANDARD,
+            LLMPriority.INTERACTIVE,
+        ):
+            waiters.append(asyncio.create_task(call(priority)))
+            await _wait_until(lambda: scheduler._lane(MODEL).waiting == len(waiters))
+
+        release.set()
+        await asyncio.gather(held, *waiters)
+
+    asyncio.run(main())
+    assert order == [LLMPriority.INTERACTIVE, LLMPriority.STANDARD, LLMPriority.BATCH]
+
+
+def test_full_queue_rejects_with_retry_after():
+    scheduler = _scheduler(max_queued=2)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def call(priority=LLMPriority.STANDARD):
+            async with scheduler.slot(MODEL, priority):
+                await release.wait()
+
+        tasks = [asyncio.create_task(call())]
+        await _wait_until(lambda: scheduler._lane(MODEL).active == 1)
+
+        # Batch calls only get half the queue
+        tasks.append(asyncio.create_task(call(LLMPriority.BATCH)))
+        await _wait_until(lambda: scheduler._lane(MODEL).waiting == 1)
+        with pytest.raises(LLMQueueFull) as batch_rejected:
+            scheduler.check_admission(MODEL, LLMPriority.BATCH)
+        scheduler.check_admission(MODEL, LLMPriority.STANDARD)
+
+        tasks.append(asyncio.create_task(call()))
+        await _wait_until(lambda: scheduler._lane(MODEL).waiting == 2)
+        with pytest.raises(LLMQueueFull):
+            async with scheduler.slot(MODEL, LLMPriority.INTERACTIVE):
+                pass
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return batch_rejected.value
+
+    error = asyncio.run(main())
+    assert error.retry_after >= 1
+    rejected = scheduler.stats()["models"][MODEL]["rejected"]
+    assert rejected["batch"] == 1
+    assert rejected["interactive"] == 1
+
+
+def test_slot_is_released_when_the_call_fails():
+    scheduler = _scheduler()
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot(MODEL):
+                raise RuntimeError("upstream error")
+        async with scheduler.slot(MODEL):
+            pass
+
+    asyncio.run(main())
+    assert scheduler._lane(MODEL).active == 0
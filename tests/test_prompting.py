@@ -0,0 +1,242 @@
+import asyncio
+import importlib
+import json
+
+import pytest
+
+from app.core import deadline
+from app.core.llm_scheduler import LLMQueueFull
+from app.prompting import agents
+from app.prompting.agents import analysis_cache_key, workspace_cache_key
+from app.prompting.curriculum import EXAMPLE_PROMPTS, FULL_CURRICULUM
+from app.prompting.models import ChatMessage, PromptAnalysisRequest
+from app.prompting.session_manager import session_manager
+from app.prompting.utils import (
+    analyze_prompt_quality,
+    analyze_prompts_batch,
+    split_into_chunks,
+)
+
+PROMPTS = [
+    "Summarize this report",
+    "You are an expert analyst. Only use the text provided.",
+    "First list the risks, then rank them step by step",
+    "",
+    "Act as a reviewer and avoid jargon in bullet points",
+]
+
+
+def test_batch_analysis_matches_single_analysis():
+    assert analyze_prompts_batch(PROMPTS) == [
+        analyze_prompt_quality(prompt) for prompt in PROMPTS
+    ]
+    assert analyze_prompts_batch([]) == []
+
+
+def test_batch_analysis_is_not_shifted_by_case_folding():
+    # "İ".lower() is two characters long
+    prompts = ["İSTANBUL İZMİR İÇİN " * 5, "you are an expert", "plain text"]
+    assert analyze_prompts_batch(prompts) == [
+        analyze_prompt_quality(prompt) for prompt in prompts
+    ]
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("Explain C++ templates", "Explain C# templates"),
+        ("List the DOs and DON'Ts", "List the dos and donts"),
+        ("Use 3.5 hours", "Use 35 hours"),
+    ],
+)
+def test_workspace_keys_keep_meaningful_differences(first, second):
+    assert workspace_cache_key(first, "doc") != workspace_cache_key(second, "doc")
+
+
+def test_workspace_keys_ignore_whitespace_only():
+    assert workspace_cache_key("Summarize  the\ndocument", "a  b") == (
+        workspace_cache_key("Summarize the document", "a b")
+    )
+    assert workspace_cache_key("prompt", "document one") != workspace_cache_key(
+        "prompt", "document two"
+    )
+
+
+def test_analysis_keys_are_prefixed_by_lesson():
+    key = analysis_cache_key("You are an expert", {"submodule_id": 2})
+    assert key.startswith("lesson-2:")
+    assert analysis_cache_key("You are an expert").startswith("lesson-none:")
+    assert key != analysis_cache_key("You are an expert", {"submodule_id": 3})
+
+
+def test_every_lesson_has_its_example_prompt():
+    for module in FULL_CURRICULUM:
+        for submodule in module["submodules"]:
+            assert submodule["example_prompt"] == EXAMPLE_PROMPTS.get(submodule["id"])
+
+
+def test_split_into_chunks_respects_the_budget():
+    text = "Short sentence. " * 200 + "x" * 50
+    chunks = split_into_chunks(text, max_tokens=100)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+@pytest.fixture
+def map_reduce(monkeypatch):
+    """Fake section summaries and reduce stream; records the reduce prompt"""
+    state = {"active": 0, "peak": 0, "queue_full": set(), "reduce_prompt": None}
+
+    async def summarize_chunk(chunk: str):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(0.01)
+            if chunk not in state["queue_full"]:
+                # Every section is turned away once before it gets through
+                state["queue_full"].add(chunk)
+                raise LLMQueueFull("queue full", retry_after=0)
+            return f"summary of {chunk[:10]}", False
+        finally:
+            state["active"] -= 1
+
+    async def stream_workspace(prompt: str, target):
+        state["reduce_prompt"] = prompt
+        yield "final answer"
+
+    monkeypatch.setattr(agents, "summarize_chunk", summarize_chunk)
+    monkeypatch.setattr(agents, "_stream_workspace", stream_workspace)
+    monkeypatch.setattr(agents, "MAP_CONCURRENCY", 2)
+    return state
+
+
+def _document(sections: int) -> str:
+    return " ".join(f"Section {i} " + "word " * 1990 + "end." for i in range(sections))
+
+
+async def _summarize(document: str) -> tuple[list[dict], str]:
+    progress, text = [], ""
+    async for part in agents.stream_map_reduce_summary("Summarize it", document):
+        if isinstance(part, dict):
+            progress.append(part)
+        else:
+            text += part
+    return progress, text
+
+
+def test_map_reduce_limits_concurrency_and_retries_a_full_queue(map_reduce):
+    progress, text = asyncio.run(_summarize(_document(5)))
+
+    assert text == "final answer"
+    assert len(progress) == progress[0]["total"] > 2
+    assert not any(part["error"] for part in progress)
+    assert not any(part["truncated"] for part in progress)
+    assert map_reduce["peak"] == 2
+    assert "only the first" not in map_reduce["reduce_prompt"]
+
+
+def test_map_reduce_says_when_the_document_was_cut(map_reduce, monkeypatch):
+    monkeypatch.setattr(agents, "MAX_CHUNKS", 2)
+    progress, _ = asyncio.run(_summarize(_document(5)))
+
+    assert len(progress) == 2
+    assert all(part["truncated"] for part in progress)
+    assert progress[0]["document_sections"] > 2
+    assert "only the first 2 were summarized" in map_reduce["reduce_prompt"]
+
+
+@pytest.fixture
+def analysis_stream(monkeypatch):
+    """Run /api/prompt/analyze/stream with a fake LLM stage"""
+    prompting_router = importlib.import_module("app.prompting.router")
+    lessons = []
+
+    class Analysis:
+        def __init__(self, lesson_info):
+            self.lesson_info = lesson_info
+
+        def model_dump(self):
+            return {"feedback": f"lesson {self.lesson_info.get('submodule_id')}"}
+
+    async def enrich(prompt, lesson_info, basic):
+        lessons.append(lesson_info.get("submodule_id"))
+        return Analysis(lesson_info)
+
+    monkeypatch.setattr(prompting_router, "enrich_prompt_analysis", enrich)
+    session_id = session_manager.create_session()
+    session = session_manager.get_session(session_id)
+    session.current_module = FULL_CURRICULUM[0]["id"]
+
+    async def analyze(prompt: str, submodule_id: int) -> dict:
+        session.current_submodule = submodule_id
+        response = await prompting_router.analyze_prompt_stream(
+            PromptAnalysisRequest(prompt=prompt, session_id=session_id)
+        )
+        events = [
+            json.loads(chunk.removeprefix("data: "))
+            async for chunk in response.body_iterator
+        ]
+        return events[-1]
+
+    return analyze, lessons
+
+
+def test_unchanged_prompt_replays_the_llm_analysis(analysis_stream):
+    analyze, lessons = analysis_stream
+
+    async def main():
+        await analyze("You are an expert. Summarize this report.", 1)
+        return await analyze("You are an expert. Summarize this report!", 1)
+
+    replayed = asyncio.run(main())
+    assert replayed["cached"] is True
+    assert lessons == [1]
+
+
+def test_lesson_switch_reruns_the_llm_analysis(analysis_stream):
+    analyze, lessons = analysis_stream
+
+    async def main():
+        await analyze("You are an expert. Summarize this report.", 1)
+        return await analyze("You are an expert. Summarize this report.", 2)
+
+    result = asyncio.run(main())
+    assert result["cached"] is False
+    assert result["analysis"] == {"feedback": "lesson 2"}
+    assert lessons == [1, 2]
+
+
+class ConnectedRequest:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+def test_chat_stream_is_cut_off_at_its_deadline(monkeypatch):
+    prompting_router = importlib.import_module("app.prompting.router")
+    monkeypatch.setitem(deadline.ROUTE_DEADLINES, "prompting.chat_stream", 0.2)
+
+    async def stalls(message, lesson_context):
+        yield "Hello"
+        await asyncio.sleep(60)
+        yield "never sent"
+
+    monkeypatch.setattr(prompting_router, "stream_tutor_response", stalls)
+    session_id = session_manager.create_session()
+
+    async def main():
+        response = await prompting_router.chat_stream(
+            ChatMessage(message="Hi", session_id=session_id), ConnectedRequest()
+        )
+        return [
+            json.loads(chunk.removeprefix("data: "))
+            async for chunk in response.body_iterator
+        ]
+
+    events = asyncio.run(asyncio.wait_for(main(), timeout=5))
+    assert events == [
+        {"chunk": "Hello", "done": False},
+        {"status": "deadline_exceeded", "done": True},
+    ]
+    reply = session_manager.get_session(session_id).tutor_history[-1]
+    assert (reply["content"], reply["status"]) == ("Hello", "deadline_exceeded")
@@ -0,0 +1,92 @@
+import asyncio
+import itertools
+
+import pytest
+
+from app.core.circuit_breaker import circuit_breakers
+from app.core.routing import ModelRouter, RouteTarget
+
+# Breakers are global per provider and model; each test uses fresh models
+_models = itertools.count()
+
+
+def _router(*providers: str) -> tuple[ModelRouter, list[RouteTarget]]:
+    router = ModelRouter(cold_latency=0.05, hedge_min_delay=0.05, explore_rate=0)
+    targets = [
+        RouteTarget(provider, f"model-{next(_models)}") for provider in providers
+    ]
+    router.register("test", targets)
+    return router, targets
+
+
+def test_run_uses_the_preferred_target():
+    router, targets = _router("primary", "secondary")
+    called = []
+
+    async def call(target: RouteTarget):
+        called.append(target)
+        return target.provider
+
+    assert asyncio.run(router.run("test", call)) == "primary"
+    assert called == [targets[0]]
+    assert router.decisions["test"] == {targets[0].key: 1}
+
+
+def test_run_fails_over_to_the_next_target():
+    router, targets = _router("primary", "secondary")
+
+    async def call(target: RouteTarget):
+        if target.provider == "primary":
+            raise ConnectionError("primary is down")
+        return target.provider
+
+    assert asyncio.run(router.run("test", call)) == "secondary"
+    assert router.failovers["test"] == 1
+    assert circuit_breakers.get("primary", targets[0].model_name).failures == 1
+
+
+def test_run_raises_the_last_error_when_every_target_fails():
+    router, _ = _router("primary", "secondary")
+
+    async def call(target: RouteTarget):
+        raise ConnectionError(f"{target.provider} is down")
+
+    with pytest.raises(ConnectionError, match="secondary is down"):
+        asyncio.run(router.run("test", call))
+
+
+def test_slow_primary_is_hedged():
+    router, targets = _router("primary", "secondary")
+    cancelled = []
+
+    async def call(target: RouteTarget):
+        if target.provider == "primary":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(target)
+                raise
+        return target.provider
+
+    async def main():
+        result = await router.run("test", call, hedge=True)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "secondary"
+    assert router.hedges["test"] == 1
+    assert router.hedge_wins["test"] == 1
+    assert cancelled == [targets[0]]
+
+
+def test_open_breaker_target_is_skipped():
+    router, targets = _router("primary", "secondary")
+    breaker = circuit_breakers.get("primary", targets[0].model_name)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert router.rank("test", "response") == [targets[1]]
+
+    async def call(target: RouteTarget):
+        return target.provider
+
+    assert asyncio.run(router.run("test", call)) == "secondary"
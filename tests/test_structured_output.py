@@ -0,0 +1,59 @@
+import pytest
+
+from app.core.structured_output import IncrementalObjectParser, extract_json
+
+
+def _feed_in_chunks(text: str, size: int) -> list[tuple[str, object]]:
+    parser = IncrementalObjectParser()
+    members = []
+    for start in range(0, len(text), size):
+        members.extend(parser.feed(text[start : start + size]))
+    assert parser.done
+    return members
+
+
+RESPONSE = (
+    'Here is the evaluation:\n```json\n{"overall_score": 72, '
+    '"summary": "Clear, but \\"vague\\" about {format}, [length]", '
+    '"scores": {"clarity": 80, "specificity": [60, 65]}, '
+    '"suggestions": ["Add an example", "Say who it is for"]}\n```'
+)
+EXPECTED = [
+    ("overall_score", 72),
+    ("summary", 'Clear, but "vague" about {format}, [length]'),
+    ("scores", {"clarity": 80, "specificity": [60, 65]}),
+    ("suggestions", ["Add an example", "Say who it is for"]),
+]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(RESPONSE)])
+def test_members_are_returned_as_they_complete(size):
+    assert _feed_in_chunks(RESPONSE, size) == EXPECTED
+
+
+def test_member_is_not_returned_before_its_value_is_complete():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"overall_score": 72, "summary": "Clear, ') == [
+        ("overall_score", 72)
+    ]
+    assert parser.feed('but vague", "scores": {"clarity"') == [
+        ("summary", "Clear, but vague")
+    ]
+    assert parser.feed(": 80}}") == [("scores", {"clarity": 80})]
+    assert parser.done
+    # Text after the closing brace is ignored
+    assert parser.feed(', "extra": 1}') == []
+
+
+def test_invalid_member_is_skipped():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"score": oops, "summary": "ok"}') == [("summary", "ok")]
+
+
+def test_extract_json_repairs_truncated_output():
+    assert extract_json('```json\n{"a": [1, 2,], "b": {"c": "unfinished') == {
+        "a": [1, 2],
+        "b": {"c": "unfinished"},
+    }
+    with pytest.raises(ValueError):
+        extract_json("no json here")
@@ -0,0 +1,42 @@
+import asyncio
+
+from app.core import warm_cache
+from app.core.cache import TTLCache
+from app.core.warm_cache import WarmCacheFile
+
+
+def test_load_puts_records_into_their_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(warm_cache, "LOAD_SLICE", 2)
+    cache = TTLCache("test:warm", ttl=60)
+    warm_file = WarmCacheFile(str(tmp_path / "warm.jsonl"))
+    for index in range(5):
+        warm_file.append("test:warm", f"key-{index}", {"answer": index})
+    warm_file.append("test:unknown", "key", "value")
+    with open(warm_file.path, "a", encoding="utf-8") as f:
+        f.write('{"cache": "test:warm", "key": "torn')
+
+    assert asyncio.run(warm_file.load()) == 5
+    assert cache.get("key-4") == {"answer": 4}
+    assert warm_file.keys() == {
+        *(("test:warm", f"key-{index}") for index in range(5)),
+        ("test:unknown", "key"),
+    }
+    stats = warm_file.stats()
+    assert (stats["loaded"], stats["skipped"], stats["loads"]) == (5, 1, 1)
+
+
+def test_file_is_reloaded_periodically(tmp_path):
+    TTLCache("test:warm_reload", ttl=60)
+    warm_file = WarmCacheFile(str(tmp_path / "warm.jsonl"), reload_seconds=0.01)
+
+    async def main():
+        # Started before the file exists, e.g. on a fresh deployment
+        warm_file.start()
+        await asyncio.sleep(0.02)
+        warm_file.append("test:warm_reload", "key", "value")
+        while warm_file.loads < 2:
+            await asyncio.sleep(0.01)
+        await warm_file.stop()
+
+    asyncio.run(main())
+    assert warm_file.loaded >= 2
@@ -0,0 +1,203 @@
+import asyncio
+import importlib
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.jobs import JobManager
+from app.core.llm_scheduler import LLMQueueFull
+from app.workflow import agents, speculative
+from app.workflow.agents import roadmap_cache, roadmap_cache_key
+from app.workflow.models import (
+    AIToolSearchResult,
+    RoadmapDraft,
+    RoadmapStepDraft,
+    TaskDiscoveryRequest,
+    WorkflowRoadmap,
+)
+from app.workflow.speculative import SpeculativeSearchManager
+
+workflow_router = importlib.import_module("app.workflow.router")
+
+TOOL = AIToolSearchResult(
+    tool_name="Chat GPT",
+    description="Assistant",
+    url="https://chat.openai.com",
+    use_case="Drafting",
+    pricing="Free",
+)
+
+
+def test_roadmap_keys_ignore_case_whitespace_and_answer_order():
+    key = roadmap_cache_key(
+        "Write  weekly reports", {"q1": "Sales", "q2": "Excel"}, [TOOL], "model-a"
+    )
+    assert key.startswith("model-a:")
+    assert key == roadmap_cache_key(
+        "write weekly reports", {"q2": "excel", "q1": "sales "}, [TOOL], "model-a"
+    )
+    assert key != roadmap_cache_key(
+        "Write weekly reports", {"q1": "Sales", "q2": "Excel"}, [TOOL], "model-b"
+    )
+
+
+def test_roadmap_keys_keep_symbols():
+    assert roadmap_cache_key("Learn C++", {}, []) != roadmap_cache_key(
+        "Learn C#", {}, []
+    )
+
+
+def _draft(*titles: str) -> RoadmapDraft:
+    return RoadmapDraft(
+        task_title="Write reports",
+        task_description="Weekly reports",
+        total_estimated_time="1 hour",
+        difficulty_level="Beginner",
+        steps=[
+            RoadmapStepDraft(
+                id=str(index),
+                title=title,
+                description="Draft the report",
+                ai_tool="Chat GPT",
+                prompts=[],
+                tips=[],
+                pros=[],
+                cons=[],
+                estimated_time="10 minutes",
+            )
+            for index, title in enumerate(titles)
+        ],
+    )
+
+
+@pytest.mark.parametrize("failed_quiz, cached", [(None, True), ("Review", False)])
+def test_roadmaps_are_only_cached_with_every_quiz(monkeypatch, failed_quiz, cached):
+    async def generate_structured(*args, **kwargs):
+        return _draft("Outline", "Review")
+
+    async def generate_step_quiz(step_title, step_description, ai_tool):
+        if step_title == failed_quiz:
+            return None
+        return {"question": step_title}
+
+    monkeypatch.setattr(agents, "generate_structured", generate_structured)
+    monkeypatch.setattr(agents, "generate_step_quiz", generate_step_quiz)
+    task = f"Write reports without failing {failed_quiz}"
+
+    roadmap = asyncio.run(agents.generate_workflow_roadmap(task, {}, [TOOL]))
+
+    assert [step.quiz is not None for step in roadmap.steps] == [
+        True,
+        failed_quiz is None,
+    ]
+    key = roadmap_cache_key(task, {}, [TOOL])
+    assert (roadmap_cache.get(key) is not None) == cached
+
+
+@pytest.fixture
+def roadmap_job(monkeypatch):
+    """Run roadmap jobs on a fresh job manager with a gated fake pipeline"""
+    gate = asyncio.Event()
+    generated = []
+
+    async def find_tools(session_id, task_description, answers):
+        return [TOOL]
+
+    async def generate(task_description, answers, tools, force_refresh=False):
+        generated.append((task_description, dict(answers)))
+        await gate.wait()
+        return WorkflowRoadmap(
+            task_title=task_description,
+            task_description=task_description,
+            steps=[],
+            total_estimated_time="1h",
+            difficulty_level="easy",
+        )
+
+    monkeypatch.setattr(workflow_router, "_find_tools", find_tools)
+    monkeypatch.setattr(workflow_router, "generate_workflow_roadmap", generate)
+    monkeypatch.setattr(workflow_router, "job_manager", JobManager(workers=1))
+    monkeypatch.setattr(workflow_router, "workflow_sessions", {})
+
+    async def run(session_id: str, session: dict, change_session):
+        workflow_router.workflow_sessions[session_id] = session
+        manager = workflow_router.job_manager
+        try:
+            response = await workflow_router.submit_roadmap_job(session_id)
+            job = manager.get(response.job_id)
+            while not generated:
+                await asyncio.sleep(0.01)
+            change_session()
+            gate.set()
+            await manager.wait(job, timeout=5)
+            return job
+        finally:
+            await manager.stop()
+
+    return run, generated
+
+
+def test_roadmap_job_stores_its_result_in_the_session(roadmap_job):
+    run, _ = roadmap_job
+    session = {"task_input": "Write reports", "answers": {"q1": "weekly"}}
+
+    job = asyncio.run(run("s1", session, lambda: None))
+
+    assert job.status == "succeeded"
+    assert session["roadmap"]["task_title"] == "Write reports"
+    assert session["tools"][0]["tool_name"] == "Chat GPT"
+
+
+def test_roadmap_job_survives_its_session_being_cleared(roadmap_job):
+    run, _ = roadmap_job
+    session = {"task_input": "Write reports", "answers": {"q1": "weekly"}}
+
+    job = asyncio.run(
+        run("s1", session, lambda: workflow_router.workflow_sessions.clear())
+    )
+
+    assert job.status == "succeeded"
+    assert job.result.task_title == "Write reports"
+    assert "s1" not in workflow_router.workflow_sessions
+
+
+def test_roadmap_job_does_not_overwrite_newer_answers(roadmap_job):
+    run, generated = roadmap_job
+    session = {"task_input": "Write reports", "answers": {"q1": "weekly"}}
+
+    def answer_again():
+        session["answers"] = {"q1": "monthly"}
+
+    job = asyncio.run(run("s1", session, answer_again))
+
+    assert job.status == "succeeded"
+    # The job used the answers it was submitted with
+    assert generated == [("Write reports", {"q1": "weekly"})]
+    assert "roadmap" not in session
+    assert "tools" not in session
+
+
+@pytest.mark.parametrize("error", [RuntimeError("model down"), LLMQueueFull("full", 1)])
+def test_failed_discovery_cancels_the_speculative_search(monkeypatch, error):
+    searches = SpeculativeSearchManager()
+    monkeypatch.setattr(workflow_router, "speculative_searches", searches)
+
+    async def never_finishes(task_description, answers):
+        await asyncio.Event().wait()
+
+    async def fail(user_input):
+        raise error
+
+    monkeypatch.setattr(speculative, "search_ai_tools", never_finishes)
+    monkeypatch.setattr(workflow_router, "generate_workflow_questions", fail)
+
+    async def main():
+        request = TaskDiscoveryRequest(user_input="Write reports", session_id="s1")
+        with pytest.raises((HTTPException, LLMQueueFull)):
+            await workflow_router.discover_task(request)
+        return searches.stats()
+
+    stats = asyncio.run(main())
+    assert stats["started"] == 1
+    assert stats["cancelled"] == 1
+    assert not searches._searches